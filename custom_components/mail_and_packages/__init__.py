@@ -5,28 +5,58 @@ from datetime import timedelta
 
 from async_timeout import timeout
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, CONF_RESOURCES
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PORT,
+    CONF_RESOURCES,
+    CONF_USERNAME,
+    EVENT_HOMEASSISTANT_STOP,
+)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
+    ATTR_IMAGE_NAME,
+    ATTR_VIDEO_FRAMES,
     CONF_ALLOW_EXTERNAL,
     CONF_AMAZON_DAYS,
     CONF_AMAZON_FWDS,
+    CONF_DURATION,
+    CONF_FOLDER,
+    CONF_GENERATE_MP4,
     CONF_IMAGE_SECURITY,
+    CONF_IMAP_IDLE,
     CONF_IMAP_TIMEOUT,
     CONF_PATH,
+    CONF_RESIZE_WORKERS,
     CONF_SCAN_INTERVAL,
+    CONF_VIDEO_ENCODER,
     COORDINATOR,
     DEFAULT_AMAZON_DAYS,
+    DEFAULT_IMAP_IDLE,
     DEFAULT_IMAP_TIMEOUT,
+    DEFAULT_RESIZE_WORKERS,
+    DEFAULT_VIDEO_ENCODER,
     DOMAIN,
+    IMAP_IDLE_TIMEOUT,
     ISSUE_URL,
+    MP4_TIMEOUT,
     PLATFORMS,
     VERSION,
+    VIDEO_ENCODER_PYAV,
+)
+from .helpers import (
+    ImapConnection,
+    async_generate_mp4,
+    default_image_path,
+    encode_mp4,
+    gif_mtime,
+    mp4_outdated,
+    process_emails,
+    update_time,
 )
-from .helpers import default_image_path, process_emails
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -56,6 +86,18 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     if CONF_IMAP_TIMEOUT not in updated_config.keys():
         updated_config[CONF_IMAP_TIMEOUT] = DEFAULT_IMAP_TIMEOUT
 
+    # Set IMAP IDLE off by default
+    if CONF_IMAP_IDLE not in updated_config.keys():
+        updated_config[CONF_IMAP_IDLE] = DEFAULT_IMAP_IDLE
+
+    # Resize mail images one at a time by default
+    if CONF_RESIZE_WORKERS not in updated_config.keys():
+        updated_config[CONF_RESIZE_WORKERS] = DEFAULT_RESIZE_WORKERS
+
+    # Encode mp4 with the ffmpeg binary by default
+    if CONF_VIDEO_ENCODER not in updated_config.keys():
+        updated_config[CONF_VIDEO_ENCODER] = DEFAULT_VIDEO_ENCODER
+
     # Set external path off by default
     if CONF_ALLOW_EXTERNAL not in config_entry.data.keys():
         updated_config[CONF_ALLOW_EXTERNAL] = False
@@ -101,12 +143,23 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     # Raise ConfEntryNotReady if coordinator didn't update
     if not coordinator.last_update_success:
         _LOGGER.error("Error updating sensor data: %s", coordinator.last_exception)
+        await coordinator.connection.async_close()
+        await hass.async_add_executor_job(coordinator.connection.close)
         raise ConfigEntryNotReady
 
     hass.data[DOMAIN][config_entry.entry_id] = {
         COORDINATOR: coordinator,
     }
 
+    # Refresh as soon as the server pushes new mail
+    if config.get(CONF_IMAP_IDLE):
+        coordinator.async_start_idle()
+        config_entry.async_on_unload(
+            hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, coordinator.async_stop_idle
+            )
+        )
+
     for platform in PLATFORMS:
         hass.async_create_task(
             hass.config_entries.async_forward_entry_setup(config_entry, platform)
@@ -130,7 +183,13 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
 
     if unload_ok:
         _LOGGER.debug("Successfully removed sensors from the %s integration", DOMAIN)
-        hass.data[DOMAIN].pop(config_entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(config_entry.entry_id)[COORDINATOR]
+        await coordinator.async_stop_idle()
+        await coordinator.async_stop_mp4()
+
+        # Log out of the persistent IMAP sessions
+        await coordinator.connection.async_close()
+        await hass.async_add_executor_job(coordinator.connection.close)
 
     return unload_ok
 
@@ -235,6 +294,32 @@ class MailDataUpdateCoordinator(DataUpdateCoordinator):
         self.timeout = the_timeout
         self.config = config
         self.hass = hass
+        self.connection = ImapConnection(
+            host,
+            config.get(CONF_PORT),
+            config.get(CONF_USERNAME),
+            config.get(CONF_PASSWORD),
+            config.get(CONF_FOLDER),
+            the_timeout,
+        )
+
+        # IDLE blocks its session so it gets a connection of its own
+        self.idle_connection = ImapConnection(
+            host,
+            config.get(CONF_PORT),
+            config.get(CONF_USERNAME),
+            config.get(CONF_PASSWORD),
+            config.get(CONF_FOLDER),
+            IMAP_IDLE_TIMEOUT + 60,
+        )
+        self._idle_task = None
+        self._refresh_lock = asyncio.Lock()
+        self._update = None
+        self._state = None
+        self._mp4_task = None
+        self._mp4_source = None
+        self._encode_job = None
+        self.mp4_status = None
 
         _LOGGER.debug("Data will be update every %s", self.interval)
 
@@ -242,12 +327,183 @@ class MailDataUpdateCoordinator(DataUpdateCoordinator):
 
     async def _async_update_data(self):
         """Fetch data."""
-        async with timeout(self.timeout):
+        # IDLE and the scan interval can ask for a refresh at the same
+        # time, the second one waits and then usually finds no changes
+        async with self._refresh_lock:
+            return await self._async_update()
+
+    async def _async_update(self):
+        """Fetch data while holding the refresh lock."""
+        # A timed out update keeps its executor thread until the IMAP
+        # command returns, never run two against the same session
+        if self._update is not None and not self._update.done():
+            raise UpdateFailed("Previous update is still running")
+
+        try:
+            async with timeout(self.timeout):
+                try:
+                    # Nothing to do when the folder has not changed today
+                    state = await self.connection.async_state()
+                    if state is not None and state == self._state and self.data:
+                        _LOGGER.debug("Mail folder unchanged, keeping sensor data")
+                        data = dict(self.data)
+                        if "mail_updated" in data:
+                            data["mail_updated"] = update_time()
+                        return data
+
+                    # Search and headers are fetched on the event loop, the
+                    # executor thread parses and blocks on the loop's session
+                    # for the message parts the sensors read
+                    await self.connection.async_prefetch(
+                        self.config, checked=state is not None
+                    )
+                    self._update = self.hass.async_add_executor_job(
+                        process_emails, self.hass, self.config, self.connection
+                    )
+                    data = await asyncio.shield(self._update)
+                except Exception as error:
+                    _LOGGER.error("Problem updating sensors: %s", error)
+                    raise UpdateFailed(error) from error
+                # A refresh missing some searches is repeated next time
+                failed = not data or self.connection.sync.failed
+                self._state = None if failed else state
+
+                # Encode the video after the sensors are published
+                frames = data.pop(ATTR_VIDEO_FRAMES, None)
+                if self.config.get(CONF_GENERATE_MP4) and ATTR_IMAGE_NAME in data:
+                    self.async_generate_mp4(data[ATTR_IMAGE_NAME], frames)
+                return data
+        except asyncio.TimeoutError:
+            if self._update is not None and not self._update.done():
+                # Unblock the executor thread stuck on the server
+                self.connection.abort()
+                self._update.add_done_callback(
+                    lambda update: update.cancelled() or update.exception()
+                )
+            raise
+
+    @callback
+    def async_generate_mp4(self, image_name: str, frames: list = None) -> None:
+        """Encode the mail gif to mp4 in the background.
+
+        PyAV encodes the frames of the gif when the refresh passes them.
+        A running encode is only replaced when the gif changed since it
+        started.
+        """
+        self._mp4_task = self.hass.async_create_task(
+            self._async_generate_mp4(image_name, self._mp4_task, frames)
+        )
+
+    async def async_stop_mp4(self) -> None:
+        """Stop a running mp4 encode."""
+        if self._mp4_task is not None and not self._mp4_task.done():
+            self._mp4_task.cancel()
+            await asyncio.wait([self._mp4_task])
+        self._mp4_task = None
+
+    async def _async_generate_mp4(
+        self, image_name: str, previous, frames: list = None
+    ) -> None:
+        """Encode the mail gif to mp4 and report the status."""
+        path = f"{self.hass.config.path()}/{self.config.get(CONF_PATH)}"
+        mtime = await self.hass.async_add_executor_job(gif_mtime, path, image_name)
+        source = (image_name, mtime)
+        if previous is not None and not previous.done():
+            running = self._mp4_source
+            if (
+                running is not None
+                and running[0] == image_name
+                and (mtime is None or running[1] is not None and mtime <= running[1])
+            ):
+                # Cancelling us cancels the encode we wait for
+                _LOGGER.debug("Mp4 of %s is already being encoded", image_name)
+                await previous
+                return
+            _LOGGER.debug("Cancelling previous mp4 encode")
+            previous.cancel()
+            await asyncio.wait([previous])
+
+        self._mp4_source = source
+        try:
+            if not await self.hass.async_add_executor_job(
+                mp4_outdated, path, image_name
+            ):
+                return
+
+            self._set_mp4_status("encoding")
             try:
-                data = await self.hass.async_add_executor_job(
-                    process_emails, self.hass, self.config
+                if self.config.get(CONF_VIDEO_ENCODER) == VIDEO_ENCODER_PYAV:
+                    success = await self._async_encode_mp4(path, image_name, frames)
+                else:
+                    success = await async_generate_mp4(path, image_name)
+            except asyncio.TimeoutError:
+                _LOGGER.error("Timed out generating mp4 of %s", image_name)
+                self._set_mp4_status("timeout")
+            except OSError as err:
+                _LOGGER.error("Error generating mp4: %s", str(err))
+                self._set_mp4_status("failed")
+            else:
+                self._set_mp4_status("done" if success else "failed")
+        finally:
+            if self._mp4_source is source:
+                self._mp4_source = None
+
+    async def _async_encode_mp4(
+        self, path: str, image_name: str, frames: list = None
+    ) -> bool:
+        """Encode the mp4 with PyAV in the executor within MP4_TIMEOUT.
+
+        The encoder thread can not be stopped.  After a timeout or cancel it
+        runs on, and the next encode waits for it as both write the same file.
+        """
+        if self._encode_job is not None and not self._encode_job.done():
+            _LOGGER.debug("Waiting for the previous mp4 encode to finish")
+            await asyncio.wait([self._encode_job], timeout=MP4_TIMEOUT)
+            if not self._encode_job.done():
+                raise asyncio.TimeoutError
+        self._encode_job = self.hass.async_add_executor_job(
+            encode_mp4, frames, path, image_name, self.config.get(CONF_DURATION)
+        )
+        return await asyncio.wait_for(asyncio.shield(self._encode_job), MP4_TIMEOUT)
+
+    @callback
+    def _set_mp4_status(self, status: str) -> None:
+        """Update the mp4 status attribute."""
+        self.mp4_status = status
+        self.async_update_listeners()
+
+    @callback
+    def async_start_idle(self) -> None:
+        """Start waiting for new mail with IMAP IDLE."""
+        if self._idle_task is None:
+            self._idle_task = self.hass.async_create_background_task(
+                self._async_idle(), f"{DOMAIN} IMAP IDLE"
+            )
+
+    async def async_stop_idle(self, *_) -> None:
+        """Stop waiting for new mail and log out of the IDLE session."""
+        if self._idle_task is None:
+            return
+        self._idle_task.cancel()
+        self._idle_task = None
+        self.idle_connection.abort()
+        await self.hass.async_add_executor_job(self.idle_connection.close)
+
+    async def _async_idle(self) -> None:
+        """Refresh whenever the server reports new mail.
+
+        Regular polling keeps running, so servers without IDLE are still
+        updated every scan interval.
+        """
+        while True:
+            changed = await self.hass.async_add_executor_job(
+                self.idle_connection.idle, IMAP_IDLE_TIMEOUT
+            )
+            if changed is None:
+                _LOGGER.debug(
+                    "IMAP IDLE unavailable, retrying in %s", self.update_interval
                 )
-            except Exception as error:
-                _LOGGER.error("Problem updating sensors: %s", error)
-                raise UpdateFailed(error) from error
-            return data
+                await asyncio.sleep(self.update_interval.total_seconds())
+            elif changed:
+                _LOGGER.debug("New mail reported, refreshing sensors")
+                await self.async_request_refresh()
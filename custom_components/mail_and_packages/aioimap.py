@@ -0,0 +1,228 @@
+"""Asyncio IMAP client for Mail and Packages."""
+
+import asyncio
+import logging
+import re
+import ssl
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+LITERAL = re.compile(rb"\{(\d+)\}$")
+UNTAGGED = re.compile(rb"\* (?:(\d+) )?([A-Za-z-]+) ?(.*)", re.DOTALL)
+CODES = re.compile(rb"\[(UIDVALIDITY|UIDNEXT|HIGHESTMODSEQ) (\d+)\]")
+MODSEQ = re.compile(rb"MODSEQ \((\d+)\)")
+
+
+def _ssl_context() -> ssl.SSLContext:
+    """Return a TLS context matching the imaplib.IMAP4_SSL default.
+
+    imaplib does not verify the server certificate, so neither do we or
+    servers with self signed certificates would stop working.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _quote(value: str) -> str:
+    """Quote a string argument."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class AsyncImapClient:
+    """IMAP4rev1 client running on the event loop.
+
+    Only implements the commands the integration uses.  Responses have the
+    same shape as imaplib so both transports share the parsing code.
+    Cancelling a command closes the connection, as the session can not be
+    trusted after a response was cut off.  The selected folder's message
+    count, UIDNEXT and HIGHESTMODSEQ are kept up to date from the untagged
+    responses of every command.
+    """
+
+    def __init__(self, host: str, port: int, use_ssl: bool = True) -> None:
+        """Initialize."""
+        self._host = host
+        self._port = port
+        self._ssl = use_ssl
+        self._reader = None
+        self._writer = None
+        self._tag = 0
+        self._lock = asyncio.Lock()
+        self.capabilities = ()
+        self.uidvalidity = None
+        self.uidnext = None
+        self.highestmodseq = None
+        self.exists = None
+        self.expunged = 0
+
+    @property
+    def connected(self) -> bool:
+        """Return True while the connection is open."""
+        return self._writer is not None
+
+    async def connect(self) -> None:
+        """Open the connection and read the server greeting."""
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port, ssl=_ssl_context() if self._ssl else None
+        )
+        try:
+            greeting = await self._readline()
+            if not greeting.startswith(b"* OK"):
+                raise ConnectionError(f"Unexpected greeting: {greeting!r}")
+            await self._capability()
+        except BaseException:
+            self.close()
+            raise
+
+    async def login(self, user: str, pwd: str) -> tuple:
+        """Log in to the server.
+
+        Capabilities are read again, many servers only list extensions
+        like CONDSTORE once logged in.
+        Returns tuple of status and response data
+        """
+        value = await self._command("LOGIN", _quote(user), _quote(pwd))
+        if value[0] == "OK":
+            await self._capability()
+        return value
+
+    async def select(self, folder: str) -> tuple:
+        """Select a folder and record its UIDVALIDITY, UIDNEXT and size.
+
+        CONDSTORE is enabled when available so HIGHESTMODSEQ is reported.
+        Returns tuple of status and response data
+        """
+        self.uidvalidity = None
+        self.uidnext = None
+        self.highestmodseq = None
+        self.exists = None
+        self.expunged = 0
+        if "CONDSTORE" in self.capabilities:
+            return await self._command("SELECT", folder, "(CONDSTORE)")
+        return await self._command("SELECT", folder)
+
+    async def noop(self) -> tuple:
+        """Check the session is alive and collect changes to the folder.
+
+        Returns tuple of status and response data
+        """
+        return await self._command("NOOP")
+
+    async def uid(self, command: str, *args: str) -> tuple:
+        """Run a UID SEARCH or UID FETCH command.
+
+        Returns tuple of status and response data like imaplib
+        """
+        return await self._command("UID", command, *args, response=command)
+
+    async def logout(self) -> None:
+        """Log out and close the connection, ignoring errors."""
+        try:
+            await self._command("LOGOUT")
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Error logging out of IMAP server: %s", str(err))
+        self.close()
+
+    async def _capability(self) -> None:
+        """Read the capabilities of the server."""
+        (status, data) = await self._command("CAPABILITY")
+        if status == "OK" and data:
+            self.capabilities = tuple(data[-1].decode().upper().split())
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def _command(
+        self, name: str, *args: str, response: Optional[str] = None
+    ) -> tuple:
+        """Send a command and collect the untagged responses of its type.
+
+        Returns tuple of status and response data
+        """
+        if self._writer is None:
+            raise ConnectionError("Not connected")
+        response = (response or name).upper().encode()
+
+        async with self._lock:
+            self._tag += 1
+            tag = f"MP{self._tag:04d}".encode()
+            line = " ".join((name,) + args).encode()
+            data = []
+            try:
+                self._writer.write(tag + b" " + line + b"\r\n")
+                await self._writer.drain()
+                while True:
+                    line = await self._readline()
+                    if line.startswith(tag + b" "):
+                        status, _, text = line[len(tag) + 1 :].partition(b" ")
+                        if status != b"OK" or not data:
+                            data = data or [text]
+                        return status.decode(), data
+                    if not line.startswith(b"* "):
+                        continue
+                    parts = await self._read_response(line)
+                    match = UNTAGGED.match(parts[0][0] if parts else line)
+                    if match is None:
+                        continue
+                    self._track(match, line)
+                    if match.group(2).upper() == response:
+                        data.extend(_strip(parts, match))
+            except BaseException:
+                # A partly read response leaves the session unusable
+                self.close()
+                raise
+
+    def _track(self, match: re.Match, line: bytes) -> None:
+        """Update the folder state from an untagged response."""
+        name = match.group(2).upper()
+        if name == b"EXISTS":
+            self.exists = int(match.group(1))
+        elif name == b"EXPUNGE":
+            self.expunged += 1
+        for code, value in CODES.findall(line):
+            setattr(self, code.decode().lower(), int(value))
+        if name == b"FETCH" and (modseq := MODSEQ.search(line)) is not None:
+            self.highestmodseq = max(self.highestmodseq or 0, int(modseq.group(1)))
+
+    async def _read_response(self, line: bytes) -> list:
+        """Read the rest of a response whose first line is line.
+
+        Returns list of parts, tuples of line and literal like imaplib
+        """
+        parts = []
+        while (literal := LITERAL.search(line)) is not None:
+            parts.append((line, await self._reader.readexactly(int(literal[1]))))
+            line = await self._readline()
+        if parts:
+            parts.append(line)
+            return parts
+        return [(line,)]
+
+    async def _readline(self) -> bytes:
+        """Read one line without the line ending."""
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        return line.rstrip(b"\r\n")
+
+
+def _strip(parts: list, match: re.Match) -> list:
+    """Drop the '* ' and response name from the first line like imaplib.
+
+    Returns list of response parts
+    """
+    if match.group(1) is not None:
+        first = match.group(1) + b" " + match.group(3)
+    else:
+        first = match.group(3)
+
+    if len(parts[0]) == 1:
+        return [first] + parts[1:]
+    return [(first, parts[0][1])] + parts[1:]
@@ -1,11 +1,13 @@
 """Camera that loads a picture from a local file."""
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 
 import voluptuous as vol
-from homeassistant.components.camera import Camera
+from aiohttp import web
+from homeassistant.components.camera import Camera, async_get_still_stream
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_ENTITY_ID, CONF_HOST
 from homeassistant.core import ServiceCall
@@ -16,13 +18,17 @@ from .const import (
     ATTR_IMAGE_PATH,
     CAMERA,
     CAMERA_DATA,
+    CAMERA_VARIANTS,
     CONF_CUSTOM_IMG,
     CONF_CUSTOM_IMG_FILE,
+    CONF_DURATION,
     COORDINATOR,
+    DEFAULT_GIF_DURATION,
     DOMAIN,
     SENSOR_NAME,
     VERSION,
 )
+from .helpers import jpeg_frames, resize_image
 
 SERVICE_UPDATE_IMAGE = "update_image"
 _LOGGER = logging.getLogger(__name__)
@@ -106,20 +112,112 @@ class MailCam(Camera):
             if not config.data.get(CONF_CUSTOM_IMG)
             else config.data.get(CONF_CUSTOM_IMG_FILE)
         )
+        self._image = None
+        self._image_key = None
+        self._image_lock = asyncio.Lock()
+        self._variants = {}
+        self._frames = None
+        self._duration = config.data.get(CONF_DURATION) or DEFAULT_GIF_DURATION
 
     async def async_camera_image(
         self, width: int | None = None, height: int | None = None
     ) -> bytes | None:
-        """Return image response."""
+        """Return image response.
+
+        The image is kept in memory and only read again when the file
+        path, modification time or size changes.  Smaller sizes are
+        resized once and kept until the image changes.
+        """
+        async with self._image_lock:
+            image = await self._async_load_image()
+            if image is None or (width is None and height is None):
+                return image
+
+            size = (width, height)
+            if size not in self._variants:
+                if len(self._variants) >= CAMERA_VARIANTS:
+                    del self._variants[next(iter(self._variants))]
+                self._variants[size] = await self.hass.async_add_executor_job(
+                    resize_image, image, width, height
+                )
+            return self._variants[size] or image
+
+    async def handle_async_mjpeg_stream(
+        self, request: web.Request
+    ) -> web.StreamResponse | None:
+        """Serve the mail images one at a time as an MJPEG stream.
+
+        Streaming decoded frames spares clients decoding the animated gif,
+        each frame is shown for the configured image duration.
+        """
+        if self._type != "usps_camera":
+            return await super().handle_async_mjpeg_stream(request)
+
+        frame_number = 0
+
+        async def _next_frame() -> bytes | None:
+            """Return the next frame of the current image."""
+            nonlocal frame_number
+            async with self._image_lock:
+                await self._async_load_image()
+                if self._frames is None and self._image is not None:
+                    self._frames = await self.hass.async_add_executor_job(
+                        jpeg_frames, self._image
+                    )
+            if not self._frames:
+                return None
+            frame_number += 1
+            return self._frames[(frame_number - 1) % len(self._frames)]
+
+        return await async_get_still_stream(
+            request, _next_frame, "image/jpeg", self.frame_interval
+        )
+
+    @property
+    def frame_interval(self) -> float:
+        """Return the interval between frames of the mjpeg stream."""
+        if self._type == "usps_camera":
+            return float(self._duration)
+        return super().frame_interval
+
+    async def _async_load_image(self) -> bytes | None:
+        """Return the current image, reading it if the file changed."""
         try:
-            with open(self._file_path, "rb") as file:
-                return file.read()
+            key, image = await self.hass.async_add_executor_job(
+                self._read_image, self._file_path, self._image_key
+            )
         except FileNotFoundError:
             _LOGGER.warning(
                 "Could not read camera %s image from file: %s",
                 self._name,
                 self._file_path,
             )
+            self._image = None
+            self._image_key = None
+            self._variants.clear()
+            self._frames = None
+            return None
+
+        if key != self._image_key:
+            _LOGGER.debug("Camera %s image changed: %s", self._name, key[0])
+            self._image = image
+            self._image_key = key
+            self._variants.clear()
+            self._frames = None
+        return self._image
+
+    @staticmethod
+    def _read_image(file_path: str, key: tuple | None) -> tuple:
+        """Read the image file unless it is unchanged since key.
+
+        Returns tuple of the file key and content, None when unchanged
+        """
+        stat = os.stat(file_path)
+        new_key = (file_path, stat.st_mtime_ns, stat.st_size)
+        if new_key == key:
+            return key, None
+        with open(file_path, "rb") as file:
+            return new_key, file.read()
 
     def check_file_path_access(self, file_path: str) -> None:
         """Check that filepath given is readable."""
@@ -26,9 +26,12 @@ from .const import (
     CONF_FOLDER,
     CONF_GENERATE_MP4,
     CONF_IMAGE_SECURITY,
+    CONF_IMAP_IDLE,
     CONF_IMAP_TIMEOUT,
     CONF_PATH,
+    CONF_RESIZE_WORKERS,
     CONF_SCAN_INTERVAL,
+    CONF_VIDEO_ENCODER,
     DEFAULT_ALLOW_EXTERNAL,
     DEFAULT_AMAZON_DAYS,
     DEFAULT_AMAZON_FWDS,
@@ -37,13 +40,18 @@ from .const import (
     DEFAULT_FOLDER,
     DEFAULT_GIF_DURATION,
     DEFAULT_IMAGE_SECURITY,
+    DEFAULT_IMAP_IDLE,
     DEFAULT_IMAP_TIMEOUT,
     DEFAULT_PATH,
     DEFAULT_PORT,
+    DEFAULT_RESIZE_WORKERS,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_VIDEO_ENCODER,
     DOMAIN,
+    VIDEO_ENCODER_PYAV,
+    VIDEO_ENCODERS,
 )
-from .helpers import _check_ffmpeg, _test_login, get_resources, login
+from .helpers import _check_ffmpeg, _check_pyav, _test_login, get_resources, login
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -90,14 +98,13 @@ async def _validate_user_input(user_input: dict) -> tuple:
             user_input[CONF_AMAZON_FWDS] = amazon_list
             errors[CONF_AMAZON_FWDS] = status[0]
 
-    # Check for ffmpeg if option enabled
+    # Check for the mp4 encoder if option enabled
     if user_input[CONF_GENERATE_MP4]:
-        valid = await _check_ffmpeg()
-    else:
-        valid = True
-
-    if not valid:
-        errors[CONF_GENERATE_MP4] = "ffmpeg_not_found"
+        if user_input.get(CONF_VIDEO_ENCODER) == VIDEO_ENCODER_PYAV:
+            if not await _check_pyav():
+                errors[CONF_VIDEO_ENCODER] = "pyav_not_found"
+        elif not await _check_ffmpeg():
+            errors[CONF_GENERATE_MP4] = "ffmpeg_not_found"
 
     # validate custom file exists
     if user_input[CONF_CUSTOM_IMG] and CONF_CUSTOM_IMG_FILE in user_input:
@@ -121,7 +128,7 @@ async def _validate_user_input(user_input: dict) -> tuple:
 
 def _get_mailboxes(host: str, port: int, user: str, pwd: str) -> list:
     """Get list of mailbox folders from mail server."""
-    account = login(host, port, user, pwd)
+    account = login(host, port, user, pwd, DEFAULT_IMAP_TIMEOUT)
 
     status, folderlist = account.list()
     mailboxes = []
@@ -195,12 +202,19 @@ def _get_schema_step_2(data: list, user_input: list, default_dict: list) -> Any:
             vol.Optional(
                 CONF_IMAP_TIMEOUT, default=_get_default(CONF_IMAP_TIMEOUT)
             ): vol.All(vol.Coerce(int)),
+            vol.Optional(CONF_IMAP_IDLE, default=_get_default(CONF_IMAP_IDLE)): bool,
             vol.Optional(
                 CONF_DURATION, default=_get_default(CONF_DURATION)
             ): vol.Coerce(int),
+            vol.Optional(
+                CONF_RESIZE_WORKERS, default=_get_default(CONF_RESIZE_WORKERS)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
             vol.Optional(
                 CONF_GENERATE_MP4, default=_get_default(CONF_GENERATE_MP4)
             ): bool,
+            vol.Optional(
+                CONF_VIDEO_ENCODER, default=_get_default(CONF_VIDEO_ENCODER)
+            ): vol.In(VIDEO_ENCODERS),
             vol.Optional(
                 CONF_ALLOW_EXTERNAL, default=_get_default(CONF_ALLOW_EXTERNAL)
             ): bool,
@@ -298,11 +312,14 @@ class MailAndPackagesFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
             CONF_PATH: self.hass.config.path() + DEFAULT_PATH,
             CONF_DURATION: DEFAULT_GIF_DURATION,
+            CONF_RESIZE_WORKERS: DEFAULT_RESIZE_WORKERS,
             CONF_IMAGE_SECURITY: DEFAULT_IMAGE_SECURITY,
             CONF_IMAP_TIMEOUT: DEFAULT_IMAP_TIMEOUT,
+            CONF_IMAP_IDLE: DEFAULT_IMAP_IDLE,
             CONF_AMAZON_FWDS: DEFAULT_AMAZON_FWDS,
             CONF_AMAZON_DAYS: DEFAULT_AMAZON_DAYS,
             CONF_GENERATE_MP4: False,
+            CONF_VIDEO_ENCODER: DEFAULT_VIDEO_ENCODER,
             CONF_ALLOW_EXTERNAL: DEFAULT_ALLOW_EXTERNAL,
             CONF_CUSTOM_IMG: DEFAULT_CUSTOM_IMG,
         }
@@ -405,12 +422,19 @@ class MailAndPackagesOptionsFlow(config_entries.OptionsFlow):
             CONF_SCAN_INTERVAL: self._data.get(CONF_SCAN_INTERVAL),
             CONF_PATH: self._data.get(CONF_PATH),
             CONF_DURATION: self._data.get(CONF_DURATION),
+            CONF_RESIZE_WORKERS: self._data.get(
+                CONF_RESIZE_WORKERS, DEFAULT_RESIZE_WORKERS
+            ),
             CONF_IMAGE_SECURITY: self._data.get(CONF_IMAGE_SECURITY),
             CONF_IMAP_TIMEOUT: self._data.get(CONF_IMAP_TIMEOUT)
             or DEFAULT_IMAP_TIMEOUT,
+            CONF_IMAP_IDLE: self._data.get(CONF_IMAP_IDLE, DEFAULT_IMAP_IDLE),
             CONF_AMAZON_FWDS: self._data.get(CONF_AMAZON_FWDS) or DEFAULT_AMAZON_FWDS,
             CONF_AMAZON_DAYS: self._data.get(CONF_AMAZON_DAYS) or DEFAULT_AMAZON_DAYS,
             CONF_GENERATE_MP4: self._data.get(CONF_GENERATE_MP4),
+            CONF_VIDEO_ENCODER: self._data.get(
+                CONF_VIDEO_ENCODER, DEFAULT_VIDEO_ENCODER
+            ),
             CONF_ALLOW_EXTERNAL: self._data.get(CONF_ALLOW_EXTERNAL),
             CONF_RESOURCES: self._data.get(CONF_RESOURCES),
             CONF_CUSTOM_IMG: self._data.get(CONF_CUSTOM_IMG) or DEFAULT_CUSTOM_IMG,
@@ -15,8 +15,17 @@ PLATFORMS = ["camera", "sensor"]
 DATA = "data"
 COORDINATOR = "coordinator_mail"
 OVERLAY = ["overlay.png", "vignette.png", "white.png"]
+MAIL_FINGERPRINT = ".mail_fingerprint"
+IMAGE_STATE = ".image_state.json"
 SERVICE_UPDATE_FILE_PATH = "update_file_path"
 CAMERA = "cameras"
+HEADER_PARTS = "(INTERNALDATE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])"
+BODY_PARTS = "(BODY.PEEK[])"
+FETCH_BATCH_SIZE = 100
+MESSAGE_CACHE_SIZE = 32 * 1024 * 1024
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_CACHE_SIZE = 64
+INFORMED_DELIVERY_IGNORE = ["mailerProvidedImage", "ra_0", "Mail Attachment.txt"]
 
 # Attributes
 ATTR_AMAZON_IMAGE = "amazon_image"
@@ -29,6 +38,8 @@ ATTR_IMAGE = "image"
 ATTR_IMAGE_PATH = "image_path"
 ATTR_SERVER = "server"
 ATTR_IMAGE_NAME = "image_name"
+ATTR_MP4_STATUS = "mp4_status"
+ATTR_VIDEO_FRAMES = "video_frames"
 ATTR_EMAIL = "email"
 ATTR_SUBJECT = "subject"
 ATTR_BODY = "body"
@@ -46,6 +57,9 @@ CONF_DURATION = "gif_duration"
 CONF_SCAN_INTERVAL = "scan_interval"
 CONF_IMAGE_SECURITY = "image_security"
 CONF_IMAP_TIMEOUT = "imap_timeout"
+CONF_IMAP_IDLE = "imap_idle"
+CONF_RESIZE_WORKERS = "resize_workers"
+CONF_VIDEO_ENCODER = "video_encoder"
 CONF_GENERATE_MP4 = "generate_mp4"
 CONF_AMAZON_FWDS = "amazon_fwds"
 CONF_AMAZON_DAYS = "amazon_days"
@@ -58,7 +72,16 @@ DEFAULT_FOLDER = '"INBOX"'
 DEFAULT_PATH = "custom_components/mail_and_packages/images/"
 DEFAULT_IMAGE_SECURITY = True
 DEFAULT_IMAP_TIMEOUT = 30
+DEFAULT_IMAP_IDLE = False
+IMAP_IDLE_TIMEOUT = 1740  # Servers may drop IDLE after 30 minutes
+MP4_TIMEOUT = 120
+CAMERA_VARIANTS = 8  # Resized camera images kept per camera
+VIDEO_ENCODER_FFMPEG = "ffmpeg"
+VIDEO_ENCODER_PYAV = "pyav"
+VIDEO_ENCODERS = [VIDEO_ENCODER_FFMPEG, VIDEO_ENCODER_PYAV]
 DEFAULT_GIF_DURATION = 5
+DEFAULT_RESIZE_WORKERS = 1
+DEFAULT_VIDEO_ENCODER = VIDEO_ENCODER_FFMPEG
 DEFAULT_SCAN_INTERVAL = 5
 DEFAULT_GIF_FILE_NAME = "mail_today.gif"
 DEFAULT_AMAZON_FWDS = '""'
@@ -108,20 +131,135 @@ AMAZON_TIME_PATTERN = [
     "Dostawa:",
     "Zustellung:",
 ]
+AMAZON_TIME_PATTERN_END = [
+    "Previously expected:",
+    "Track your",
+    "Per tracciare il tuo pacco",
+    "View or manage order",
+]
 AMAZON_EXCEPTION_SUBJECT = "Delivery update:"
 AMAZON_EXCEPTION_BODY = "running late"
 AMAZON_EXCEPTION = "amazon_exception"
 AMAZON_EXCEPTION_ORDER = "amazon_exception_order"
 AMAZON_PATTERN = "[0-9]{3}-[0-9]{7}-[0-9]{7}"
-AMAZON_LANGS = [
-    "it_IT",
-    "it_IT.UTF-8",
-    "pl_PL",
-    "pl_PL.UTF-8",
-    "de_DE",
-    "de_DE.UTF-8",
-    "",
-]
+# Month and weekday names of the languages Amazon emails are sent in
+AMAZON_MONTHS = {
+    "en": [
+        "january",
+        "february",
+        "march",
+        "april",
+        "may",
+        "june",
+        "july",
+        "august",
+        "september",
+        "october",
+        "november",
+        "december",
+    ],
+    "it": [
+        "gennaio",
+        "febbraio",
+        "marzo",
+        "aprile",
+        "maggio",
+        "giugno",
+        "luglio",
+        "agosto",
+        "settembre",
+        "ottobre",
+        "novembre",
+        "dicembre",
+    ],
+    "pl": [
+        "stycznia",
+        "lutego",
+        "marca",
+        "kwietnia",
+        "maja",
+        "czerwca",
+        "lipca",
+        "sierpnia",
+        "września",
+        "października",
+        "listopada",
+        "grudnia",
+        "styczeń",
+        "luty",
+        "marzec",
+        "kwiecień",
+        "maj",
+        "czerwiec",
+        "lipiec",
+        "sierpień",
+        "wrzesień",
+        "październik",
+        "listopad",
+        "grudzień",
+    ],
+    "de": [
+        "januar",
+        "februar",
+        "märz",
+        "april",
+        "mai",
+        "juni",
+        "juli",
+        "august",
+        "september",
+        "oktober",
+        "november",
+        "dezember",
+    ],
+}
+AMAZON_WEEKDAYS = {
+    "en": [
+        "monday",
+        "tuesday",
+        "wednesday",
+        "thursday",
+        "friday",
+        "saturday",
+        "sunday",
+        "today",
+        "tomorrow",
+    ],
+    "it": [
+        "lunedì",
+        "martedì",
+        "mercoledì",
+        "giovedì",
+        "venerdì",
+        "sabato",
+        "domenica",
+        "oggi",
+        "domani",
+    ],
+    "pl": [
+        "poniedziałek",
+        "wtorek",
+        "środa",
+        "czwartek",
+        "piątek",
+        "sobota",
+        "niedziela",
+        "dzisiaj",
+        "dziś",
+        "jutro",
+    ],
+    "de": [
+        "montag",
+        "dienstag",
+        "mittwoch",
+        "donnerstag",
+        "freitag",
+        "samstag",
+        "sonntag",
+        "heute",
+        "morgen",
+    ],
+}
 
 # Sensor Data
 SENSOR_DATA = {
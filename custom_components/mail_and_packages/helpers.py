@@ -1,23 +1,40 @@
 """Helper functions for Mail and Packages."""
 
+import asyncio
+import base64
 import datetime
 import email
+import email.errors
 import hashlib
 import imaplib
-import locale
+import importlib.util
+import itertools
+import json
 import logging
 import os
 import quopri
 import re
-import subprocess  # nosec
+import select
+import socket
+import ssl
+import threading
+import time
 import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import timezone
-from email.header import decode_header
-from shutil import copyfile, copytree, which
-from typing import Any, List, Optional, Type, Union
+from email.header import decode_header, make_header
+from fractions import Fraction
+from functools import partial
+from io import BytesIO
+from shutil import copyfile, copytree, ignore_patterns, which
+from typing import Any, Callable, Iterator, List, Optional, Type, Union
 
 import aiohttp
 import imageio as io
+import numpy
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     CONF_HOST,
@@ -27,9 +44,10 @@ from homeassistant.const import (
     CONF_USERNAME,
 )
 from homeassistant.core import HomeAssistant
-from PIL import Image
+from PIL import Image, ImageSequence
 from resizeimage import resizeimage
 
+from .aioimap import AsyncImapClient
 from .const import (
     AMAZON_DELIVERED,
     AMAZON_DELIVERED_SUBJECT,
@@ -45,12 +63,14 @@ from .const import (
     AMAZON_HUB_SUBJECT,
     AMAZON_HUB_SUBJECT_SEARCH,
     AMAZON_IMG_PATTERN,
-    AMAZON_LANGS,
+    AMAZON_MONTHS,
     AMAZON_ORDER,
     AMAZON_PACKAGES,
     AMAZON_PATTERN,
     AMAZON_SHIPMENT_TRACKING,
     AMAZON_TIME_PATTERN,
+    AMAZON_TIME_PATTERN_END,
+    AMAZON_WEEKDAYS,
     ATTR_AMAZON_IMAGE,
     ATTR_BODY,
     ATTR_CODE,
@@ -63,6 +83,8 @@ from .const import (
     ATTR_SUBJECT,
     ATTR_TRACKING,
     ATTR_USPS_MAIL,
+    ATTR_VIDEO_FRAMES,
+    BODY_PARTS,
     CONF_ALLOW_EXTERNAL,
     CONF_AMAZON_DAYS,
     CONF_AMAZON_FWDS,
@@ -71,12 +93,27 @@ from .const import (
     CONF_DURATION,
     CONF_FOLDER,
     CONF_GENERATE_MP4,
+    CONF_IMAP_TIMEOUT,
     CONF_PATH,
+    CONF_RESIZE_WORKERS,
+    CONF_VIDEO_ENCODER,
     DEFAULT_AMAZON_DAYS,
+    DEFAULT_IMAP_TIMEOUT,
+    DEFAULT_RESIZE_WORKERS,
+    FETCH_BATCH_SIZE,
+    HASH_BUFFER_SIZE,
+    HASH_CACHE_SIZE,
+    HEADER_PARTS,
+    IMAGE_STATE,
+    INFORMED_DELIVERY_IGNORE,
+    MAIL_FINGERPRINT,
+    MESSAGE_CACHE_SIZE,
+    MP4_TIMEOUT,
     OVERLAY,
     SENSOR_DATA,
     SENSOR_TYPES,
     SHIPPERS,
+    VIDEO_ENCODER_PYAV,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -104,6 +141,14 @@ async def _check_ffmpeg() -> bool:
     return which("ffmpeg")
 
 
+async def _check_pyav() -> bool:
+    """Check if PyAV is installed for in-process encoding.
+
+    Returns boolean
+    """
+    return importlib.util.find_spec("av") is not None
+
+
 async def _test_login(host: str, port: int, user: str, pwd: str) -> bool:
     """Test IMAP login to specified server.
 
@@ -111,7 +156,7 @@ async def _test_login(host: str, port: int, user: str, pwd: str) -> bool:
     """
     # Attempt to catch invalid mail server hosts
     try:
-        account = imaplib.IMAP4_SSL(host, port)
+        account = imaplib.IMAP4_SSL(host, port, timeout=DEFAULT_IMAP_TIMEOUT)
     except Exception as err:
         _LOGGER.error("Error connecting into IMAP Server: %s", str(err))
         return False
@@ -138,9 +183,15 @@ def default_image_path(
     return "custom_components/mail_and_packages/images/"
 
 
-def process_emails(hass: HomeAssistant, config: ConfigEntry) -> dict:
+def process_emails(
+    hass: HomeAssistant,
+    config: ConfigEntry,
+    connection: Optional["ImapConnection"] = None,
+) -> dict:
     """Process emails and return value.
 
+    Uses the persistent connection if one is passed in, otherwise logs in
+    and out for this run only.
     Returns dict containing sensor data
     """
     host = config.get(CONF_HOST)
@@ -148,21 +199,95 @@ def process_emails(hass: HomeAssistant, config: ConfigEntry) -> dict:
     user = config.get(CONF_USERNAME)
     pwd = config.get(CONF_PASSWORD)
     folder = config.get(CONF_FOLDER)
-    resources = config.get(CONF_RESOURCES)
 
     # Create the dict container
     data = {}
 
-    # Login to email server and select the folder
-    account = login(host, port, user, pwd)
+    # Use a one-off session when no persistent connection is provided
+    close_after = connection is None
+    if connection is None:
+        connection = ImapConnection(
+            host, port, user, pwd, folder, config.get(CONF_IMAP_TIMEOUT)
+        )
+
+    try:
+        # Prefetched messages only need the server for anything missed
+        account = None
+        if not connection.sync.prefetched:
+            # Login to email server and select the folder
+            account = connection.account()
+
+            # Do not process if account returns false
+            if not account:
+                return data
+
+        with connection.sync.session(account, connection.account) as synced:
+            # Find the messages of every enabled sensor with a single search
+            if not synced.scanned:
+                synced.scan(*scan_criteria(config))
+            _process_account(hass, config, synced, data)
+    finally:
+        if close_after:
+            connection.close()
 
-    # Do not process if account returns false
-    if not account:
-        return data
+    return data
+
+
+def scan_criteria(config: ConfigEntry) -> tuple:
+    """Collect the sender addresses and oldest date the enabled sensors search.
+
+    Returns tuple of address list and search date
+    """
+    resources = config.get(CONF_RESOURCES)
+    fwds = _process_amazon_forwards(config.get(CONF_AMAZON_FWDS))
+    fwds.extend(fwd.strip('"') for fwd in list(fwds))
+    date = get_formatted_date()
+    sensors = []
+    addresses = []
+
+    for sensor in resources:
+        if sensor.endswith("_packages"):
+            prefix = sensor.replace("_packages", "")
+            sensors.extend([f"{prefix}_delivered", f"{prefix}_delivering"])
+        else:
+            sensors.append(sensor)
+
+    for sensor in sensors:
+        if sensor in SENSOR_DATA and ATTR_EMAIL in SENSOR_DATA[sensor]:
+            addresses.extend(SENSOR_DATA[sensor][ATTR_EMAIL])
+
+    if AMAZON_DELIVERED in resources or AMAZON_EXCEPTION in resources:
+        addresses.extend(
+            f"{AMAZON_EMAIL}{domain}" for domain in AMAZON_DOMAINS if "@" not in domain
+        )
+        addresses.extend(fwds)
+
+    if AMAZON_HUB in resources:
+        addresses.extend(AMAZON_HUB_EMAIL)
+        addresses.extend(fwds)
+
+    if AMAZON_PACKAGES in resources:
+        for domain in AMAZON_DOMAINS:
+            if "@" in domain:
+                continue
+            addresses.extend(
+                f"{address}@{domain}" for address in AMAZON_SHIPMENT_TRACKING
+            )
+        addresses.extend(fwds)
+        days = config.get(CONF_AMAZON_DAYS) or DEFAULT_AMAZON_DAYS
+        past_date = datetime.date.today() - datetime.timedelta(days=days)
+        date = past_date.strftime("%d-%b-%Y")
+
+    # Remove duplicates keeping order
+    addresses = list(dict.fromkeys(addresses))
+    return addresses, date
 
-    if not selectfolder(account, folder):
-        # Bail out on error
-        return data
+
+def _process_account(
+    hass: HomeAssistant, config: ConfigEntry, account: Any, data: dict
+) -> None:
+    """Update data with sensor values read from a logged in account."""
+    resources = config.get(CONF_RESOURCES)
 
     # Create image file name dict container
     _image = {}
@@ -190,14 +315,14 @@ def process_emails(hass: HomeAssistant, config: ConfigEntry) -> dict:
     if config.get(CONF_ALLOW_EXTERNAL):
         copy_images(hass, config)
 
-    return data
-
 
 def copy_images(hass: HomeAssistant, config: ConfigEntry) -> None:
     """Copy images to www directory if enabled."""
     paths = []
     src = f"{hass.config.path()}/{config.get(CONF_PATH)}"
     dst = f"{hass.config.path()}/www/mail_and_packages/"
+    # State records of the image directory are not published
+    private = (IMAGE_STATE, MAIL_FINGERPRINT)
 
     # Setup paths list
     paths.append(dst)
@@ -214,9 +339,12 @@ def copy_images(hass: HomeAssistant, config: ConfigEntry) -> None:
                 _LOGGER.error("Problem creating: %s, error returned: %s", path, err)
                 return
         cleanup_images(path)
+        for name in private:
+            if os.path.isfile(path + name):
+                os.remove(path + name)
 
     try:
-        copytree(src, dst, dirs_exist_ok=True)
+        copytree(src, dst, dirs_exist_ok=True, ignore=ignore_patterns(*private))
     except Exception as err:
         _LOGGER.error(
             "Problem copying files from %s to %s error returned: %s", src, dst, err
@@ -229,6 +357,8 @@ def image_file_name(
 ) -> str:
     """Determine if filename is to be changed or not.
 
+    The chosen name is recorded in the image directory so later calls the
+    same day only read that record instead of hashing every image.
     Returns filename
     """
     mail_none = None
@@ -256,69 +386,153 @@ def image_file_name(
             _LOGGER.error("Problem creating: %s, error returned: %s", path, err)
             return image_name
 
-    # SHA1 file hash check
+    ext = None
+    ext = ".jpg" if amazon else ".gif"
+    today = get_formatted_date()
+
+    # Keep the recorded name for the rest of the day
+    state = _load_image_state(path)
+    if state is not None and state["placeholder"] == mail_none:
+        current = os.path.join(path, state["name"])
+        if state["created"] == today and os.path.isfile(current):
+            _LOGGER.debug("Image Name: %s", state["name"])
+            return state["name"]
+
+        # A file still showing the placeholder can keep its name
+        try:
+            if hash_file(current, fast=True) == state["hash"]:
+                _save_image_state(path, {**state, "created": today})
+                _LOGGER.debug("Image Name: %s", state["name"])
+                return state["name"]
+        except OSError:
+            pass
+
+    # Placeholder file hash check
     try:
-        sha1 = hash_file(mail_none)
+        placeholder_hash = hash_file(mail_none, fast=True)
     except OSError as err:
         _LOGGER.error("Problem accessing file: %s, error returned: %s", mail_none, err)
         return image_name
 
-    ext = None
-    ext = ".jpg" if amazon else ".gif"
-
-    for file in os.listdir(path):
-        if file.endswith(".gif") or (file.endswith(".jpg") and amazon):
-            try:
-                created = datetime.datetime.fromtimestamp(
-                    os.path.getctime(os.path.join(path, file))
-                ).strftime("%d-%b-%Y")
-            except OSError as err:
-                _LOGGER.error(
-                    "Problem accessing file: %s, error returned: %s", file, err
-                )
-                return image_name
-            today = get_formatted_date()
-            _LOGGER.debug("Created: %s, Today: %s", created, today)
-            # If image isn't mail_none and not created today,
-            # return a new filename
-            if sha1 != hash_file(os.path.join(path, file)) and today != created:
-                image_name = f"{str(uuid.uuid4())}{ext}"
-            else:
-                image_name = file
-
-    # If we find no images in the image directory generate a new filename
-    if image_name in mail_none:
+    files = []
+    if state is not None:
+        # New day or new placeholder, start a new image
         image_name = f"{str(uuid.uuid4())}{ext}"
-    _LOGGER.debug("Image Name: %s", image_name)
+    else:
+        # Without a record look for an image from today
+        files = os.listdir(path)
+        for file in files:
+            if file.endswith(".gif") or (file.endswith(".jpg") and amazon):
+                try:
+                    created = datetime.datetime.fromtimestamp(
+                        os.path.getctime(os.path.join(path, file))
+                    ).strftime("%d-%b-%Y")
+                except OSError as err:
+                    _LOGGER.error(
+                        "Problem accessing file: %s, error returned: %s", file, err
+                    )
+                    return image_name
+                _LOGGER.debug("Created: %s, Today: %s", created, today)
+                # If image isn't mail_none and not created today,
+                # return a new filename
+                if (
+                    placeholder_hash != hash_file(os.path.join(path, file), fast=True)
+                    and today != created
+                ):
+                    image_name = f"{str(uuid.uuid4())}{ext}"
+                else:
+                    image_name = file
 
-    # Insert place holder image
-    _LOGGER.debug("Copying %s to %s", mail_none, os.path.join(path, image_name))
+        # If we find no images in the image directory generate a new filename
+        if image_name in mail_none:
+            image_name = f"{str(uuid.uuid4())}{ext}"
+    _LOGGER.debug("Image Name: %s", image_name)
 
-    copyfile(mail_none, os.path.join(path, image_name))
+    # An existing image is either the placeholder or today's mail,
+    # overwriting it would hide an image get_mails does not regenerate
+    if image_name not in files:
+        # Insert place holder image
+        _LOGGER.debug("Copying %s to %s", mail_none, os.path.join(path, image_name))
+        copyfile(mail_none, os.path.join(path, image_name))
+    _save_image_state(
+        path,
+        {
+            "name": image_name,
+            "created": today,
+            "hash": placeholder_hash,
+            "placeholder": mail_none,
+        },
+    )
 
     return image_name
 
 
-def hash_file(filename: str) -> str:
+def _load_image_state(path: str) -> Optional[dict]:
+    """Read the image name record of an image directory.
+
+    Returns dict of name, created date, placeholder hash and path or None
+    """
+    try:
+        with open(os.path.join(path, IMAGE_STATE), encoding="utf-8") as the_file:
+            state = json.load(the_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or any(
+        key not in state for key in ("name", "created", "hash", "placeholder")
+    ):
+        return None
+    return state
+
+
+def _save_image_state(path: str, state: dict) -> None:
+    """Record the image name of an image directory."""
+    try:
+        with open(os.path.join(path, IMAGE_STATE), "w", encoding="utf-8") as the_file:
+            json.dump(state, the_file)
+    except OSError as err:
+        _LOGGER.debug("Unable to store image state: %s", str(err))
+
+
+_HASH_CACHE = OrderedDict()
+_HASH_CACHE_LOCK = threading.Lock()
+
+
+def hash_file(filename: str, fast: bool = False) -> str:
     """Return the SHA-1 hash of the file passed into it.
 
+    With fast a CRC-32 is returned instead, enough to notice a change.
+    Hashes are remembered until the file's size, modification time or
+    inode changes.
     Returns hash of file as string
     """
-    # make a hash object
-    the_hash = hashlib.sha1()  # nosec
+    stat = os.stat(filename)
+    key = (filename, stat.st_size, stat.st_mtime_ns, stat.st_ino, fast)
+    with _HASH_CACHE_LOCK:
+        if key in _HASH_CACHE:
+            _HASH_CACHE.move_to_end(key)
+            return _HASH_CACHE[key]
 
     # open file for reading in binary mode
     with open(filename, "rb") as file:
+        if fast:
+            crc = 0
+            while chunk := file.read(HASH_BUFFER_SIZE):
+                crc = zlib.crc32(chunk, crc)
+            digest = f"{crc:08x}"
+        elif hasattr(hashlib, "file_digest"):
+            digest = hashlib.file_digest(file, "sha1").hexdigest()
+        else:
+            the_hash = hashlib.sha1()  # nosec
+            while chunk := file.read(HASH_BUFFER_SIZE):
+                the_hash.update(chunk)
+            digest = the_hash.hexdigest()
 
-        # loop till the end of the file
-        chunk = 0
-        while chunk != b"":
-            # read only 1024 bytes at a time
-            chunk = file.read(1024)
-            the_hash.update(chunk)
-
-    # return the hex representation of digest
-    return the_hash.hexdigest()
+    # Hashing runs unlocked, executor threads share the cache
+    with _HASH_CACHE_LOCK:
+        _HASH_CACHE[key] = digest
+        if len(_HASH_CACHE) > HASH_CACHE_SIZE:
+            _HASH_CACHE.popitem(last=False)
+    return digest
 
 
 def fetch(
@@ -330,11 +544,11 @@ def fetch(
     """
     img_out_path = f"{hass.config.path()}/{config.get(CONF_PATH)}"
     gif_duration = config.get(CONF_DURATION)
-    generate_mp4 = config.get(CONF_GENERATE_MP4)
     amazon_fwds = config.get(CONF_AMAZON_FWDS)
     image_name = data[ATTR_IMAGE_NAME]
     amazon_image_name = data[ATTR_AMAZON_IMAGE]
     amazon_days = config.get(CONF_AMAZON_DAYS)
+    resize_workers = config.get(CONF_RESIZE_WORKERS, DEFAULT_RESIZE_WORKERS)
 
     if config.get(CONF_CUSTOM_IMG):
         nomail = config.get(CONF_CUSTOM_IMG_FILE)
@@ -347,14 +561,24 @@ def fetch(
     count = {}
 
     if sensor == "usps_mail":
+        # PyAV encodes in the background from the frames of the gif
+        video_frames = None
+        if (
+            config.get(CONF_GENERATE_MP4)
+            and config.get(CONF_VIDEO_ENCODER) == VIDEO_ENCODER_PYAV
+        ):
+            video_frames = []
         count[sensor] = get_mails(
             account,
             img_out_path,
             gif_duration,
             image_name,
-            generate_mp4,
             nomail,
+            resize_workers,
+            video_frames,
         )
+        if video_frames:
+            count[ATTR_VIDEO_FRAMES] = video_frames
     elif sensor == AMAZON_PACKAGES:
         count[sensor] = get_items(
             account=account,
@@ -413,7 +637,7 @@ def fetch(
 
 
 def login(
-    host: str, port: int, user: str, pwd: str
+    host: str, port: int, user: str, pwd: str, timeout: Optional[float] = None
 ) -> Union[bool, Type[imaplib.IMAP4_SSL]]:
     """Login to IMAP server.
 
@@ -421,7 +645,7 @@ def login(
     """
     # Catch invalid mail server / host names
     try:
-        account = imaplib.IMAP4_SSL(host, port)
+        account = imaplib.IMAP4_SSL(host, port, timeout=timeout)
 
     except Exception as err:
         _LOGGER.error("Network error while connecting to server: %s", str(err))
@@ -437,6 +661,846 @@ def login(
     return account
 
 
+class ImapConnection:
+    """Authenticated IMAP session kept alive between coordinator refreshes."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        pwd: str,
+        folder: str,
+        timeout: Optional[float] = None,
+    ):
+        """Initialize."""
+        self._host = host
+        self._port = port
+        self._user = user
+        self._pwd = pwd
+        self._folder = folder
+        self._timeout = timeout
+        self._account = None
+        self._client = None
+        self.sync = MailboxSync(timeout, folder)
+
+    def account(self) -> Union[bool, Type[imaplib.IMAP4_SSL]]:
+        """Return a logged in account with the folder selected.
+
+        The current session is checked with NOOP and replaced if it is dead.
+        Returns account object or False on error
+        """
+        if self._account is not None:
+            try:
+                status = self._account.noop()[0]
+            except Exception as err:
+                _LOGGER.debug("IMAP session check failed: %s", str(err))
+                status = "BAD"
+            if status == "OK":
+                return self._account
+            _LOGGER.debug("IMAP session lost, reconnecting to %s", self._host)
+            self.close()
+
+        account = login(self._host, self._port, self._user, self._pwd, self._timeout)
+        if not account:
+            return False
+
+        if not selectfolder(account, self._folder):
+            _logout(account)
+            return False
+
+        self.sync.validate(_uidvalidity(account))
+        self._account = account
+        return account
+
+    def close(self) -> None:
+        """Log out and drop the current session."""
+        if self._account is None:
+            return
+        _logout(self._account)
+        self._account = None
+
+    async def async_prefetch(self, config: ConfigEntry, checked: bool = False) -> bool:
+        """Download the headers of the next refresh on the event loop.
+
+        Only the search and headers are fetched ahead.  Which bodies and
+        parts a sensor reads depends on what it parsed so far, so the
+        sensors still request those from their executor thread, which
+        blocks until the loop's session returns them.
+        With checked the session async_state just checked is used as is.
+        Returns True when process_emails can run without imaplib
+        """
+        try:
+            client = self._client if checked else await self._async_client()
+            if client is not None:
+                await self.sync.async_prefetch(client, *scan_criteria(config))
+        except Exception as err:
+            _LOGGER.debug("Unable to prefetch messages: %s", str(err))
+            await self.async_close()
+        if self.sync.prefetched:
+            self.sync.remote = partial(
+                self._fetch_threadsafe, asyncio.get_running_loop()
+            )
+        return self.sync.prefetched
+
+    def _fetch_threadsafe(
+        self, loop: asyncio.AbstractEventLoop, num: str, parts: str
+    ) -> tuple:
+        """Run UID FETCH on the async session from an executor thread.
+
+        The calling thread blocks until the response arrives, this only
+        shares the session with the loop and is not asynchronous I/O for
+        the sensors.
+        Returns tuple of status and response data
+        """
+        if self._client is None:
+            raise ConnectionError("IMAP session not available")
+        future = asyncio.run_coroutine_threadsafe(
+            self._client.uid("FETCH", num, parts), loop
+        )
+        try:
+            return future.result(self._timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def async_state(self) -> Optional[tuple]:
+        """Return a fingerprint of the folder contents for today.
+
+        The NOOP checking the session collects new and expunged messages,
+        HIGHESTMODSEQ is included when the server supports CONDSTORE.
+        Returns None when unavailable
+        """
+        try:
+            client = await self._async_client()
+        except Exception as err:
+            _LOGGER.debug("Unable to read folder state: %s", str(err))
+            await self.async_close()
+            return None
+
+        if client is None or client.exists is None:
+            return None
+        return (
+            get_formatted_date(),
+            client.uidvalidity,
+            client.exists,
+            client.expunged,
+            client.uidnext,
+            client.highestmodseq,
+        )
+
+    async def _async_client(self) -> Optional[AsyncImapClient]:
+        """Return a logged in async client with the folder selected.
+
+        An existing session is checked with NOOP.
+        """
+        if self._client is not None:
+            if self._client.connected and (await self._client.noop())[0] == "OK":
+                return self._client
+            await self.async_close()
+
+        client = AsyncImapClient(self._host, self._port)
+        await client.connect()
+        if (await client.login(self._user, self._pwd))[0] != "OK" or (
+            await client.select(self._folder)
+        )[0] != "OK":
+            _LOGGER.debug("Unable to log in or select folder, not prefetching")
+            await client.logout()
+            return None
+
+        if client.uidvalidity is None:
+            # Nothing can be cached, use the regular session
+            await client.logout()
+            return None
+
+        self.sync.validate(client.uidvalidity)
+        self._client = client
+        return client
+
+    async def async_close(self) -> None:
+        """Log out of the async session."""
+        if self._client is None:
+            return
+        await self._client.logout()
+        self._client = None
+
+    def idle(self, timeout: float) -> Optional[bool]:
+        """Wait for new mail in the folder with IMAP IDLE.
+
+        Returns True on new mail, False on timeout and None when IDLE
+        can not be used
+        """
+        account = self.account()
+        if not account:
+            return None
+        try:
+            return idle_wait(account, timeout)
+        except Exception as err:
+            _LOGGER.debug("IMAP IDLE interrupted: %s", str(err))
+            self.close()
+            return None
+
+    def abort(self) -> None:
+        """Interrupt a blocking call on the session from another thread."""
+        if self._account is not None:
+            _abort(self._account)
+
+
+def idle_wait(account: Type[imaplib.IMAP4_SSL], timeout: float) -> Optional[bool]:
+    """Run IMAP IDLE until the server reports new mail or timeout passes.
+
+    Returns True on new mail, False on timeout and None if IDLE is unsupported
+    """
+    if "IDLE" not in account.capabilities:
+        return None
+
+    tag = account._new_tag()  # pylint: disable=protected-access
+    account.send(tag + b" IDLE\r\n")
+    if not account.readline().startswith(b"+"):
+        _LOGGER.debug("Server refused IDLE")
+        return None
+
+    changed = False
+    deadline = time.monotonic() + timeout
+    sock = account.socket()
+    while not changed:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not _buffered(account) and not select.select([sock], [], [], remaining)[0]:
+            break
+        line = account.readline()
+        if not line:
+            raise ConnectionResetError("Connection closed during IDLE")
+        _LOGGER.debug("IDLE response: %s", line.strip())
+        changed = re.match(rb"\* \d+ (EXISTS|RECENT)", line) is not None
+
+    account.send(b"DONE\r\n")
+    while not (line := account.readline()).startswith(tag):
+        if not line:
+            raise ConnectionResetError("Connection closed ending IDLE")
+    return changed
+
+
+def _buffered(account: Type[imaplib.IMAP4_SSL]) -> bool:
+    """Return True when response data is waiting to be read.
+
+    imaplib reads lines through a buffered file, select can not see data
+    that already arrived with an earlier line.
+    """
+    sock = account.socket()
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(account.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+class MessageCache:
+    """Downloaded and parsed emails, least recently used first.
+
+    Parsed emails and their decoded text parts are keyed by (folder,
+    UIDVALIDITY, UID), raw FETCH responses by (folder, UIDVALIDITY, UID,
+    parts).  Both count against one size limit.
+    """
+
+    def __init__(self, max_size: int = MESSAGE_CACHE_SIZE) -> None:
+        """Initialize."""
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of cache entries."""
+        return len(self._entries)
+
+    def message(self, key: tuple, raw: bytes) -> email.message.Message:
+        """Return the parsed email, parsing raw on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [email.message_from_bytes(raw), None, len(raw)]
+        self._add(key, entry)
+        return entry[0]
+
+    def text_parts(self, key: tuple, msg: email.message.Message) -> list:
+        """Return the decoded text/html and text/plain parts of a cached email.
+
+        Returns list of tuples of content type and text
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None:
+            return entry[1]
+        texts = _text_parts(msg)
+        if entry is not None and entry[0] is msg:
+            entry[1] = texts
+        return texts
+
+    def response(self, key: tuple) -> Optional[list]:
+        """Return a stored FETCH response, None when not held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def store(self, key: tuple, response: list) -> None:
+        """Keep the FETCH response of an email."""
+        size = sum(
+            len(part)
+            for item in response
+            for part in (item if isinstance(item, tuple) else (item,))
+        )
+        self._add(key, [response, None, size])
+
+    def responses(self, folder: str) -> list:
+        """Return the keys of the FETCH responses held for folder."""
+        return [key for key in self._entries if len(key) == 4 and key[0] == folder]
+
+    def discard(self, key: tuple) -> None:
+        """Drop an entry if present."""
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate(self, folder: str, uidvalidity: Optional[int]) -> None:
+        """Drop the emails of folder from any other UIDVALIDITY."""
+        for key in [key for key in self._entries if key[0] == folder]:
+            if key[1] != uidvalidity:
+                self._remove(key)
+
+    def _add(self, key: tuple, entry: list) -> None:
+        """Store entry as the most recently used and evict the oldest."""
+        if key in self._entries:
+            self.size -= self._entries[key][2]
+        self.size += entry[2]
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while self.size > self.max_size and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: tuple) -> None:
+        """Drop an entry."""
+        self.size -= self._entries.pop(key)[2]
+
+
+def _text_parts(msg: email.message.Message) -> list:
+    """Decode the text/html and text/plain parts of an email.
+
+    Returns list of tuples of content type and text
+    """
+    texts = []
+    for part in msg.walk():
+        if part.get_content_type() not in ["text/html", "text/plain"]:
+            continue
+        payload = part.get_payload(decode=True)
+        if payload is not None:
+            texts.append((part.get_content_type(), payload.decode("utf-8", "ignore")))
+    return texts
+
+
+def parse_email(
+    account: Type[imaplib.IMAP4_SSL], num: int, raw: bytes
+) -> email.message.Message:
+    """Parse a downloaded email, reusing the result of earlier refreshes.
+
+    Returns email message
+    """
+    if isinstance(account, MailboxSync):
+        return account.parse(num, raw)
+    return email.message_from_bytes(raw)
+
+
+def text_parts(
+    account: Type[imaplib.IMAP4_SSL], num: int, msg: email.message.Message
+) -> list:
+    """Return the decoded text parts of an email from parse_email.
+
+    Returns list of tuples of content type and text
+    """
+    if isinstance(account, MailboxSync):
+        return account.text_parts(num, msg)
+    return _text_parts(msg)
+
+
+class MailboxSync:
+    """Incremental UID sync state for the selected folder.
+
+    Records UIDVALIDITY and the UIDs the last scan found.  A repeated scan
+    only searches those and UIDs above the highest of them.  During a
+    refresh it stands in for the IMAP account and answers UID FETCH for
+    messages the cache still holds, so only new messages go over the network.
+    """
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        folder: str = "",
+        cache: Optional[MessageCache] = None,
+    ) -> None:
+        """Initialize."""
+        self.deadline = deadline
+        self.folder = folder
+        self.cache = cache if cache is not None else MessageCache()
+        self.uidvalidity = None
+        self.highest_uid = 0
+        self.prefetched = False
+        self.remote = None
+        self.failed = False
+        self._scan_search = None
+        self._scan_uids = []
+        self._account = None
+        self._connect = None
+        self._used = set()
+        self._index = {}
+        self._scanned = set()
+        self._since = None
+
+    def begin(self) -> None:
+        """Start a refresh."""
+        self.failed = False
+        self._used = set()
+        self._index = {}
+        self._scanned = set()
+        self._since = None
+
+    @property
+    def scanned(self) -> bool:
+        """Return True once the mailbox scan of this refresh has run."""
+        return self._since is not None
+
+    def validate(self, uidvalidity: Optional[int]) -> None:
+        """Forget downloaded messages when the folder UIDVALIDITY changes."""
+        if uidvalidity != self.uidvalidity:
+            if self.uidvalidity is not None:
+                _LOGGER.debug(
+                    "UIDVALIDITY changed from %s to %s, clearing message cache",
+                    self.uidvalidity,
+                    uidvalidity,
+                )
+            self.highest_uid = 0
+            self._scan_search = None
+            self._scan_uids = []
+            self.cache.invalidate(self.folder, uidvalidity)
+        self.uidvalidity = uidvalidity
+
+    def parse(self, num: int, raw: bytes) -> email.message.Message:
+        """Parse a downloaded email through the message cache.
+
+        Returns email message
+        """
+        if self.uidvalidity is None:
+            return email.message_from_bytes(raw)
+        return self.cache.message((self.folder, self.uidvalidity, int(num)), raw)
+
+    def text_parts(self, num: int, msg: email.message.Message) -> list:
+        """Return the decoded text parts of a parsed email.
+
+        Returns list of tuples of content type and text
+        """
+        if self.uidvalidity is None:
+            return _text_parts(msg)
+        return self.cache.text_parts((self.folder, self.uidvalidity, int(num)), msg)
+
+    @contextmanager
+    def session(
+        self,
+        account: Optional[Type[imaplib.IMAP4_SSL]],
+        connect: Optional[Callable] = None,
+    ) -> Iterator["MailboxSync"]:
+        """Use the sync state in place of account for one refresh.
+
+        Without an account connect is called the first time the server is
+        needed.  Messages no search asked for during a successful refresh
+        are dropped.
+        """
+        if not self.prefetched:
+            self.begin()
+        self._account = account
+        self._connect = connect
+        highest_uid = self.highest_uid
+        try:
+            yield self
+            responses = self.cache.responses(self.folder)
+            for key in responses:
+                if key[1] != self.uidvalidity or key[2:] not in self._used:
+                    self.cache.discard(key)
+            _LOGGER.debug(
+                "Sync complete, %s message(s) cached, highest UID %s (was %s)",
+                len(self.cache.responses(self.folder)),
+                self.highest_uid,
+                highest_uid,
+            )
+        finally:
+            self._account = None
+            self._connect = None
+            self.prefetched = False
+            self.remote = None
+
+    async def async_prefetch(
+        self, client: AsyncImapClient, addresses: list, date: str
+    ) -> None:
+        """Scan the messages of this refresh on the event loop.
+
+        Fills the same index as scan, only headers are downloaded.
+        """
+        self.begin()
+        utf8_flag, search = build_search(addresses, date)
+        if not addresses or utf8_flag:
+            return
+
+        (server_response, data) = await client.uid("SEARCH", self._scan_query(search))
+        if server_response != "OK":
+            return
+
+        nums = [int(num) for num in data[0].split()]
+        responses = {
+            num: self.cache.response(self._key(num, HEADER_PARTS)) for num in nums
+        }
+        missing = [num for num, response in responses.items() if response is None]
+        for start in range(0, len(missing), FETCH_BATCH_SIZE):
+            batch = missing[start : start + FETCH_BATCH_SIZE]
+            (server_response, data) = await client.uid(
+                "FETCH", _sequence_set(batch), HEADER_PARTS
+            )
+            if server_response != "OK":
+                return
+            responses.update(self._store(batch, HEADER_PARTS, data))
+        self._used.update((num, HEADER_PARTS) for num in nums)
+
+        for num in nums:
+            headers = _index_headers(responses[num] or [])
+            if headers is None:
+                self._index = {}
+                return
+            self._index[num] = headers
+
+        self._scanned = {address.lower() for address in addresses}
+        self._since = datetime.datetime.strptime(date, "%d-%b-%Y").date()
+        self._scan_found(search, nums)
+        self.prefetched = True
+        _LOGGER.debug("Prefetched %s candidate message(s)", len(self._index))
+
+    def scan(self, addresses: list, date: str) -> None:
+        """Search once for mail from all addresses and index the headers.
+
+        Later searches for these senders since date are answered from the
+        index, so every sensor sees the messages without its own SEARCH.
+        """
+        if not addresses:
+            return
+
+        search = build_search(addresses, date)[1]
+        try:
+            (server_response, data) = self.uid("SEARCH", self._scan_query(search))
+        except Exception as err:
+            _LOGGER.error("Error searching emails: %s", str(err))
+            return
+        if server_response != "OK":
+            return
+
+        nums = [int(num) for num in data[0].split()]
+        messages = dict(email_fetch_batch(self, nums, HEADER_PARTS))
+        if set(messages) != set(nums):
+            # Leave this refresh to per sensor searches
+            return
+        for num, response in messages.items():
+            headers = _index_headers(response)
+            if headers is None:
+                self._index = {}
+                return
+            self._index[num] = headers
+
+        self._scanned = {address.lower() for address in addresses}
+        self._since = datetime.datetime.strptime(date, "%d-%b-%Y").date()
+        self._scan_found(search, nums)
+        _LOGGER.debug("Scan found %s candidate message(s)", len(self._index))
+
+    def _scan_query(self, search: str) -> str:
+        """Limit a repeated scan to the UIDs it found before and newer ones.
+
+        Messages below the highest UID found already existed at the last
+        scan, so the ones matching are among its results.
+        Returns search query
+        """
+        if search != self._scan_search or not self.highest_uid:
+            return search
+        uids = f"{_sequence_set(self._scan_uids)},{self.highest_uid + 1}:*"
+        return f"UID {uids} {search}"
+
+    def _scan_found(self, search: str, nums: list) -> None:
+        """Remember the result of a complete scan for the next one."""
+        self._scan_search = search
+        self._scan_uids = nums
+        self.highest_uid = max(nums, default=0)
+
+    def search(
+        self,
+        address: Union[list, str],
+        date: str,
+        subject: Union[list, str, None] = None,
+    ) -> Optional[tuple]:
+        """Answer a search from the scan index.
+
+        Returns None when the search is not covered by the scan
+        """
+        addresses = address if isinstance(address, list) else [address]
+        if self._since is None or not self._scanned.issuperset(
+            item.lower() for item in addresses
+        ):
+            return None
+        since = datetime.datetime.strptime(date, "%d-%b-%Y").date()
+        if since < self._since:
+            return None
+
+        subjects = subject if isinstance(subject, list) else [subject]
+        found = []
+        for num, (sender, email_subject, received) in sorted(self._index.items()):
+            if not any(item.lower() in sender for item in addresses):
+                continue
+            if subject is not None and not any(
+                item.casefold() in email_subject for item in subjects
+            ):
+                continue
+            if received is not None and received < since:
+                continue
+            found.append(str(num))
+
+        return "OK", [" ".join(found).encode()]
+
+    @property
+    def literal(self) -> Any:
+        """Return the literal of the wrapped account."""
+        return self._server().literal
+
+    @literal.setter
+    def literal(self, value: Any) -> None:
+        """Set the literal sent with the next command of the wrapped account."""
+        self._server().literal = value
+
+    def __getattr__(self, name: str) -> Any:
+        """Pass anything else through to the wrapped account."""
+        return getattr(self._server(), name)
+
+    def uid(self, command: str, *args: Any) -> tuple:
+        """Run a UID command, answering FETCH from memory when possible.
+
+        A command that fails marks the refresh as failed.
+        """
+        try:
+            if command == "FETCH" and self.uidvalidity is not None:
+                value = self._fetch(*args)
+            else:
+                account = self._server()
+                with command_deadline(account, self.deadline):
+                    value = account.uid(command, *args)
+        except Exception:
+            self.failed = True
+            raise
+        if value[0] != "OK":
+            self.failed = True
+        return value
+
+    def _server(self) -> Type[imaplib.IMAP4_SSL]:
+        """Return the wrapped account, connecting on first use."""
+        if self._account is None and self._connect is not None:
+            _LOGGER.debug("Message not prefetched, connecting to the server")
+            self._account = self._connect() or None
+            self._connect = None
+        if self._account is None:
+            raise ConnectionError("IMAP session not available")
+        return self._account
+
+    def _download(self, num: str, parts: str) -> tuple:
+        """Fetch messages on the event loop session when there is one.
+
+        Whole messages are requested with BODY.PEEK[] there, so messages a
+        sensor reads are not marked as seen.
+        """
+        if self.remote is not None:
+            return self.remote(num, BODY_PARTS if parts == "(RFC822)" else parts)
+        account = self._server()
+        with command_deadline(account, self.deadline):
+            return account.uid("FETCH", num, parts)
+
+    def _key(self, num: int, parts: str) -> tuple:
+        """Return the message cache key of a FETCH response."""
+        return (self.folder, self.uidvalidity, num, parts)
+
+    def _store(self, nums: list, parts: str, data: list) -> dict:
+        """Keep the messages of a FETCH response.
+
+        Returns dict of UID and response
+        """
+        responses = _split_fetch(nums, data)
+        for item, response in responses.items():
+            self.cache.store(self._key(item, parts), response)
+        return responses
+
+    def _fetch(self, num: Any, parts: str) -> tuple:
+        """Return messages from the cache, downloading the missing ones at once."""
+        nums = _parse_sequence_set(num)
+        responses = {item: self.cache.response(self._key(item, parts)) for item in nums}
+        missing = [item for item, response in responses.items() if response is None]
+        if missing:
+            value = self._download(_sequence_set(missing), parts)
+            if value[0] != "OK":
+                return value
+            responses.update(self._store(missing, parts, value[1]))
+
+        data = []
+        for item in nums:
+            self._used.add((item, parts))
+            data.extend(responses[item] or [])
+        return "OK", data
+
+
+@contextmanager
+def command_deadline(
+    account: Type[imaplib.IMAP4_SSL], seconds: Optional[float]
+) -> Iterator[None]:
+    """Shut the connection down if a command runs longer than seconds.
+
+    The socket timeout only limits each read, a server trickling data
+    could otherwise hold the command open for much longer.
+    """
+    if not seconds:
+        yield
+        return
+
+    def _expired() -> None:
+        _LOGGER.warning(
+            "IMAP command took longer than %s seconds, closing the connection",
+            seconds,
+        )
+        _abort(account)
+
+    timer = threading.Timer(seconds, _expired)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+
+
+def _abort(account: Type[imaplib.IMAP4_SSL]) -> None:
+    """Interrupt a command blocked on the server."""
+    try:
+        account.socket().shutdown(socket.SHUT_RDWR)
+    except OSError as err:
+        _LOGGER.debug("Error shutting down IMAP socket: %s", str(err))
+
+
+def _split_fetch(nums: list, data: list) -> dict:
+    """Group the response of a multi message FETCH by UID.
+
+    Servers tag each message with its UID, untagged responses are taken
+    to be in the requested order.  Literals of further items of the same
+    message, like a second BODY[n], start with a space.
+
+    Returns dict of response parts keyed by UID
+    """
+    messages = {}
+    current = None
+    position = 0
+    for response_part in data:
+        envelope = (
+            response_part[0] if isinstance(response_part, tuple) else response_part
+        )
+        continued = (
+            current is not None
+            and isinstance(envelope, bytes)
+            and envelope.startswith(b" ")
+        )
+        if (isinstance(response_part, tuple) and not continued) or (
+            isinstance(envelope, bytes) and re.match(rb"\d+ \(", envelope)
+        ):
+            uid = re.search(rb"UID (\d+)", envelope or b"")
+            if uid is not None:
+                current = int(uid.group(1))
+            elif position < len(nums):
+                current = nums[position]
+            else:
+                break
+            position += 1
+            messages.setdefault(current, [])
+        if current is not None:
+            messages[current].append(response_part)
+    return messages
+
+
+def fetch_headers(account: Type[imaplib.IMAP4_SSL], mail_list: list) -> dict:
+    """Download the From, Subject and Date headers of emails in one command.
+
+    Returns dict of header only messages keyed by UID
+    """
+    headers = {}
+    for num, data in email_fetch_batch(account, mail_list, HEADER_PARTS):
+        for response_part in data:
+            if isinstance(response_part, tuple):
+                headers[num] = email.message_from_bytes(response_part[1])
+                break
+    return headers
+
+
+def _index_headers(data: list) -> Optional[tuple]:
+    """Index the sender, subject and arrival date of a message.
+
+    Returns tuple of lower cased sender, case folded subject and date
+    """
+    for response_part in data:
+        if not isinstance(response_part, tuple):
+            continue
+        msg = email.message_from_bytes(response_part[1])
+        sender = _decode_header(msg["from"]).lower()
+        subject = _decode_header(msg["subject"]).casefold()
+
+        # SINCE compares the internal date, the Date header may differ
+        received = None
+        internal = re.search(rb'INTERNALDATE "\s?(\d+-\w+-\d+)', response_part[0])
+        if internal is not None:
+            try:
+                received = datetime.datetime.strptime(
+                    internal.group(1).decode(), "%d-%b-%Y"
+                ).date()
+            except ValueError as err:
+                _LOGGER.debug("Unable to parse message date: %s", str(err))
+
+        return sender, subject, received
+
+    return None
+
+
+def _decode_header(value: Optional[str]) -> str:
+    """Decode a possibly RFC 2047 encoded, folded header to a string."""
+    if value is None:
+        return ""
+    value = re.sub(r"\r?\n(?=[ \t])", "", str(value))
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeDecodeError, email.errors.HeaderParseError):
+        return str(value)
+
+
+def _uidvalidity(account: Type[imaplib.IMAP4_SSL]) -> Optional[int]:
+    """Return the UIDVALIDITY reported when the folder was selected."""
+    try:
+        return int(account.response("UIDVALIDITY")[1][0])
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.debug("Server did not report UIDVALIDITY, not caching messages")
+        return None
+
+
+def _logout(account: Type[imaplib.IMAP4_SSL]) -> None:
+    """Log out of the IMAP server ignoring errors."""
+    try:
+        account.logout()
+    except Exception as err:
+        _LOGGER.debug("Error logging out of IMAP Server: %s", str(err))
+
+
 def selectfolder(account: Type[imaplib.IMAP4_SSL], folder: str) -> bool:
     """Select folder inside the mailbox."""
     try:
@@ -477,9 +1541,13 @@ def update_time() -> Any:
     return updated
 
 
-def build_search(address: list, date: str, subject: str = None) -> tuple:
+def build_search(
+    address: list, date: str, subject: Union[list, str, None] = None
+) -> tuple:
     """Build IMAP search query.
 
+    A list of ASCII subjects matches emails with any of them.
+
     Return tuple of utf8 flag and search query.
     """
     the_date = f"SINCE {date}"
@@ -499,6 +1567,20 @@ def build_search(address: list, date: str, subject: str = None) -> tuple:
 
     _LOGGER.debug("DEBUG subject: %s", subject)
 
+    from_search = f'FROM "{email_list}"'
+    if prefix_list is not None:
+        from_search = f"{prefix_list} {from_search}"
+
+    if isinstance(subject, list) and len(subject) > 1:
+        subject_list = '" SUBJECT "'.join(subject)
+        subject_prefix = " ".join(["OR"] * (len(subject) - 1))
+        subject_search = f'{subject_prefix} SUBJECT "{subject_list}"'
+        imap_search = f"({from_search} {subject_search} {the_date})"
+        _LOGGER.debug("DEBUG imap_search: %s", imap_search)
+        return (utf8_flag, imap_search)
+    if isinstance(subject, list):
+        subject = subject[0] if subject else None
+
     if subject is not None:
         if not subject.isascii():
             utf8_flag = True
@@ -511,15 +1593,9 @@ def build_search(address: list, date: str, subject: str = None) -> tuple:
             #     )
             imap_search = f"{the_date} SUBJECT"
         else:
-            if prefix_list is not None:
-                imap_search = f'({prefix_list} FROM "{email_list}" SUBJECT "{subject}" {the_date})'
-            else:
-                imap_search = f'(FROM "{email_list}" SUBJECT "{subject}" {the_date})'
+            imap_search = f'({from_search} SUBJECT "{subject}" {the_date})'
     else:
-        if prefix_list is not None:
-            imap_search = f'({prefix_list} FROM "{email_list}" {the_date})'
-        else:
-            imap_search = f'(FROM "{email_list}" {the_date})'
+        imap_search = f"({from_search} {the_date})"
 
     _LOGGER.debug("DEBUG imap_search: %s", imap_search)
 
@@ -527,12 +1603,21 @@ def build_search(address: list, date: str, subject: str = None) -> tuple:
 
 
 def email_search(
-    account: Type[imaplib.IMAP4_SSL], address: list, date: str, subject: str = None
+    account: Type[imaplib.IMAP4_SSL],
+    address: list,
+    date: str,
+    subject: Union[list, str, None] = None,
 ) -> tuple:
     """Search emails with from, subject, senton date.
 
     Returns a tuple
     """
+    # Answer from the single pass scan when it covers this search
+    if isinstance(account, MailboxSync):
+        value = account.search(address, date, subject)
+        if value is not None:
+            return value
+
     utf8_flag, search = build_search(address, date, subject)
 
     if utf8_flag:
@@ -547,7 +1632,7 @@ def email_search(
             value = "BAD", err.args[0]
     else:
         try:
-            value = account.search(None, search)
+            value = account.uid("SEARCH", search)
         except Exception as err:
             _LOGGER.error("Error searching emails: %s", str(err))
             value = "BAD", err.args[0]
@@ -562,15 +1647,56 @@ def email_search(
     return value
 
 
+def email_search_subjects(
+    account: Type[imaplib.IMAP4_SSL], address: list, date: str, subjects: list
+) -> dict:
+    """Search emails for several subjects with one command.
+
+    The server returns emails matching any ASCII subject, which subject
+    each one matched is worked out from its headers.  Subjects needing
+    UTF-8 are still searched one at a time.
+
+    Returns dict of subject to list of UIDs for subjects with emails
+    """
+    combined = [subject for subject in subjects if subject.isascii()]
+    if len(combined) < 2:
+        combined = []
+
+    matched = {}
+    if combined:
+        (server_response, data) = email_search(account, address, date, combined)
+        if server_response == "OK" and data[0]:
+            mail_list = data[0].split()
+            headers = fetch_headers(account, mail_list)
+            for subject in combined:
+                matched[subject] = [
+                    num
+                    for num in mail_list
+                    if int(num) in headers
+                    and subject.casefold()
+                    in _decode_header(headers[int(num)]["subject"]).casefold()
+                ]
+
+    found = {}
+    for subject in subjects:
+        if subject not in combined:
+            (server_response, data) = email_search(account, address, date, subject)
+            if server_response == "OK" and data[0]:
+                matched[subject] = data[0].split()
+        if matched.get(subject):
+            found[subject] = matched[subject]
+    return found
+
+
 def email_fetch(
     account: Type[imaplib.IMAP4_SSL], num: int, parts: str = "(RFC822)"
 ) -> tuple:
-    """Download specified email for parsing.
+    """Download specified email by UID for parsing.
 
     Returns tuple
     """
     try:
-        value = account.fetch(num, parts)
+        value = account.uid("FETCH", num, parts)
     except Exception as err:
         _LOGGER.error("Error fetching emails: %s", str(err))
         value = "BAD", err.args[0]
@@ -578,19 +1704,74 @@ def email_fetch(
     return value
 
 
+def email_fetch_batch(
+    account: Type[imaplib.IMAP4_SSL], mail_list: list, parts: str = "(RFC822)"
+) -> Iterator[tuple]:
+    """Download several emails by UID with one command per batch.
+
+    Yields tuple of UID and response parts in the order of mail_list
+    """
+    nums = list(dict.fromkeys(int(num) for num in mail_list))
+    for start in range(0, len(nums), FETCH_BATCH_SIZE):
+        batch = nums[start : start + FETCH_BATCH_SIZE]
+        (server_response, data) = email_fetch(account, _sequence_set(batch), parts)
+        if server_response != "OK":
+            return
+
+        messages = _split_fetch(batch, data)
+        for num in batch:
+            if num not in messages:
+                _LOGGER.debug("Email %s missing from fetch response", num)
+                continue
+            yield num, messages[num]
+
+
+def _sequence_set(nums: list) -> str:
+    """Build an IMAP sequence set, collapsing runs into ranges.
+
+    Returns string such as 1,5,9:12
+    """
+    ranges = []
+    for num in sorted(set(nums)):
+        if ranges and num == ranges[-1][1] + 1:
+            ranges[-1][1] = num
+        else:
+            ranges.append([num, num])
+    return ",".join(
+        str(first) if first == last else f"{first}:{last}" for first, last in ranges
+    )
+
+
+def _parse_sequence_set(value: Any) -> list:
+    """Expand an IMAP sequence set.
+
+    Returns list of UIDs
+    """
+    if isinstance(value, bytes):
+        value = value.decode()
+    nums = []
+    for item in str(value).split(","):
+        first, _, last = item.partition(":")
+        nums.extend(range(int(first), int(last or first) + 1))
+    return nums
+
+
 def get_mails(
     account: Type[imaplib.IMAP4_SSL],
     image_output_path: str,
     gif_duration: int,
     image_name: str,
-    gen_mp4: bool = False,
     custom_img: str = None,
+    resize_workers: int = DEFAULT_RESIZE_WORKERS,
+    video_frames: Optional[list] = None,
 ) -> int:
-    """Create GIF image based on the attachments in the inbox."""
+    """Create GIF image based on the attachments in the inbox.
+
+    The frames of a new gif are added to video_frames when passed, so the
+    mp4 can be encoded from them without reading the gif again.
+    """
     image_count = 0
     images = []
-    images_delete = []
-    msg = ""
 
     _LOGGER.debug("Attempting to find Informed Delivery mail")
     _LOGGER.debug("Informed delivery search date: %s", get_formatted_date())
@@ -613,97 +1794,75 @@ def get_mails(
         except Exception as err:
             _LOGGER.critical("Error creating directory: %s", str(err))
 
-    # Clean up image directory
-    _LOGGER.debug("Cleaning up image directory: %s", str(image_output_path))
-    cleanup_images(image_output_path)
-
-    # Copy overlays to image directory
-    _LOGGER.debug("Checking for overlay files in: %s", str(image_output_path))
-    copy_overlays(image_output_path)
-
     if server_response == "OK":
         _LOGGER.debug("Informed Delivery email found processing...")
+        html = ""
         for num in data[0].split():
-            msg = email.message_from_string(
-                email_fetch(account, num, "(RFC822)")[1][0][1].decode("utf-8")
-            )
-
-            # walking through the email parts to find images
-            for part in msg.walk():
-                if part.get_content_maintype() == "multipart":
-                    continue
-                if part.get("Content-Disposition") is None:
-                    continue
-
-                _LOGGER.debug("Extracting image from email")
-
-                # Log error message if we are unable to open the filepath for
-                # some reason
-                try:
-                    with open(
-                        image_output_path + part.get_filename(), "wb"
-                    ) as the_file:
-                        the_file.write(part.get_payload(decode=True))
-                        images.append(image_output_path + part.get_filename())
-                        image_count = image_count + 1
-                except Exception as err:
-                    _LOGGER.critical("Error opening filepath: %s", str(err))
-                    return image_count
+            parts = _informed_delivery_parts(account, num)
+            if parts is None:
+                parts = _informed_delivery_message(account, num)
+            attachments, text = parts
+            html += text
+            images.extend(attachments)
 
         # Remove duplicate images
         _LOGGER.debug("Removing duplicate images.")
-        images = list(dict.fromkeys(images))
-
-        # Create copy of image list for deleting temporary images
-        images_delete = images[:]
+        unique = {}
+        for name, content in images:
+            unique.setdefault(name, content)
+        images = list(unique.items())
 
         # Look for mail pieces without images image
-        if re.compile(r"\bimage-no-mailpieces?700\.jpg\b").search(str(msg)) is not None:
-            images.append(os.path.dirname(__file__) + "/image-no-mailpieces700.jpg")
-            image_count = image_count + 1
-            _LOGGER.debug("Placeholder image found using: image-no-mailpieces700.jpg.")
-
-        # Remove USPS announcement images
-        _LOGGER.debug("Removing USPS announcement images.")
-        images = [
-            el
-            for el in images
-            if not any(
-                ignore in el
-                for ignore in ["mailerProvidedImage", "ra_0", "Mail Attachment.txt"]
-            )
-        ]
+        if re.compile(r"\bimage-no-mailpieces?700\.jpg\b").search(html) is not None:
+            placeholder = os.path.dirname(__file__) + "/image-no-mailpieces700.jpg"
+            try:
+                with open(placeholder, "rb") as fd_img:
+                    images.append(("image-no-mailpieces700.jpg", fd_img.read()))
+                _LOGGER.debug(
+                    "Placeholder image found using: image-no-mailpieces700.jpg."
+                )
+            except Exception as err:
+                _LOGGER.error("Error opening placeholder image: %s", str(err))
+
         image_count = len(images)
         _LOGGER.debug("Image Count: %s", str(image_count))
 
-        if image_count > 0:
-            all_images = []
+        # Nothing to do when the same mail was rendered the same way before
+        outputs = [image_name]
+        fingerprint = _mail_fingerprint(images, outputs, gif_duration, custom_img)
+        if _mail_unchanged(image_output_path, outputs, fingerprint):
+            _LOGGER.debug("Mail images unchanged, keeping %s", image_name)
+            return image_count
 
-            _LOGGER.debug("Resizing images to 724x320...")
-            # Resize images to 724x320
-            all_images = resize_images(images, 724, 320)
+        # Clean up image directory
+        _LOGGER.debug("Cleaning up image directory: %s", str(image_output_path))
+        cleanup_images(image_output_path)
+        if os.path.isfile(os.path.join(image_output_path, MAIL_FINGERPRINT)):
+            os.remove(os.path.join(image_output_path, MAIL_FINGERPRINT))
 
-            # Create copy of image list for deleting temporary images
-            for image in all_images:
-                images_delete.append(image)
+        # Copy overlays to image directory
+        _LOGGER.debug("Checking for overlay files in: %s", str(image_output_path))
+        copy_overlays(image_output_path)
 
-            # Create numpy array of images
-            _LOGGER.debug("Creating array of image files...")
-            all_images = [io.imread(image) for image in all_images]
+        if image_count > 0:
+            _LOGGER.debug("Resizing images to 724x320...")
+            # Resize images to 724x320
+            all_images = resize_images(images, 724, 320, resize_workers)
 
             try:
                 _LOGGER.debug("Generating animated GIF")
                 # Use ImageIO to create mail images
                 io.mimwrite(
                     os.path.join(image_output_path, image_name),
-                    all_images,
+                    [numpy.asarray(image) for image in all_images],
                     duration=gif_duration,
                 )
                 _LOGGER.info("Mail image generated.")
             except Exception as err:
                 _LOGGER.error("Error attempting to generate image: %s", str(err))
-            for image in images_delete:
-                cleanup_images(f"{os.path.split(image)[0]}/", os.path.split(image)[1])
+
+            if video_frames is not None:
+                video_frames.extend(all_images)
 
         elif image_count == 0:
             _LOGGER.info("No mail found.")
@@ -721,73 +1880,457 @@ def get_mails(
             except Exception as err:
                 _LOGGER.error("Error attempting to copy image: %s", str(err))
 
-        if gen_mp4:
-            _generate_mp4(image_output_path, image_name)
+        _save_mail_fingerprint(image_output_path, image_name, fingerprint)
 
     return image_count
 
 
-def _generate_mp4(path: str, image_file: str) -> None:
+def _mail_fingerprint(images: list, *options: Any) -> str:
+    """Hash the mail piece images and the options they are rendered with.
+
+    Returns hex digest
+    """
+    digest = hashlib.sha256(repr(options).encode())
+    for name, content in images:
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def _mail_unchanged(path: str, outputs: list, fingerprint: str) -> bool:
+    """Check the rendered mail images match the fingerprint and still exist."""
+    if not all(os.path.isfile(os.path.join(path, output)) for output in outputs):
+        return False
+    try:
+        with open(os.path.join(path, MAIL_FINGERPRINT), encoding="utf-8") as the_file:
+            return the_file.read() == fingerprint
+    except OSError:
+        return False
+
+
+def _save_mail_fingerprint(path: str, image_name: str, fingerprint: str) -> None:
+    """Store the fingerprint next to the mail images once they are written."""
+    if not os.path.isfile(os.path.join(path, image_name)):
+        return
+    try:
+        with open(
+            os.path.join(path, MAIL_FINGERPRINT), "w", encoding="utf-8"
+        ) as the_file:
+            the_file.write(fingerprint)
+    except OSError as err:
+        _LOGGER.debug("Unable to store mail image fingerprint: %s", str(err))
+
+
+def _informed_delivery_parts(
+    account: Type[imaplib.IMAP4_SSL], num: Any
+) -> Optional[tuple]:
+    """Download the HTML and wanted attachments of an Informed Delivery email.
+
+    Reads BODYSTRUCTURE and fetches only the HTML and the attachments that
+    are not USPS announcements, decoding them in memory.
+    Returns tuple of list of file name and content tuples and HTML text,
+    None when the structure can not be read
+    """
+    (server_response, data) = email_fetch(account, num, "(BODYSTRUCTURE)")
+    if server_response != "OK":
+        return None
+    structure = _find_item(_parse_imap_list(data), "BODYSTRUCTURE")
+    if not isinstance(structure, list):
+        return None
+
+    wanted = {}
+    for section, part in _body_parts(structure):
+        if len(part) < 7 or not all(isinstance(item, str) for item in part[:2]):
+            return None
+        content_type = f"{part[0]}/{part[1]}".lower()
+        filename = _part_filename(part)
+        if content_type == "text/html":
+            wanted[section] = (None, part[5])
+        elif filename is not None and not any(
+            ignore in filename for ignore in INFORMED_DELIVERY_IGNORE
+        ):
+            wanted[section] = (filename, part[5])
+    if not wanted:
+        return [], ""
+
+    sections = " ".join(f"BODY.PEEK[{section}]" for section in wanted)
+    (server_response, data) = email_fetch(account, num, f"({sections})")
+    if server_response != "OK":
+        return None
+
+    contents = {}
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            section = re.search(rb"BODY\[([\d.]+)\]", response_part[0])
+            if section is not None:
+                contents[section.group(1).decode()] = response_part[1]
+
+    attachments = []
+    html = ""
+    for section, (filename, encoding) in wanted.items():
+        if section not in contents:
+            _LOGGER.debug("Part %s missing from fetch response", section)
+            continue
+        content = _decode_part(contents[section], encoding)
+        if filename is None:
+            html += content.decode("utf-8", "ignore")
+        else:
+            attachments.append((filename, content))
+    return attachments, html
+
+
+def _informed_delivery_message(account: Type[imaplib.IMAP4_SSL], num: Any) -> tuple:
+    """Download a whole Informed Delivery email and extract its attachments.
+
+    Returns tuple of list of file name and content tuples and email text
+    """
+    attachments = []
+    for _, data in email_fetch_batch(account, [num]):
+        for response_part in data:
+            if not isinstance(response_part, tuple):
+                continue
+            msg = parse_email(account, num, response_part[1])
+
+            # walking through the email parts to find images
+            for part in msg.walk():
+                if part.get_content_maintype() == "multipart":
+                    continue
+                if part.get("Content-Disposition") is None:
+                    continue
+                filename = part.get_filename()
+                if filename is None or any(
+                    ignore in filename for ignore in INFORMED_DELIVERY_IGNORE
+                ):
+                    continue
+                attachments.append((filename, part.get_payload(decode=True)))
+            return attachments, str(msg)
+    return attachments, ""
+
+
+def _parse_imap_list(data: list) -> list:
+    """Parse the parenthesized lists of an IMAP response.
+
+    Returns nested lists of strings, with None for NIL
+    """
+    stack = [[]]
+    for response_part in data:
+        literal = None
+        if isinstance(response_part, tuple):
+            response_part, literal = response_part
+            response_part = re.sub(rb"\{\d+\}$", b"", response_part)
+        if not isinstance(response_part, bytes):
+            continue
+        for token in re.findall(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+', response_part):
+            if token == b"(":
+                stack.append([])
+            elif token == b")":
+                if len(stack) > 1:
+                    item = stack.pop()
+                    stack[-1].append(item)
+            elif token.startswith(b'"'):
+                value = re.sub(rb"\\(.)", rb"\1", token[1:-1])
+                stack[-1].append(value.decode("utf-8", "ignore"))
+            elif token.upper() == b"NIL":
+                stack[-1].append(None)
+            else:
+                stack[-1].append(token.decode("utf-8", "ignore"))
+        if isinstance(literal, bytes):
+            stack[-1].append(literal.decode("utf-8", "ignore"))
+    return stack[0]
+
+
+def _find_item(items: list, name: str) -> Any:
+    """Return the value following name in a parsed FETCH response."""
+    for index, item in enumerate(items):
+        if isinstance(item, list):
+            found = _find_item(item, name)
+            if found is not None:
+                return found
+        elif isinstance(item, str) and item.upper() == name and index + 1 < len(items):
+            return items[index + 1]
+    return None
+
+
+def _body_parts(structure: list, section: str = "") -> Iterator[tuple]:
+    """Walk the single parts of a BODYSTRUCTURE.
+
+    Yields tuple of section number and part structure
+    """
+    if structure and isinstance(structure[0], list):
+        children = itertools.takewhile(lambda item: isinstance(item, list), structure)
+        for index, child in enumerate(children, 1):
+            yield from _body_parts(
+                child, f"{section}.{index}" if section else str(index)
+            )
+    else:
+        yield section or "1", structure
+
+
+def _part_filename(part: list) -> Optional[str]:
+    """Return the file name of a BODYSTRUCTURE part with a disposition."""
+    content_type = f"{part[0]}/{part[1]}".lower()
+    # Disposition follows the basic fields, lines, message fields and MD5
+    index = 8
+    if content_type.startswith("text/"):
+        index += 1
+    elif content_type == "message/rfc822":
+        index += 3
+    disposition = part[index] if len(part) > index else None
+    if not isinstance(disposition, list):
+        return None
+
+    for params, key in ((disposition[1:2], "filename"), ([part[2]], "name")):
+        if not params or not isinstance(params[0], list):
+            continue
+        values = dict(zip(params[0][::2], params[0][1::2]))
+        for name, value in values.items():
+            if isinstance(name, str) and name.lower() == key and value:
+                return _decode_header(value)
+    return None
+
+
+def _decode_part(content: bytes, encoding: Optional[str]) -> bytes:
+    """Decode a part downloaded with BODY[n].
+
+    Returns decoded bytes
+    """
+    encoding = (encoding or "").lower()
+    if encoding == "base64":
+        return base64.b64decode(content)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(content)
+    return content
+
+
+def gif_mtime(path: str, image_file: str) -> Optional[float]:
+    """Return the modification time of the gif, None if it is missing.
+
+    Returns float
+    """
+    try:
+        return os.path.getmtime(os.path.join(path, image_file))
+    except OSError:
+        return None
+
+
+def mp4_outdated(path: str, image_file: str) -> bool:
+    """Check if the mp4 is missing or older than the gif it is made from.
+
+    Returns boolean
+    """
+    gif_image = os.path.join(path, image_file)
+    mp4_file = os.path.join(path, image_file.replace(".gif", ".mp4"))
+    if not os.path.isfile(gif_image):
+        return False
+    if not os.path.isfile(mp4_file):
+        return True
+    return os.path.getmtime(mp4_file) < os.path.getmtime(gif_image)
+
+
+async def async_generate_mp4(
+    path: str, image_file: str, the_timeout: int = MP4_TIMEOUT
+) -> bool:
     """Generate mp4 from gif.
 
-    use a subprocess so we don't lock up the thread
+    ffmpeg runs as an asyncio subprocess so nothing waits on it, the mp4
+    is written under a temporary name and only replaces the old one once
+    complete.  A timed out or cancelled ffmpeg is killed and its partial
+    output removed.
     comamnd: ffmpeg -f gif -i infile.gif outfile.mp4
+    Returns True if the mp4 was written
     """
     gif_image = os.path.join(path, image_file)
     mp4_file = os.path.join(path, image_file.replace(".gif", ".mp4"))
-    filecheck = os.path.isfile(mp4_file)
+    partial_file = os.path.join(path, f".{os.path.basename(mp4_file)}.part")
+    loop = asyncio.get_running_loop()
     _LOGGER.debug("Generating mp4: %s", mp4_file)
-    if filecheck:
-        cleanup_images(os.path.split(mp4_file))
-        _LOGGER.debug("Removing old mp4: %s", mp4_file)
-
-    # TODO: find a way to call ffmpeg the right way from HA
-    subprocess.call(
-        [
-            "ffmpeg",
-            "-f",
-            "gif",
-            "-i",
-            gif_image,
-            "-pix_fmt",
-            "yuv420p",
-            "-filter:v",
-            "crop='floor(in_w/2)*2:floor(in_h/2)*2'",
-            mp4_file,
-        ],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
+
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-y",
+        "-f",
+        "gif",
+        "-i",
+        gif_image,
+        "-pix_fmt",
+        "yuv420p",
+        "-filter:v",
+        "crop='floor(in_w/2)*2:floor(in_h/2)*2'",
+        "-f",
+        "mp4",
+        partial_file,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
     )
+    try:
+        returncode = await asyncio.wait_for(process.wait(), the_timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            # Reap the killed ffmpeg so it does not linger as a zombie
+            await process.wait()
+        await loop.run_in_executor(None, _remove_file, partial_file)
+        raise
+
+    if returncode != 0:
+        _LOGGER.error("ffmpeg failed to generate mp4, exit code: %s", returncode)
+        await loop.run_in_executor(None, _remove_file, partial_file)
+        return False
+    await loop.run_in_executor(None, os.replace, partial_file, mp4_file)
+    return True
 
 
-def resize_images(images: list, width: int, height: int) -> list:
-    """Resize images.
+def encode_mp4(
+    frames: Optional[list], path: str, image_file: str, duration: int
+) -> bool:
+    """Encode Pillow images straight to mp4 with PyAV.
 
+    Skips spawning ffmpeg, each frame is shown for duration seconds.  The
+    gif is only decoded when no frames are passed.
+    Returns True if the mp4 was written
+    """
+    mp4_file = os.path.join(path, image_file.replace(".gif", ".mp4"))
+    partial_file = os.path.join(path, f".{os.path.basename(mp4_file)}.part")
+    if frames is None:
+        frames = _gif_frames(os.path.join(path, image_file))
+    if not frames:
+        return False
+
+    try:
+        import av  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        _LOGGER.error("PyAV is not installed, unable to generate mp4")
+        return False
+
+    _LOGGER.debug("Encoding mp4: %s", mp4_file)
+    width, height = (size - size % 2 for size in frames[0].size)
+    try:
+        with av.open(partial_file, "w", format="mp4") as container:
+            stream = container.add_stream(
+                "h264", rate=Fraction(1, max(int(duration), 1))
+            )
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = "yuv420p"
+            for image in frames:
+                frame = av.VideoFrame.from_image(image.crop((0, 0, width, height)))
+                container.mux(stream.encode(frame))
+            container.mux(stream.encode())
+        os.replace(partial_file, mp4_file)
+    except Exception as err:
+        _LOGGER.error("Error attempting to generate mp4: %s", str(err))
+        _remove_file(partial_file)
+        return False
+    return True
+
+
+def _gif_frames(gif_image: Any) -> list:
+    """Read the frames of a gif.
+
+    Returns list of Pillow images
+    """
+    try:
+        with Image.open(gif_image) as img:
+            return [frame.convert("RGB") for frame in ImageSequence.Iterator(img)]
+    except Exception as err:
+        _LOGGER.error("Error attempting to read image %s: %s", gif_image, str(err))
+        return []
+
+
+def jpeg_frames(content: bytes) -> list:
+    """Split an image into its frames for streaming.
+
+    Returns list of JPEG bytes, one per frame
+    """
+    frames = []
+    for frame in _gif_frames(BytesIO(content)):
+        output = BytesIO()
+        frame.save(output, "JPEG", quality=85)
+        frames.append(output.getvalue())
+    return frames
+
+
+def _remove_file(path: str) -> None:
+    """Remove a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def resize_images(images: list, width: int, height: int, workers: int = 1) -> list:
+    """Resize images in memory.
+
+    images is a list of file name and content tuples.
     This should keep the aspect ratio of the images
-    Returns list of images
+    With more than one worker the images are resized on a thread pool,
+    Pillow releases the GIL while decoding and resampling.
+    Returns list of Pillow images in the order given
     """
-    all_images = []
-    for image in images:
-        try:
-            with open(image, "rb") as fd_img:
-                try:
-                    img = Image.open(fd_img)
-                    img = resizeimage.resize_contain(img, [width, height])
-                    pre = os.path.splitext(image)[0]
-                    image = pre + ".gif"
-                    img.save(image, img.format)
-                    fd_img.close()
-                    all_images.append(image)
-                except Exception as err:
-                    _LOGGER.error(
-                        "Error attempting to read image %s: %s", str(image), str(err)
-                    )
-                    continue
-        except Exception as err:
-            _LOGGER.error("Error attempting to open image %s: %s", str(image), str(err))
-            continue
+    workers = min(workers, len(images))
+    if workers > 1:
+        with ThreadPoolExecutor(workers, "mail_and_packages_resize") as pool:
+            resized = list(
+                pool.map(lambda image: _resize_image(*image, width, height), images)
+            )
+    else:
+        resized = [
+            _resize_image(name, content, width, height) for name, content in images
+        ]
+
+    return [image for image in resized if image is not None]
 
-    return all_images
+
+def _resize_image(name: str, content: bytes, width: int, height: int) -> Any:
+    """Resize one image keeping its aspect ratio.
+
+    Returns Pillow image or None if it could not be read
+    """
+    try:
+        with Image.open(BytesIO(content)) as img:
+            return resizeimage.resize_contain(img, [width, height])
+    except Exception as err:
+        _LOGGER.error("Error attempting to read image %s: %s", str(name), str(err))
+        return None
+
+
+def resize_image(content: bytes, width: Optional[int], height: Optional[int]) -> Any:
+    """Downscale an image to fit within width and height.
+
+    Keeps the aspect ratio, animated gifs keep all their frames.
+    Returns image bytes or None if the image is already small enough
+    """
+    try:
+        with Image.open(BytesIO(content)) as img:
+            scale = min(
+                width / img.width if width else 1, height / img.height if height else 1
+            )
+            if scale >= 1:
+                return None
+            size = (max(round(img.width * scale), 1), max(round(img.height * scale), 1))
+            frames = [
+                (frame.convert("RGB").resize(size, Image.LANCZOS), frame.info)
+                for frame in ImageSequence.Iterator(img)
+            ]
+            loop = img.info.get("loop", 0)
+    except Exception as err:
+        _LOGGER.error("Error attempting to resize image: %s", str(err))
+        return None
+
+    output = BytesIO()
+    if len(frames) > 1:
+        frames[0][0].save(
+            output,
+            "GIF",
+            save_all=True,
+            append_images=[frame for frame, info in frames[1:]],
+            duration=[info.get("duration", 100) for frame, info in frames],
+            loop=loop,
+        )
+    else:
+        frames[0][0].save(output, "JPEG", quality=85)
+    return output.getvalue()
 
 
 def copy_overlays(path: str) -> None:
@@ -825,6 +2368,53 @@ def cleanup_images(path: str, image: Optional[str] = None) -> None:
                 _LOGGER.error("Error attempting to remove found image: %s", str(err))
 
 
+def _pattern_registry() -> dict:
+    """Compile the tracking, body and Amazon patterns once.
+
+    Returns dict of compiled patterns keyed by regular expression
+    """
+    regexes = [AMAZON_PATTERN, AMAZON_IMG_PATTERN, AMAZON_HUB_SUBJECT_SEARCH]
+    regexes.append(AMAZON_HUB_BODY)
+    for value in SENSOR_DATA.values():
+        regexes.extend(value.get(ATTR_PATTERN, []))
+        regexes.extend(value.get(ATTR_BODY, []))
+    return {regex: re.compile(regex) for regex in regexes}
+
+
+PATTERNS = _pattern_registry()
+
+
+def compiled(regex: str) -> re.Pattern:
+    """Return the compiled pattern for regex, compiling it only once.
+
+    Returns compiled regular expression
+    """
+    pattern = PATTERNS.get(regex)
+    if pattern is None:
+        pattern = PATTERNS[regex] = re.compile(regex)
+    return pattern
+
+
+def amazon_markers(body: str) -> tuple:
+    """Find the arrival date markers of an Amazon email.
+
+    Each marker is looked up at most once per body, the end of the date is
+    the first end marker found.  str.find scans in C, which beats walking a
+    keyword automaton over the text in Python, see tests/benchmark_amazon.py.
+    Returns tuple of dict of start marker to offset and the end offset
+    """
+    starts = {}
+    for search in AMAZON_TIME_PATTERN:
+        if (pos := body.find(search)) != -1:
+            starts[search] = pos
+    end = -1
+    if starts:
+        for marker in AMAZON_TIME_PATTERN_END:
+            if (end := body.find(marker)) != -1:
+                break
+    return starts, end
+
+
 def get_count(
     account: Type[imaplib.IMAP4_SSL],
     sensor_type: str,
@@ -858,33 +2448,30 @@ def get_count(
         return result
 
     subjects = SENSOR_DATA[sensor_type][ATTR_SUBJECT]
-    for subject in subjects:
+    _LOGGER.debug(
+        "Attempting to find mail from (%s) with subjects (%s)",
+        SENSOR_DATA[sensor_type][ATTR_EMAIL],
+        subjects,
+    )
+
+    matched = email_search_subjects(
+        account, SENSOR_DATA[sensor_type][ATTR_EMAIL], today, subjects
+    )
+    for subject, mail_list in matched.items():
+        data = [b" ".join(mail_list)]
+        if ATTR_BODY in SENSOR_DATA[sensor_type].keys():
+            count += find_text(data, account, SENSOR_DATA[sensor_type][ATTR_BODY][0])
+        else:
+            count += len(mail_list)
 
         _LOGGER.debug(
-            "Attempting to find mail from (%s) with subject (%s)",
+            "Search for (%s) with subject (%s) results: %s count: %s",
             SENSOR_DATA[sensor_type][ATTR_EMAIL],
             subject,
+            data[0],
+            count,
         )
-
-        (server_response, data) = email_search(
-            account, SENSOR_DATA[sensor_type][ATTR_EMAIL], today, subject
-        )
-        if server_response == "OK" and data[0] is not None:
-            if ATTR_BODY in SENSOR_DATA[sensor_type].keys():
-                count += find_text(
-                    data, account, SENSOR_DATA[sensor_type][ATTR_BODY][0]
-                )
-            else:
-                count += len(data[0].split())
-
-            _LOGGER.debug(
-                "Search for (%s) with subject (%s) results: %s count: %s",
-                SENSOR_DATA[sensor_type][ATTR_EMAIL],
-                subject,
-                data[0],
-                count,
-            )
-            found.append(data[0])
+        found.append(data[0])
 
     if (
         ATTR_PATTERN
@@ -921,12 +2508,27 @@ def get_tracking(
     mail_list = sdata.split()
     _LOGGER.debug("Searching for tracking numbers in %s messages...", len(mail_list))
 
-    pattern = re.compile(rf"{the_format}")
+    pattern = compiled(the_format)
+    headers = fetch_headers(account, mail_list)
+    remaining = []
     for i in mail_list:
-        data = email_fetch(account, i, "(RFC822)")[1]
+        # Search subject for a tracking number before downloading the body
+        msg = headers.get(int(i))
+        if msg is not None and msg["subject"] is not None:
+            if (found := pattern.findall(msg["subject"])) and len(found) > 0:
+                _LOGGER.debug(
+                    "Found tracking number in email subject: (%s)",
+                    found[0],
+                )
+                if found[0] not in tracking:
+                    tracking.append(found[0])
+                continue
+        remaining.append(i)
+
+    for num, data in email_fetch_batch(account, remaining):
         for response_part in data:
             if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
+                msg = parse_email(account, num, response_part[1])
                 _LOGGER.debug("Checking message subject...")
 
                 # Search subject for a tracking number
@@ -942,12 +2544,8 @@ def get_tracking(
 
                 # Search in email body for tracking number
                 _LOGGER.debug("Checking message body using %s ...", the_format)
-                for part in msg.walk():
-                    _LOGGER.debug("Content type: %s", part.get_content_type())
-                    if part.get_content_type() not in ["text/html", "text/plain"]:
-                        continue
-                    email_msg = part.get_payload(decode=True)
-                    email_msg = email_msg.decode("utf-8", "ignore")
+                for content_type, email_msg in text_parts(account, num, msg):
+                    _LOGGER.debug("Content type: %s", content_type)
                     if (found := pattern.findall(email_msg)) and len(found) > 0:
                         # DHL is special
                         if " " in the_format:
@@ -975,20 +2573,15 @@ def find_text(sdata: Any, account: Type[imaplib.IMAP4_SSL], search: str) -> int:
     mail_list = sdata[0].split()
     count = 0
     found = None
+    pattern = compiled(search)
 
-    for i in mail_list:
-        data = email_fetch(account, i, "(RFC822)")[1]
+    for num, data in email_fetch_batch(account, mail_list):
         for response_part in data:
             if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
+                msg = parse_email(account, num, response_part[1])
 
-                for part in msg.walk():
-                    _LOGGER.debug("Content type: %s", part.get_content_type())
-                    if part.get_content_type() not in ["text/html", "text/plain"]:
-                        continue
-                    email_msg = part.get_payload(decode=True)
-                    email_msg = email_msg.decode("utf-8", "ignore")
-                    pattern = re.compile(rf"{search}")
+                for content_type, email_msg in text_parts(account, num, msg):
+                    _LOGGER.debug("Content type: %s", content_type)
                     if (found := pattern.findall(email_msg)) and len(found) > 0:
                         _LOGGER.debug(
                             "Found (%s) in email %s times.", search, str(len(found))
@@ -1015,19 +2608,16 @@ def amazon_search(
     today = get_formatted_date()
     count = 0
 
-    for domain in AMAZON_DOMAINS:
-        for subject in subjects:
-            email_address = AMAZON_EMAIL + domain
-            _LOGGER.debug("Amazon email search address: %s", str(email_address))
+    addresses = [AMAZON_EMAIL + domain for domain in AMAZON_DOMAINS]
+    _LOGGER.debug("Amazon email search addresses: %s", str(addresses))
 
-            (server_response, data) = email_search(
-                account, email_address, today, subject
-            )
-
-            if server_response == "OK" and data[0] is not None:
-                count += len(data[0].split())
-                _LOGGER.debug("Amazon delivered email(s) found: %s", count)
-                get_amazon_image(data[0], account, image_path, hass, amazon_image_name)
+    matched = email_search_subjects(account, addresses, today, subjects)
+    for mail_list in matched.values():
+        count += len(mail_list)
+        _LOGGER.debug("Amazon delivered email(s) found: %s", count)
+        get_amazon_image(
+            b" ".join(mail_list), account, image_path, hass, amazon_image_name
+        )
 
     return count
 
@@ -1046,22 +2636,18 @@ def get_amazon_image(
     mail_list = sdata.split()
     _LOGGER.debug("HTML Amazon emails found: %s", len(mail_list))
 
-    for i in mail_list:
-        data = email_fetch(account, i, "(RFC822)")[1]
+    for num, data in email_fetch_batch(account, mail_list):
         for response_part in data:
             if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
+                msg = parse_email(account, num, response_part[1])
                 _LOGGER.debug("Email Multipart: %s", str(msg.is_multipart()))
                 _LOGGER.debug("Content Type: %s", str(msg.get_content_type()))
 
-                for part in msg.walk():
-                    if part.get_content_type() != "text/html":
+                for content_type, part in text_parts(account, num, msg):
+                    if content_type != "text/html":
                         continue
                     _LOGGER.debug("Processing HTML email...")
-                    part = part.get_payload(decode=True)
-                    part = part.decode("utf-8", "ignore")
-                    pattern = re.compile(rf"{AMAZON_IMG_PATTERN}")
-                    found = pattern.findall(part)
+                    found = compiled(AMAZON_IMG_PATTERN).findall(part)
                     for url in found:
                         if url[1] != "us-prod-temp.s3.amazonaws.com":
                             continue
@@ -1139,16 +2725,26 @@ def amazon_hub(account: Type[imaplib.IMAP4_SSL], fwds: Optional[str] = None) ->
         found = []
         id_list = sdata[0].split()
         _LOGGER.debug("Amazon hub emails found: %s", str(len(id_list)))
+        headers = fetch_headers(account, id_list)
+        remaining = []
         for i in id_list:
-            data = email_fetch(account, i, "(RFC822)")[1]
+            # Get combo number from subject line before downloading the body
+            msg = headers.get(int(i))
+            if msg is not None and msg["subject"] is not None:
+                search = compiled(subject_regex).search(msg["subject"])
+                if search is not None and len(search.groups()) > 1:
+                    found.append(search.group(3))
+                    continue
+            remaining.append(i)
+
+        for num, data in email_fetch_batch(account, remaining):
             for response_part in data:
                 if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
+                    msg = parse_email(account, num, response_part[1])
 
                     # Get combo number from subject line
                     email_subject = msg["subject"]
-                    pattern = re.compile(rf"{subject_regex}")
-                    search = pattern.search(email_subject)
+                    search = compiled(subject_regex).search(email_subject)
                     if search is not None:
                         if len(search.groups()) > 1:
                             found.append(search.group(3))
@@ -1163,8 +2759,7 @@ def amazon_hub(account: Type[imaplib.IMAP4_SSL], fwds: Optional[str] = None) ->
                         _LOGGER.debug("Problem decoding email message: %s", str(err))
                         continue
                     email_msg = email_msg.decode("utf-8", "ignore")
-                    pattern = re.compile(rf"{body_regex}")
-                    search = pattern.search(email_msg)
+                    search = compiled(body_regex).search(email_msg)
                     if search is not None:
                         if len(search.groups()) > 1:
                             found.append(search.group(2))
@@ -1221,6 +2816,50 @@ def amazon_exception(
     return info
 
 
+def _amazon_date_names() -> tuple:
+    """Build the month and skipped word lookups for Amazon arrival dates.
+
+    Returns tuple of dict of month name to number and set of weekday names
+    """
+    months = {}
+    for names in AMAZON_MONTHS.values():
+        for index, name in enumerate(names):
+            # Lists may hold a second form of the names, like Polish
+            months[name] = index % 12 + 1
+    weekdays = {name for names in AMAZON_WEEKDAYS.values() for name in names}
+    return months, weekdays
+
+
+MONTH_NAMES, WEEKDAY_NAMES = _amazon_date_names()
+
+
+def parse_amazon_date(arrive_date: str) -> Optional[tuple]:
+    """Parse an arrival date like 'Tuesday, March 5' or 'martedì 01 dicembre'.
+
+    Month names come from tables instead of the process locale, so this
+    is safe to call from any thread.  Weekdays and words like today are
+    skipped, anything else unknown fails the parse.
+    Returns tuple of month and day or None
+    """
+    month = None
+    day = None
+    for token in re.findall(r"[^\W\d_]+|\d+", arrive_date.casefold()):
+        if token.isdigit():
+            if day is not None:
+                return None
+            day = int(token)
+        elif token in MONTH_NAMES:
+            if month is not None:
+                return None
+            month = MONTH_NAMES[token]
+        elif token not in WEEKDAY_NAMES:
+            return None
+
+    if month is None or day is None or not 1 <= day <= 31:
+        return None
+    return month, day
+
+
 def get_items(
     account: Type[imaplib.IMAP4_SSL],
     param: str = None,
@@ -1262,11 +2901,10 @@ def get_items(
             mail_ids = sdata[0]
             id_list = mail_ids.split()
             _LOGGER.debug("Amazon emails found: %s", str(len(id_list)))
-            for i in id_list:
-                data = email_fetch(account, i, "(RFC822)")[1]
+            for num, data in email_fetch_batch(account, id_list):
                 for response_part in data:
                     if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
+                        msg = parse_email(account, num, response_part[1])
 
                         _LOGGER.debug("Email Multipart: %s", str(msg.is_multipart()))
                         _LOGGER.debug("Content Type: %s", str(msg.get_content_type()))
@@ -1280,7 +2918,7 @@ def get_items(
                         else:
                             email_subject = decode_header(msg["subject"])[0][0]
                         _LOGGER.debug("Amazon Subject: %s", str(email_subject))
-                        pattern = re.compile(r"[0-9]{3}-[0-9]{7}-[0-9]{7}")
+                        pattern = compiled(AMAZON_PATTERN)
 
                         # Don't add the same order number twice
                         if (
@@ -1309,21 +2947,13 @@ def get_items(
                         ):
                             order_number.append(found[0])
 
+                        (starts, end) = amazon_markers(email_msg)
                         for search in AMAZON_TIME_PATTERN:
                             _LOGGER.debug("Looking for: %s", search)
-                            if search not in email_msg:
+                            if search not in starts:
                                 continue
 
-                            start = email_msg.find(search) + len(search)
-                            end = -1
-                            if email_msg.find("Previously expected:") != -1:
-                                end = email_msg.find("Previously expected:")
-                            elif email_msg.find("Track your") != -1:
-                                end = email_msg.find("Track your")
-                            elif email_msg.find("Per tracciare il tuo pacco") != -1:
-                                end = email_msg.find("Per tracciare il tuo pacco")
-                            elif email_msg.find("View or manage order") != -1:
-                                end = email_msg.find("View or manage order")
+                            start = starts[search] + len(search)
 
                             arrive_date = email_msg[start:end].replace(">", "").strip()
                             _LOGGER.debug("First pass: %s", arrive_date)
@@ -1331,46 +2961,19 @@ def get_items(
                             arrive_date = arrive_date[0:3]
                             # arrive_date[2] = arrive_date[2][:3]
                             arrive_date = " ".join(arrive_date).strip()
-                            time_format = None
-                            new_arrive_date = None
-
-                            for lang in AMAZON_LANGS:
-                                try:
-                                    locale.setlocale(locale.LC_TIME, lang)
-                                except Exception as err:
-                                    _LOGGER.info("Locale error: %s (%s)", err, lang)
-                                    continue
-
-                                _LOGGER.debug("Arrive Date: %s", arrive_date)
-
-                                if "today" in arrive_date or "tomorrow" in arrive_date:
-                                    new_arrive_date = arrive_date.split(",")[1].strip()
-                                    time_format = "%B %d"
-                                elif arrive_date.endswith(","):
-                                    new_arrive_date = arrive_date.rstrip(",")
-                                    time_format = "%A, %B %d"
-                                elif "," not in arrive_date:
-                                    new_arrive_date = arrive_date
-                                    time_format = "%A %d %B"
-                                else:
-                                    new_arrive_date = arrive_date
-                                    time_format = "%A, %B %d"
-
-                                try:
-                                    dateobj = datetime.datetime.strptime(
-                                        new_arrive_date, time_format
-                                    )
-                                except ValueError as err:
-                                    _LOGGER.info(
-                                        "International dates not supported. (%s)", err
-                                    )
-                                    continue
-
-                                if (
-                                    dateobj.day == datetime.date.today().day
-                                    and dateobj.month == datetime.date.today().month
-                                ):
-                                    deliveries_today.append("Amazon Order")
+                            _LOGGER.debug("Arrive Date: %s", arrive_date)
+
+                            arrival = parse_amazon_date(arrive_date)
+                            if arrival is None:
+                                _LOGGER.info(
+                                    "Unable to parse Amazon arrival date: %s",
+                                    arrive_date,
+                                )
+                                continue
+
+                            today = datetime.date.today()
+                            if arrival == (today.month, today.day):
+                                deliveries_today.append("Amazon Order")
 
     value = None
     if param == "count":
@@ -20,6 +20,7 @@ from .const import (
     ATTR_IMAGE,
     ATTR_IMAGE_NAME,
     ATTR_IMAGE_PATH,
+    ATTR_MP4_STATUS,
     ATTR_ORDER,
     ATTR_TRACKING_NUM,
     CONF_PATH,
@@ -129,6 +130,8 @@ class PackagesSensor(CoordinatorEntity, SensorEntity):
                 attr[ATTR_ORDER] = data[AMAZON_ORDER]
         elif self._name == "Mail USPS Mail":
             attr[ATTR_IMAGE] = data[ATTR_IMAGE_NAME]
+            if self.coordinator.mp4_status is not None:
+                attr[ATTR_MP4_STATUS] = self.coordinator.mp4_status
         elif "_delivering" in self.type and tracking in self.data.keys():
             attr[ATTR_TRACKING_NUM] = data[tracking]
             # TODO: Add Tracking URL when applicable
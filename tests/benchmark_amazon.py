@@ -0,0 +1,103 @@
+"""Compare ways of finding the Amazon arrival date markers in a body.
+
+Run from the repository root:
+    python -m tests.benchmark_amazon [copies] [rounds]
+"""
+
+import re
+import sys
+import time
+from collections import deque
+
+from custom_components.mail_and_packages.const import (
+    AMAZON_TIME_PATTERN,
+    AMAZON_TIME_PATTERN_END,
+)
+from custom_components.mail_and_packages.helpers import amazon_markers
+
+MARKERS = AMAZON_TIME_PATTERN + AMAZON_TIME_PATTERN_END
+
+
+def _repeated_find(body: str) -> tuple:
+    """Search the way get_items did, again for every start marker found."""
+    starts = {}
+    end = -1
+    for search in AMAZON_TIME_PATTERN:
+        if search not in body:
+            continue
+        starts[search] = body.find(search)
+        end = -1
+        for marker in AMAZON_TIME_PATTERN_END:
+            if body.find(marker) != -1:
+                end = body.find(marker)
+                break
+    return starts, end
+
+
+def _lookahead(body: str) -> dict:
+    """Use one regex alternation of lookaheads and match each marker at hits."""
+    combined = re.compile("|".join(f"(?={re.escape(marker)})" for marker in MARKERS))
+    found = {}
+    for hit in combined.finditer(body):
+        for marker in MARKERS:
+            if marker not in found and body.startswith(marker, hit.start()):
+                found[marker] = hit.start()
+    return found
+
+
+def _aho_corasick(body: str) -> dict:
+    """Walk a keyword automaton over the body one character at a time."""
+    goto, fail, out = [{}], [0], [[]]
+    for marker in MARKERS:
+        state = 0
+        for char in marker:
+            if char not in goto[state]:
+                goto.append({})
+                fail.append(0)
+                out.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        out[state].append(marker)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, target in goto[state].items():
+            queue.append(target)
+            link = fail[state]
+            while link and char not in goto[link]:
+                link = fail[link]
+            fail[target] = goto[link].get(char, 0)
+            out[target] = out[target] + out[fail[target]]
+
+    found = {}
+    state = 0
+    for pos, char in enumerate(body):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for marker in out[state]:
+            found.setdefault(marker, pos - len(marker) + 1)
+    return found
+
+
+def main(copies: int = 4, rounds: int = 20) -> None:
+    """Time each search on copies of the shipped email and print the best."""
+    with open("tests/test_emails/amazon_shipped.eml", encoding="utf-8") as file:
+        body = file.read() * copies
+    searches = {
+        "repeated str.find": _repeated_find,
+        "amazon_markers": amazon_markers,
+        "lookahead alternation": _lookahead,
+        "Aho-Corasick in Python": _aho_corasick,
+    }
+    for name, search in searches.items():
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            search(body)
+            timings.append(time.perf_counter() - start)
+        print(f"{name}: {min(timings) * 1000:.2f} ms for {len(body)} characters")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
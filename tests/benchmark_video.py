@@ -0,0 +1,70 @@
+"""Compare the ffmpeg and PyAV mp4 encoders on the mail images.
+
+Run from the repository root:
+    python -m tests.benchmark_video [frames] [rounds]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from shutil import which
+
+import imageio as io
+import numpy
+from PIL import Image
+
+from custom_components.mail_and_packages.helpers import async_generate_mp4, encode_mp4
+
+DURATION = 5
+
+
+def _frames(count: int) -> list:
+    """Return mail piece sized frames that differ from each other."""
+    gradient = Image.radial_gradient("L").resize((724, 320))
+    return [gradient.rotate(num * 24).convert("RGB") for num in range(count)]
+
+
+def _ffmpeg(path: str, frames: list) -> None:
+    """Write the gif and transcode it with the ffmpeg binary."""
+    io.mimwrite(
+        os.path.join(path, "mail.gif"),
+        [numpy.asarray(frame) for frame in frames],
+        duration=DURATION,
+    )
+    asyncio.run(async_generate_mp4(path, "mail.gif"))
+
+
+def _pyav(path: str, frames: list) -> None:
+    """Write the gif and encode the same frames in-process."""
+    io.mimwrite(
+        os.path.join(path, "mail.gif"),
+        [numpy.asarray(frame) for frame in frames],
+        duration=DURATION,
+    )
+    encode_mp4(frames, path, "mail.gif", DURATION)
+
+
+def main(count: int = 15, rounds: int = 5) -> None:
+    """Time each encoder and print the best run."""
+    frames = _frames(count)
+    backends = {"pyav": _pyav}
+    if which("ffmpeg"):
+        backends["ffmpeg"] = _ffmpeg
+    else:
+        print("ffmpeg not found, only timing pyav")
+
+    for name, backend in backends.items():
+        timings = []
+        with tempfile.TemporaryDirectory() as path:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                backend(path, frames)
+                timings.append(time.perf_counter() - start)
+            size = os.path.getsize(os.path.join(path, "mail.mp4"))
+        print(f"{name}: {min(timings) * 1000:.0f} ms for {count} frames, {size} bytes")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
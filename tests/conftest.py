@@ -15,6 +15,23 @@ from tests.const import FAKE_UPDATE_DATA
 pytest_plugins = "pytest_homeassistant_custom_component"
 
 
+def _mock_imap_account():
+    """Return a mocked IMAP account.
+
+    UID SEARCH and UID FETCH are routed to the mocked search and fetch
+    methods so fixtures only need to set those.
+    """
+    mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+
+    def _uid(command, *args):
+        if command == "FETCH":
+            return mock_conn.fetch(*args)
+        return mock_conn.search(None, *args)
+
+    mock_conn.uid.side_effect = _uid
+    return mock_conn
+
+
 @pytest.fixture()
 def mock_update():
     """Mock email data update class values."""
@@ -30,7 +47,7 @@ def mock_update():
 def mock_imap():
     """Mock imap class values."""
     with patch("custom_components.mail_and_packages.helpers.imaplib") as mock_imap:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -42,7 +59,6 @@ def mock_imap():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         mock_conn.select.return_value = ("OK", [])
         yield mock_conn
 
@@ -53,7 +69,7 @@ def mock_imap_login_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_login_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_login_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.side_effect = Exception("Invalid username or password")
@@ -67,7 +83,7 @@ def mock_imap_select_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_select_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_select_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -90,7 +106,7 @@ def mock_imap_list_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_list_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_list_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -109,7 +125,7 @@ def mock_imap_no_email():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_no_email:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_no_email.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -121,7 +137,6 @@ def mock_imap_no_email():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b""])
-        mock_conn.uid.return_value = ("OK", [b""])
         mock_conn.select.return_value = ("OK", [])
         yield mock_conn
 
@@ -132,7 +147,7 @@ def mock_imap_search_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_search_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_search_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -154,7 +169,7 @@ def mock_imap_fetch_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_fetch_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_fetch_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -166,7 +181,6 @@ def mock_imap_fetch_error():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         mock_conn.select.return_value = ("OK", [])
         mock_conn.fetch.side_effect = Exception("Invalid Email")
         yield mock_conn
@@ -178,7 +192,7 @@ def mock_imap_index_error():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_index_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_index_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -199,7 +213,7 @@ def mock_imap_index_error_2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_index_error:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_index_error.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -211,7 +225,6 @@ def mock_imap_index_error_2():
             [b'(\\HasNoChildren) ";" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"0"])
-        mock_conn.uid.return_value = ("OK", [b"0"])
         yield mock_imap_index_error
 
 
@@ -221,7 +234,7 @@ def mock_imap_mailbox_format2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_mailbox_format2:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_mailbox_format2.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -233,7 +246,6 @@ def mock_imap_mailbox_format2():
             [b'(\\HasNoChildren) "." "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"0"])
-        mock_conn.uid.return_value = ("OK", [b"0"])
         yield mock_conn
 
 
@@ -243,7 +255,7 @@ def mock_imap_usps_informed_digest():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_usps_informed_digest:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_usps_informed_digest.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -255,7 +267,6 @@ def mock_imap_usps_informed_digest():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/informed_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -269,7 +280,7 @@ def mock_imap_usps_informed_digest_missing():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_usps_informed_digest_missing:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_usps_informed_digest_missing.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -281,7 +292,6 @@ def mock_imap_usps_informed_digest_missing():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/informed_delivery_missing_mailpiece.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -295,7 +305,7 @@ def mock_imap_usps_informed_digest_no_mail():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_usps_informed_digest_no_mail:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_usps_informed_digest_no_mail.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -307,7 +317,6 @@ def mock_imap_usps_informed_digest_no_mail():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/informed_delivery_no_mail.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -321,7 +330,7 @@ def mock_imap_ups_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_ups_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_ups_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -333,7 +342,6 @@ def mock_imap_ups_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/ups_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -347,7 +355,7 @@ def mock_imap_ups_out_for_delivery_html():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_ups_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_ups_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -359,7 +367,6 @@ def mock_imap_ups_out_for_delivery_html():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/ups_out_for_delivery_new.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -373,7 +380,7 @@ def mock_imap_dhl_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_dhl_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_dhl_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -385,7 +392,6 @@ def mock_imap_dhl_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/dhl_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -399,7 +405,7 @@ def mock_imap_fedex_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_dhl_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_dhl_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -411,7 +417,6 @@ def mock_imap_fedex_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/fedex_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -425,7 +430,7 @@ def mock_imap_fedex_out_for_delivery_2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_dhl_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_dhl_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -437,7 +442,6 @@ def mock_imap_fedex_out_for_delivery_2():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/fedex_out_for_delivery_2.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -451,7 +455,7 @@ def mock_imap_usps_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_usps_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_usps_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -463,7 +467,6 @@ def mock_imap_usps_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/usps_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -477,7 +480,7 @@ def mock_imap_amazon_shipped():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -489,7 +492,6 @@ def mock_imap_amazon_shipped():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_shipped.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -503,7 +505,7 @@ def mock_imap_amazon_shipped_uk():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -515,7 +517,6 @@ def mock_imap_amazon_shipped_uk():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_uk_shipped.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -529,7 +530,7 @@ def mock_imap_amazon_shipped_uk_2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -541,7 +542,6 @@ def mock_imap_amazon_shipped_uk_2():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_uk_shipped_2.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -555,7 +555,7 @@ def mock_imap_amazon_shipped_alt():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped_alt:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped_alt.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -567,7 +567,6 @@ def mock_imap_amazon_shipped_alt():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_shipped_alt.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -581,7 +580,7 @@ def mock_imap_amazon_shipped_alt_2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped_alt_2:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped_alt_2.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -593,7 +592,6 @@ def mock_imap_amazon_shipped_alt_2():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_shipped_alt_2.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -607,7 +605,7 @@ def mock_imap_amazon_shipped_it():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped_it:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped_it.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -619,7 +617,6 @@ def mock_imap_amazon_shipped_it():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_shipped_it.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -633,7 +630,7 @@ def mock_imap_amazon_shipped_alt_timeformat():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_shipped:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_shipped.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -645,7 +642,6 @@ def mock_imap_amazon_shipped_alt_timeformat():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_shipped_alt_timeformat.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -659,7 +655,7 @@ def mock_imap_amazon_delivered():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_delivered:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_delivered.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -671,7 +667,6 @@ def mock_imap_amazon_delivered():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_delivered.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -685,7 +680,7 @@ def mock_imap_amazon_delivered_it():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_delivered_it:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_delivered_it.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -697,7 +692,6 @@ def mock_imap_amazon_delivered_it():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_delivered_it.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -711,7 +705,7 @@ def mock_imap_amazon_the_hub():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_the_hub:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_the_hub.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -723,7 +717,6 @@ def mock_imap_amazon_the_hub():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_hub_notice.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -737,7 +730,7 @@ def mock_imap_amazon_the_hub_2():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_the_hub:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_the_hub.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -749,7 +742,6 @@ def mock_imap_amazon_the_hub_2():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_hub_notice_2.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -949,11 +941,18 @@ def mock_os_path_split():
 
 
 @pytest.fixture
-def mock_subprocess_call():
-    """Fixture to mock subprocess."""
-    with patch("subprocess.call") as mock_subprocess_call:
+def mock_ffmpeg():
+    """Fixture to mock the ffmpeg subprocess, it writes its output file."""
+
+    async def _exec(*args, **kwargs):
+        with open(args[-1], "wb") as the_file:
+            the_file.write(b"mp4")
+        process = mock.Mock(returncode=0)
+        process.wait = mock.AsyncMock(return_value=0)
+        return process
 
-        yield mock_subprocess_call
+    with patch("asyncio.create_subprocess_exec", side_effect=_exec) as mock_ffmpeg:
+        yield mock_ffmpeg
 
 
 @pytest.fixture
@@ -982,7 +981,7 @@ def mock_imap_hermes_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_hermes_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_hermes_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -994,7 +993,6 @@ def mock_imap_hermes_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/hermes_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1008,7 +1006,7 @@ def mock_imap_royal_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_royal_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_royal_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1020,7 +1018,6 @@ def mock_imap_royal_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/royal_mail_uk_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1048,7 +1045,7 @@ def mock_hash_file():
         yield mock_hash_file
 
 
-def hash_side_effect(value):
+def hash_side_effect(value, fast=False):
     """Side effect value."""
     if "mail_none.gif" in value:
         return "633d7356947eec543c50b76a1852f92427f4dca9"
@@ -1102,7 +1099,7 @@ def mock_imap_usps_exception():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_usps_informed_digest:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_usps_informed_digest.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1114,7 +1111,6 @@ def mock_imap_usps_exception():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/usps_exception.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1170,7 +1166,7 @@ def mock_imap_amazon_exception():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_exception:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_exception.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1182,7 +1178,6 @@ def mock_imap_amazon_exception():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_exception.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1196,7 +1191,7 @@ def mock_imap_auspost_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_auspost_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_auspost_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1208,7 +1203,6 @@ def mock_imap_auspost_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/auspost_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1222,7 +1216,7 @@ def mock_imap_auspost_delivered():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_auspost_delivered:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_auspost_delivered.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1234,7 +1228,6 @@ def mock_imap_auspost_delivered():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/auspost_delivered.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1248,7 +1241,7 @@ def mock_imap_poczta_polska_delivering():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_poczta_polska_delivering:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_poczta_polska_delivering.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1260,7 +1253,6 @@ def mock_imap_poczta_polska_delivering():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/poczta_polska_delivering.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1274,7 +1266,7 @@ def mock_imap_inpost_pl_out_for_delivery():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_inpost_pl_out_for_delivery:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_inpost_pl_out_for_delivery.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1286,7 +1278,6 @@ def mock_imap_inpost_pl_out_for_delivery():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/inpost_pl_out_for_delivery.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1300,7 +1291,7 @@ def mock_imap_inpost_pl_delivered():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_inpost_pl_delivered:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_inpost_pl_delivered.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1312,7 +1303,6 @@ def mock_imap_inpost_pl_delivered():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/inpost_pl_delivered.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1326,7 +1316,7 @@ def mock_imap_dpd_com_pl_delivering():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_dpd_com_pl_delivering:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_dpd_com_pl_delivering.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1338,7 +1328,6 @@ def mock_imap_dpd_com_pl_delivering():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/dpd_com_pl_delivering.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -1352,7 +1341,7 @@ def mock_imap_search_error_none():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_search_error_none:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_search_error_none.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1374,7 +1363,7 @@ def mock_imap_amazon_fwd():
     with patch(
         "custom_components.mail_and_packages.helpers.imaplib"
     ) as mock_imap_amazon_fwd:
-        mock_conn = mock.Mock(spec=imaplib.IMAP4_SSL)
+        mock_conn = _mock_imap_account()
         mock_imap_amazon_fwd.IMAP4_SSL.return_value = mock_conn
 
         mock_conn.login.return_value = (
@@ -1386,7 +1375,6 @@ def mock_imap_amazon_fwd():
             [b'(\\HasNoChildren) "/" "INBOX"'],
         )
         mock_conn.search.return_value = ("OK", [b"1"])
-        mock_conn.uid.return_value = ("OK", [b"1"])
         f = open("tests/test_emails/amazon_fwd.eml", "r")
         email_file = f.read()
         mock_conn.fetch.return_value = ("OK", [(b"", email_file.encode("utf-8"))])
@@ -184,6 +184,9 @@ FAKE_CONFIG_DATA_CORRECTED_EXTERNAL = {
     "image_path": "custom_components/mail_and_packages/images/",
     "image_security": True,
     "imap_timeout": 30,
+    "imap_idle": False,
+    "resize_workers": 1,
+    "video_encoder": "ffmpeg",
     "password": "suchfakemuchpassword",
     "port": 993,
     "resources": [
@@ -245,6 +248,9 @@ FAKE_CONFIG_DATA_CORRECTED = {
     "image_path": "custom_components/mail_and_packages/images/",
     "image_security": True,
     "imap_timeout": 30,
+    "imap_idle": False,
+    "resize_workers": 1,
+    "video_encoder": "ffmpeg",
     "password": "suchfakemuchpassword",
     "port": 993,
     "resources": [
@@ -0,0 +1,224 @@
+"""Local IMAP server standing in for a mail provider in tests."""
+
+import asyncio
+import datetime
+import email
+import re
+
+TOKENS = re.compile(rb'"(?:[^"\\]|\\.)*"|\(|\)|[^\s()]+')
+
+
+class FakeImapServer:
+    """Serve a list of messages over plain TCP IMAP on localhost."""
+
+    def __init__(self, messages: list, uidvalidity: int = 1234) -> None:
+        """Initialize with a list of (uid, internal date, raw message)."""
+        self.messages = messages
+        self.uidvalidity = uidvalidity
+        self.commands = []
+        self.hang = False
+        self.idle = b""
+        self.port = None
+        self._reported = set()
+        self._server = None
+
+    async def start(self) -> None:
+        """Listen on a free localhost port."""
+        self._server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _client(self, reader, writer) -> None:
+        """Handle one connection."""
+        writer.write(b"* OK Fake IMAP ready\r\n")
+        while line := await reader.readline():
+            tag, _, command = line.rstrip(b"\r\n").partition(b" ")
+            self.commands.append(command)
+            if self.hang:
+                continue
+            if command.upper() == b"IDLE":
+                # Anything queued for IDLE arrives with the continuation
+                writer.write(b"+ idling\r\n" + self.idle)
+                await reader.readline()
+                writer.write(tag + b" OK IDLE terminated\r\n")
+                await writer.drain()
+                continue
+            name, _, args = command.partition(b" ")
+            name = name.upper()
+            if name == b"UID":
+                name, _, args = args.partition(b" ")
+                name = b"UID " + name.upper()
+            handler = getattr(self, "_" + name.decode().lower().replace(" ", "_"))
+            writer.write(handler(args) + tag + b" OK " + name + b" completed\r\n")
+            await writer.drain()
+            if name == b"LOGOUT":
+                break
+        writer.close()
+
+    def _capability(self, args: bytes) -> bytes:
+        """Report the capabilities."""
+        return b"* CAPABILITY IMAP4rev1 IDLE\r\n"
+
+    def _login(self, args: bytes) -> bytes:
+        """Accept any login."""
+        return b""
+
+    def _noop(self, args: bytes) -> bytes:
+        """Report messages added or removed since the last report."""
+        return self._exists()
+
+    def _logout(self, args: bytes) -> bytes:
+        """Say goodbye."""
+        return b"* BYE\r\n"
+
+    def _select(self, args: bytes) -> bytes:
+        """Select the only folder."""
+        uidnext = max((uid for uid, date, raw in self.messages), default=0) + 1
+        self._reported = {uid for uid, date, raw in self.messages}
+        return (
+            f"* {len(self.messages)} EXISTS\r\n"
+            f"* OK [UIDVALIDITY {self.uidvalidity}] UIDs valid\r\n"
+            f"* OK [UIDNEXT {uidnext}] Predicted next UID\r\n"
+        ).encode()
+
+    def _exists(self) -> bytes:
+        """Return the untagged responses for messages added or removed."""
+        uids = {uid for uid, date, raw in self.messages}
+        if uids == self._reported:
+            return b""
+        expunged = len(self._reported - uids)
+        self._reported = uids
+        return b"* 1 EXPUNGE\r\n" * expunged + (f"* {len(uids)} EXISTS\r\n".encode())
+
+    def _uid_search(self, args: bytes) -> bytes:
+        """Search the messages."""
+        last = max((uid for uid, date, raw in self.messages), default=0)
+        match = _criteria(TOKENS.findall(args), last)
+        found = [str(uid) for uid, date, raw in self.messages if match(uid, date, raw)]
+        return ("* SEARCH " + " ".join(found)).rstrip().encode() + b"\r\n"
+
+    def _uid_fetch(self, args: bytes) -> bytes:
+        """Fetch whole messages or their headers."""
+        sequence, _, parts = args.partition(b" ")
+        wanted = set()
+        for item in sequence.decode().split(","):
+            first, _, last = item.partition(":")
+            wanted.update(range(int(first), int(last or first) + 1))
+
+        response = b""
+        for num, (uid, date, raw) in enumerate(self.messages, 1):
+            if uid not in wanted:
+                continue
+            msg = email.message_from_bytes(raw)
+            if b"HEADER.FIELDS" in parts:
+                body = "".join(
+                    f"{name}: {msg[name]}\r\n"
+                    for name in ("From", "Subject", "Date")
+                    if msg[name] is not None
+                ).encode()
+                items = [
+                    (
+                        f'INTERNALDATE "{date:%d-%b-%Y} 08:00:00 +0000" '
+                        "BODY[HEADER.FIELDS (FROM SUBJECT DATE)]",
+                        body,
+                    )
+                ]
+            elif b"BODYSTRUCTURE" in parts:
+                items = [(f"BODYSTRUCTURE {bodystructure(msg)}", None)]
+            elif sections := re.findall(rb"BODY\.PEEK\[([\d.]*)\]", parts):
+                items = [
+                    (f"BODY[{section.decode()}]", _section(msg, raw, section))
+                    for section in sections
+                ]
+            else:
+                items = [("RFC822", raw)]
+
+            response += f"* {num} FETCH (UID {uid}".encode()
+            for item, body in items:
+                response += f" {item}".encode()
+                if body is not None:
+                    response += f" {{{len(body)}}}\r\n".encode() + body
+            response += b")\r\n"
+        return response
+
+
+def bodystructure(msg: email.message.Message) -> str:
+    """Return the BODYSTRUCTURE of a message."""
+    if msg.is_multipart():
+        children = "".join(bodystructure(part) for part in msg.get_payload())
+        return (
+            f'({children} "{msg.get_content_subtype().upper()}" '
+            f'("BOUNDARY" "{msg.get_boundary()}") NIL NIL NIL)'
+        )
+
+    maintype, subtype = msg.get_content_type().upper().split("/")
+    params = " ".join(f'"{k.upper()}" "{v}"' for k, v in msg.get_params()[1:])
+    encoding = (msg.get("Content-Transfer-Encoding") or "7bit").upper()
+    payload = msg.get_payload()
+    fields = (
+        f'"{maintype}" "{subtype}" ({params or "NIL"}) NIL NIL "{encoding}" '
+        f"{len(payload)}"
+    )
+    if maintype == "TEXT":
+        fields += f" {len(payload.splitlines())}"
+    disposition = "NIL"
+    if msg.get_filename() is not None:
+        disposition = f'("INLINE" ("FILENAME" "{msg.get_filename()}"))'
+    return f"({fields} NIL {disposition} NIL NIL)"
+
+
+def _section(msg: email.message.Message, raw: bytes, section: bytes) -> bytes:
+    """Return the still encoded content of a body section, all of raw for []."""
+    if not section:
+        return raw
+    for index in section.decode().split("."):
+        if msg.is_multipart():
+            msg = msg.get_payload()[int(index) - 1]
+    return msg.get_payload().encode()
+
+
+def _criteria(tokens: list, last: int):
+    """Build a matcher for the search keys in tokens, all must match.
+
+    last is the highest UID in the folder, the value of * in UID sets.
+    """
+    keys = []
+    while tokens:
+        keys.append(_key(tokens, last))
+    return lambda uid, date, raw: all(key(uid, date, raw) for key in keys)
+
+
+def _key(tokens: list, last: int):
+    """Build a matcher for the next search key."""
+    token = tokens.pop(0).upper()
+    if token == b"OR":
+        first, second = _key(tokens, last), _key(tokens, last)
+        return lambda *message: first(*message) or second(*message)
+    if token == b"(":
+        keys = []
+        while tokens[0] != b")":
+            keys.append(_key(tokens, last))
+        tokens.pop(0)
+        return lambda *message: all(key(*message) for key in keys)
+    if token == b"UID":
+        uids = set()
+        for item in tokens.pop(0).decode().replace("*", str(last)).split(","):
+            first, _, end = item.partition(":")
+            first, end = sorted((int(first), int(end or first)))
+            uids.update(range(first, end + 1))
+        return lambda uid, date, raw: uid in uids
+    if token == b"SINCE":
+        since = datetime.datetime.strptime(tokens.pop(0).decode(), "%d-%b-%Y").date()
+        return lambda uid, date, raw: date >= since
+    if token in (b"FROM", b"SUBJECT"):
+        value = tokens.pop(0).strip(b'"').decode().lower()
+        header = token.decode()
+        return (
+            lambda uid, date, raw: value
+            in str(email.message_from_bytes(raw)[header] or "").lower()
+        )
+    raise ValueError(f"Unsupported search key {token!r}")
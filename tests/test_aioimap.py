@@ -0,0 +1,284 @@
+"""Tests for the asyncio IMAP client."""
+
+import asyncio
+import datetime
+import imaplib
+import time
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.mail_and_packages.aioimap import AsyncImapClient
+from custom_components.mail_and_packages.helpers import (
+    ImapConnection,
+    _informed_delivery_parts,
+    get_count,
+    get_formatted_date,
+    idle_wait,
+)
+from tests.imap_server import FakeImapServer
+
+
+def _ups_server() -> FakeImapServer:
+    """Return a server holding the UPS out for delivery email from today."""
+    with open("tests/test_emails/ups_out_for_delivery.eml", "rb") as email_file:
+        raw = email_file.read()
+    return FakeImapServer([(1, datetime.date.today(), raw)])
+
+
+async def test_client_search_fetch(socket_enabled):
+    """Test responses have the same shape as imaplib."""
+    server = _ups_server()
+    await server.start()
+    try:
+        client = AsyncImapClient("127.0.0.1", server.port, use_ssl=False)
+        await client.connect()
+        assert "IDLE" in client.capabilities
+        assert (await client.login("user@fake.email", 'pass"word'))[0] == "OK"
+        assert (await client.select('"INBOX"'))[0] == "OK"
+        assert client.uidvalidity == 1234
+
+        result = await client.uid(
+            "SEARCH", f'(FROM "mcinfo@ups.com" SINCE {get_formatted_date()})'
+        )
+        assert result == ("OK", [b"1"])
+        result = await client.uid("SEARCH", '(FROM "tracking@fedex.com")')
+        assert result == ("OK", [b""])
+
+        status, data = await client.uid("FETCH", "1", "(RFC822)")
+        assert status == "OK"
+        assert data[0][0].startswith(b"1 (UID 1 RFC822 {")
+        assert data[0][1] == server.messages[0][2]
+        assert data[1] == b")"
+
+        await client.logout()
+        assert not client.connected
+        assert server.commands[1] == b'LOGIN "user@fake.email" "pass\\"word"'
+    finally:
+        await server.stop()
+
+
+async def test_client_cancel(socket_enabled):
+    """Test a cancelled command closes the connection."""
+    server = _ups_server()
+    await server.start()
+    try:
+        client = AsyncImapClient("127.0.0.1", server.port, use_ssl=False)
+        await client.connect()
+        server.hang = True
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.noop(), 0.1)
+        assert not client.connected
+    finally:
+        await server.stop()
+
+
+async def test_prefetch(socket_enabled, mock_imap):
+    """Test only headers are prefetched and bodies come over the async session."""
+    server = _ups_server()
+    await server.start()
+    try:
+        connection = ImapConnection(
+            "127.0.0.1", server.port, "user@fake.email", "password", '"INBOX"', 5
+        )
+        config = {"resources": ["ups_delivered", "ups_delivering"], "amazon_fwds": []}
+        with patch(
+            "custom_components.mail_and_packages.helpers.AsyncImapClient",
+            partial(AsyncImapClient, use_ssl=False),
+        ):
+            assert await connection.async_prefetch(config)
+        assert b"HEADER.FIELDS" in server.commands[-1]
+
+        def _count():
+            with connection.sync.session(None, connection.account) as account:
+                return (
+                    get_count(account, "ups_delivering", True)["count"],
+                    get_count(account, "ups_delivered")["count"],
+                )
+
+        assert await asyncio.get_running_loop().run_in_executor(None, _count) == (1, 0)
+        assert not mock_imap.login.called
+        assert not connection.sync.prefetched
+        assert server.commands[-1] == b"UID FETCH 1 (BODY.PEEK[])"
+        assert not any(b"RFC822" in command for command in server.commands)
+
+        await connection.async_close()
+        assert server.commands[-1] == b"LOGOUT"
+    finally:
+        await server.stop()
+
+
+async def test_prefetch_incremental(socket_enabled):
+    """Test a repeated scan only searches earlier results and newer UIDs."""
+    raw = _ups_server().messages[0][2]
+    today = datetime.date.today()
+    server = FakeImapServer([(1, today, raw), (3, today, raw)])
+    await server.start()
+    try:
+        connection = ImapConnection(
+            "127.0.0.1", server.port, "user@fake.email", "password", '"INBOX"'
+        )
+        config = {"resources": ["ups_delivered"], "amazon_fwds": []}
+        with patch(
+            "custom_components.mail_and_packages.helpers.AsyncImapClient",
+            partial(AsyncImapClient, use_ssl=False),
+        ):
+            assert await connection.async_prefetch(config)
+            assert connection.sync.highest_uid == 3
+
+            del server.messages[0]
+            server.messages.append((4, today, b"Subject: other\r\n\r\n"))
+            server.messages.append((5, today, raw))
+            assert await connection.async_prefetch(config)
+
+        searches = [command for command in server.commands if b"SEARCH" in command]
+        assert searches[0].startswith(b"UID SEARCH (FROM")
+        assert searches[1].startswith(b"UID SEARCH UID 1,3,4:* (FROM")
+        assert connection.sync.search("mcinfo@ups.com", get_formatted_date()) == (
+            "OK",
+            [b"3 5"],
+        )
+        assert connection.sync.highest_uid == 5
+        await connection.async_close()
+    finally:
+        await server.stop()
+
+
+async def test_prefetch_informed_delivery(socket_enabled, mock_imap):
+    """Test the digest images are fetched part by part over the async session."""
+    with open("tests/test_emails/informed_delivery.eml", "rb") as email_file:
+        raw = email_file.read()
+    server = FakeImapServer([(1, datetime.date.today(), raw)])
+    await server.start()
+    try:
+        connection = ImapConnection(
+            "127.0.0.1", server.port, "user@fake.email", "password", '"INBOX"', 5
+        )
+        with patch(
+            "custom_components.mail_and_packages.helpers.AsyncImapClient",
+            partial(AsyncImapClient, use_ssl=False),
+        ):
+            assert await connection.async_prefetch(
+                {"resources": ["usps_mail"], "amazon_fwds": []}
+            )
+
+        def _parts():
+            with connection.sync.session(None, connection.account) as account:
+                return _informed_delivery_parts(account, b"1")
+
+        attachments, html = await asyncio.get_running_loop().run_in_executor(
+            None, _parts
+        )
+        assert [name for name, _ in attachments] == [
+            "1040327780-101.jpg",
+            "1040262179-101.jpg",
+            "1040327779-101.jpg",
+        ]
+        assert all(content.startswith(b"\xff\xd8") for _, content in attachments)
+        assert "USPS" in html
+        assert not mock_imap.login.called
+        assert server.commands[-2] == b"UID FETCH 1 (BODYSTRUCTURE)"
+        assert server.commands[-1].startswith(b"UID FETCH 1 (BODY.PEEK[1] ")
+
+        await connection.async_close()
+    finally:
+        await server.stop()
+
+
+async def test_prefetch_unavailable(socket_enabled):
+    """Test the regular session is used when the async one fails."""
+    server = _ups_server()
+    await server.start()
+    port = server.port
+    await server.stop()
+
+    connection = ImapConnection(
+        "127.0.0.1", port, "user@fake.email", "password", '"INBOX"'
+    )
+    config = {"resources": ["ups_delivered"], "amazon_fwds": []}
+    with patch(
+        "custom_components.mail_and_packages.helpers.AsyncImapClient",
+        partial(AsyncImapClient, use_ssl=False),
+    ):
+        assert not await connection.async_prefetch(config)
+
+
+async def test_prefetch_checked(socket_enabled):
+    """Test the session async_state checked is not checked again."""
+    server = _ups_server()
+    await server.start()
+    try:
+        connection = ImapConnection(
+            "127.0.0.1", server.port, "user@fake.email", "password", '"INBOX"'
+        )
+        config = {"resources": ["ups_delivered"], "amazon_fwds": []}
+        with patch(
+            "custom_components.mail_and_packages.helpers.AsyncImapClient",
+            partial(AsyncImapClient, use_ssl=False),
+        ):
+            assert await connection.async_state() is not None
+            assert await connection.async_prefetch(config, checked=True)
+        assert b"NOOP" not in server.commands
+
+        await connection.async_close()
+    finally:
+        await server.stop()
+
+
+async def test_idle_wait_buffered(socket_enabled):
+    """Test new mail arriving with the IDLE continuation is not missed."""
+    server = _ups_server()
+    server.idle = b"* 2 EXISTS\r\n"
+    await server.start()
+    try:
+
+        def _idle():
+            account = imaplib.IMAP4("127.0.0.1", server.port, timeout=5)
+            try:
+                return idle_wait(account, 2)
+            finally:
+                account.logout()
+
+        start = time.monotonic()
+        assert await asyncio.get_running_loop().run_in_executor(None, _idle)
+        assert time.monotonic() - start < 1
+    finally:
+        await server.stop()
+
+
+async def test_async_state(socket_enabled):
+    """Test the folder fingerprint only changes with new mail."""
+    server = _ups_server()
+    await server.start()
+    try:
+        connection = ImapConnection(
+            "127.0.0.1", server.port, "user@fake.email", "password", '"INBOX"'
+        )
+        with patch(
+            "custom_components.mail_and_packages.helpers.AsyncImapClient",
+            partial(AsyncImapClient, use_ssl=False),
+        ):
+            state = await connection.async_state()
+            assert state == (get_formatted_date(), 1234, 1, 0, 2, None)
+            assert server.commands[:4] == [
+                b"CAPABILITY",
+                b'LOGIN "user@fake.email" "password"',
+                b"CAPABILITY",
+                b'SELECT "INBOX"',
+            ]
+            assert await connection.async_state() == state
+            assert server.commands[-1] == b"NOOP"
+            assert not [command for command in server.commands if b"STATUS" in command]
+
+            server.messages.append((2, datetime.date.today(), b"Subject: new\r\n\r\n"))
+            assert await connection.async_state() != state
+
+            state = await connection.async_state()
+            server.messages[:] = server.messages[1:]
+            server.messages.append((3, datetime.date.today(), b"Subject: new\r\n\r\n"))
+            assert await connection.async_state() != state
+
+        await connection.async_close()
+    finally:
+        await server.stop()
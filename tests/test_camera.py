@@ -164,6 +164,139 @@ async def test_async_camera_image(
         assert m_open.call_args.args[1] == "rb"
 
 
+async def test_async_camera_image_cached(
+    tmp_path,
+    hass,
+    mock_imap_no_email,
+    mock_osremove,
+    mock_osmakedir,
+    mock_listdir,
+    mock_update_time,
+    mock_copy_overlays,
+    mock_hash_file,
+    mock_getctime_today,
+    mock_update,
+):
+    """Test the camera image is only read again when the file changes."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    camera = hass.data[DOMAIN][entry.entry_id][CAMERA][0]
+    image_file = tmp_path / "mail_today.gif"
+    image_file.write_bytes(b"first")
+    camera._file_path = str(image_file)
+
+    with patch("builtins.open", wraps=open) as m_open:
+        assert await camera.async_camera_image() == b"first"
+        assert await camera.async_camera_image() == b"first"
+        assert m_open.call_count == 1
+
+        image_file.write_bytes(b"second!")
+        assert await camera.async_camera_image() == b"second!"
+        assert m_open.call_count == 2
+
+
+async def test_async_camera_image_resized(
+    tmp_path,
+    hass,
+    mock_imap_no_email,
+    mock_osremove,
+    mock_osmakedir,
+    mock_listdir,
+    mock_update_time,
+    mock_copy_overlays,
+    mock_hash_file,
+    mock_getctime_today,
+    mock_update,
+):
+    """Test resized camera images are kept until the image changes."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    camera = hass.data[DOMAIN][entry.entry_id][CAMERA][0]
+    image_file = tmp_path / "mail_today.gif"
+    image_file.write_bytes(b"first")
+    camera._file_path = str(image_file)
+
+    with patch(
+        "custom_components.mail_and_packages.camera.resize_image",
+        side_effect=lambda image, width, height: image + b" small",
+    ) as mock_resize:
+        assert await camera.async_camera_image(100, 50) == b"first small"
+        assert await camera.async_camera_image(100, 50) == b"first small"
+        assert await camera.async_camera_image() == b"first"
+        assert mock_resize.call_count == 1
+
+        image_file.write_bytes(b"second!")
+        assert await camera.async_camera_image(100, 50) == b"second! small"
+        assert mock_resize.call_count == 2
+
+        mock_resize.side_effect = None
+        mock_resize.return_value = None
+        assert await camera.async_camera_image(1000, 1000) == b"second!"
+
+
+async def test_mjpeg_stream(
+    tmp_path,
+    hass,
+    mock_imap_no_email,
+    mock_osremove,
+    mock_osmakedir,
+    mock_listdir,
+    mock_update_time,
+    mock_copy_overlays,
+    mock_hash_file,
+    mock_getctime_today,
+    mock_update,
+):
+    """Test the USPS camera streams its frames at the image duration."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    camera = hass.data[DOMAIN][entry.entry_id][CAMERA][0]
+    image_file = tmp_path / "mail_today.gif"
+    image_file.write_bytes(b"gif")
+    camera._file_path = str(image_file)
+
+    with patch(
+        "custom_components.mail_and_packages.camera.async_get_still_stream"
+    ) as mock_stream, patch(
+        "custom_components.mail_and_packages.camera.jpeg_frames",
+        return_value=[b"one", b"two"],
+    ) as mock_frames:
+        await camera.handle_async_mjpeg_stream(None)
+        request, next_frame, content_type, interval = mock_stream.call_args.args
+        assert content_type == "image/jpeg"
+        assert interval == 5
+
+        assert [await next_frame() for _ in range(3)] == [b"one", b"two", b"one"]
+        assert mock_frames.call_count == 1
+
+        image_file.unlink()
+        assert await next_frame() is None
+
+
 async def test_async_camera_image_file_error(
     hass,
     mock_imap_no_email,
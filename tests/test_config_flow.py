@@ -14,7 +14,11 @@ from custom_components.mail_and_packages.const import (
     CONF_SCAN_INTERVAL,
     DOMAIN,
 )
-from custom_components.mail_and_packages.helpers import _check_ffmpeg, _test_login
+from custom_components.mail_and_packages.helpers import (
+    _check_ffmpeg,
+    _check_pyav,
+    _test_login,
+)
 from tests.const import FAKE_CONFIG_DATA, FAKE_CONFIG_DATA_BAD
 
 
@@ -38,6 +42,9 @@ from tests.const import FAKE_CONFIG_DATA, FAKE_CONFIG_DATA_BAD
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -87,6 +94,9 @@ from tests.const import FAKE_CONFIG_DATA, FAKE_CONFIG_DATA_BAD
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -200,6 +210,9 @@ async def test_form(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -249,6 +262,9 @@ async def test_form(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -399,6 +415,9 @@ async def test_form_connection_error(input_1, step_id_2, hass, mock_imap):
                 "generate_mp4": True,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -441,6 +460,9 @@ async def test_form_connection_error(input_1, step_id_2, hass, mock_imap):
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -474,10 +496,18 @@ async def test_form_connection_error(input_1, step_id_2, hass, mock_imap):
         ),
     ],
 )
+@pytest.mark.parametrize(
+    "encoder,check,errors",
+    [
+        ("ffmpeg", "_check_ffmpeg", {CONF_GENERATE_MP4: "ffmpeg_not_found"}),
+        ("pyav", "_check_pyav", {"video_encoder": "pyav_not_found"}),
+    ],
+)
 async def test_form_invalid_ffmpeg(
-    input_1, step_id_2, input_2, title, data, hass, mock_imap
+    input_1, step_id_2, input_2, title, data, encoder, check, errors, hass, mock_imap
 ):
     """Test we get the form."""
+    input_2 = {**input_2, "video_encoder": encoder}
     await setup.async_setup_component(hass, "persistent_notification", {})
     result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
@@ -490,7 +520,7 @@ async def test_form_invalid_ffmpeg(
         "custom_components.mail_and_packages.config_flow._test_login",
         return_value=True,
     ), patch(
-        "custom_components.mail_and_packages.config_flow._check_ffmpeg",
+        f"custom_components.mail_and_packages.config_flow.{check}",
         return_value=False,
     ), patch(
         "custom_components.mail_and_packages.async_setup", return_value=True
@@ -511,7 +541,7 @@ async def test_form_invalid_ffmpeg(
 
     assert result3["type"] == "form"
     assert result3["step_id"] == step_id_2
-    assert result3["errors"] == {CONF_GENERATE_MP4: "ffmpeg_not_found"}
+    assert result3["errors"] == errors
 
 
 @pytest.mark.parametrize(
@@ -534,6 +564,9 @@ async def test_form_invalid_ffmpeg(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -578,6 +611,9 @@ async def test_form_invalid_ffmpeg(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -680,6 +716,9 @@ async def test_form_index_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -724,6 +763,9 @@ async def test_form_index_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -825,6 +867,9 @@ async def test_form_index_error_2(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -869,6 +914,9 @@ async def test_form_index_error_2(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -961,6 +1009,12 @@ async def test_invalid_ffmpeg(test_invalid_ffmpeg):
     assert not result
 
 
+async def test_check_pyav():
+    assert await _check_pyav()
+    with patch("importlib.util.find_spec", return_value=None):
+        assert not await _check_pyav()
+
+
 async def test_imap_login(mock_imap):
     result = await _test_login(
         "127.0.0.1", 993, "fakeuser@test.email", "suchfakemuchpassword"
@@ -998,6 +1052,9 @@ async def test_imap_login_error(mock_imap_login_error, caplog):
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -1050,6 +1107,9 @@ async def test_imap_login_error(mock_imap_login_error, caplog):
                 "image_path": "custom_components/mail_and_packages/images/",
                 "image_security": True,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -1174,6 +1234,9 @@ async def test_options_flow(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -1226,6 +1289,9 @@ async def test_options_flow(
                 "image_path": "custom_components/mail_and_packages/images/",
                 "image_security": True,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -1403,6 +1469,9 @@ async def test_options_flow_connection_error(
                 "generate_mp4": True,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1447,6 +1516,9 @@ async def test_options_flow_connection_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1551,6 +1623,9 @@ async def test_options_flow_invalid_ffmpeg(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1595,6 +1670,9 @@ async def test_options_flow_invalid_ffmpeg(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1700,6 +1778,9 @@ async def test_options_flow_index_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1744,6 +1825,9 @@ async def test_options_flow_index_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1849,6 +1933,9 @@ async def test_options_flow_index_error_2(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1893,6 +1980,9 @@ async def test_options_flow_index_error_2(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -1996,6 +2086,9 @@ async def test_options_flow_mailbox_format2(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -2043,6 +2136,9 @@ async def test_options_flow_mailbox_format2(
                 "image_path": "custom_components/mail_and_packages/images/",
                 "image_security": True,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 15,
                 "resources": [
                     "amazon_packages",
@@ -2154,6 +2250,9 @@ async def test_options_flow_bad(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 30,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 20,
                 "resources": [
                     "amazon_packages",
@@ -2248,6 +2347,9 @@ async def test_form_amazon_error(
                 "generate_mp4": False,
                 "gif_duration": 5,
                 "imap_timeout": 9,
+                "imap_idle": False,
+                "resize_workers": 1,
+                "video_encoder": "ffmpeg",
                 "scan_interval": 1,
                 "resources": [
                     "amazon_packages",
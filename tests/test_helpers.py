@@ -1,33 +1,63 @@
 """Tests for helpers module."""
+
+import asyncio
 import datetime
+import email
 import errno
+import re
+import threading
+import zlib
 from datetime import date, timezone
+from io import BytesIO
+from shutil import copyfile
 from unittest import mock
 from unittest.mock import call, mock_open, patch
 
 import pytest
 from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
+from PIL import Image
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.mail_and_packages.const import DOMAIN
+from custom_components.mail_and_packages.const import DOMAIN, HEADER_PARTS
 from custom_components.mail_and_packages.helpers import (
-    _generate_mp4,
+    _HASH_CACHE,
+    PATTERNS,
+    ImapConnection,
+    MailboxSync,
+    MessageCache,
     amazon_exception,
     amazon_hub,
+    amazon_markers,
     amazon_search,
+    async_generate_mp4,
+    build_search,
     cleanup_images,
+    compiled,
+    copy_images,
     download_img,
     email_fetch,
+    email_fetch_batch,
     email_search,
+    email_search_subjects,
+    encode_mp4,
+    fetch_headers,
+    find_text,
     get_count,
     get_formatted_date,
     get_items,
     get_mails,
+    get_tracking,
     hash_file,
+    idle_wait,
     image_file_name,
+    jpeg_frames,
     login,
+    mp4_outdated,
+    parse_amazon_date,
     process_emails,
+    resize_image,
     resize_images,
+    scan_criteria,
     selectfolder,
     update_time,
 )
@@ -170,7 +200,12 @@ async def test_process_emails_external(
         "custom_components/mail_and_packages/images/" in mock_copytree.call_args.args[0]
     )
     assert "www/mail_and_packages" in mock_copytree.call_args.args[1]
-    assert mock_copytree.call_args.kwargs == {"dirs_exist_ok": True}
+    assert mock_copytree.call_args.kwargs["dirs_exist_ok"]
+    ignore = mock_copytree.call_args.kwargs["ignore"]
+    assert ignore("", [".image_state.json", ".mail_fingerprint", "test.gif"]) == {
+        ".image_state.json",
+        ".mail_fingerprint",
+    }
     assert (
         "www/mail_and_packages/amazon/anotherfakefile.mp4"
         in mock_osremove.call_args.args[0]
@@ -451,32 +486,36 @@ async def test_email_fetch(mock_imap_fetch_error, caplog):
     assert "Error fetching emails:" in caplog.text
 
 
-async def test_get_mails(mock_imap_no_email, mock_copyfile):
-    result = get_mails(mock_imap_no_email, "./", "5", "mail_today.gif", False)
+async def test_get_mails(tmp_path, mock_imap_no_email, mock_copyfile):
+    result = get_mails(mock_imap_no_email, f"{tmp_path}/", "5", "mail_today.gif")
     assert result == 0
 
 
-async def test_get_mails_makedirs_error(mock_imap_no_email, mock_copyfile, caplog):
+async def test_get_mails_makedirs_error(
+    tmp_path, mock_imap_no_email, mock_copyfile, caplog
+):
     with patch("os.path.isdir", return_value=False), patch(
         "os.makedirs", side_effect=OSError
     ):
-        get_mails(mock_imap_no_email, "./", "5", "mail_today.gif", False)
+        get_mails(mock_imap_no_email, f"{tmp_path}/", "5", "mail_today.gif")
         assert "Error creating directory:" in caplog.text
 
 
 async def test_get_mails_copyfile_error(
+    tmp_path,
     mock_imap_usps_informed_digest_no_mail,
     mock_copyoverlays,
     mock_copyfile_exception,
     caplog,
 ):
     result = get_mails(
-        mock_imap_usps_informed_digest_no_mail, "./", "5", "mail_today.gif", False
+        mock_imap_usps_informed_digest_no_mail, f"{tmp_path}/", "5", "mail_today.gif"
     )
     assert "File not found" in caplog.text
 
 
 async def test_get_mails_email_search_error(
+    tmp_path,
     mock_imap_usps_informed_digest_no_mail,
     mock_copyoverlays,
     mock_copyfile_exception,
@@ -487,12 +526,16 @@ async def test_get_mails_email_search_error(
         return_value=("BAD", []),
     ):
         result = get_mails(
-            mock_imap_usps_informed_digest_no_mail, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest_no_mail,
+            f"{tmp_path}/",
+            "5",
+            "mail_today.gif",
         )
         assert result == 0
 
 
 async def test_informed_delivery_emails(
+    tmp_path,
     mock_imap_usps_informed_digest,
     mock_osremove,
     mock_osmakedir,
@@ -507,7 +550,7 @@ async def test_informed_delivery_emails(
     m_open = mock_open()
     with patch("builtins.open", m_open, create=True):
         result = get_mails(
-            mock_imap_usps_informed_digest, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest, f"{tmp_path}/", "5", "mail_today.gif"
         )
         assert result == 3
         assert "USPSInformedDelivery@usps.gov" in caplog.text
@@ -517,6 +560,7 @@ async def test_informed_delivery_emails(
 
 
 async def test_get_mails_imageio_error(
+    tmp_path,
     mock_imap_usps_informed_digest,
     mock_osremove,
     mock_osmakedir,
@@ -533,58 +577,65 @@ async def test_get_mails_imageio_error(
             mock_imageio.return_value = mock.Mock(autospec=True)
             mock_imageio.mimwrite.side_effect = Exception("Processing Error")
             result = get_mails(
-                mock_imap_usps_informed_digest, "./", "5", "mail_today.gif", False
+                mock_imap_usps_informed_digest, f"{tmp_path}/", "5", "mail_today.gif"
             )
             assert result == 3
             assert "Error attempting to generate image:" in caplog.text
 
 
-async def test_informed_delivery_emails_mp4(
+async def test_informed_delivery_emails_no_temp_files(
     mock_imap_usps_informed_digest,
+    mock_listdir,
     mock_osremove,
     mock_osmakedir,
-    mock_listdir,
     mock_os_path_splitext,
     mock_image,
     mock_io,
     mock_resizeimage,
     mock_copyfile,
 ):
-    with patch(
-        "custom_components.mail_and_packages.helpers._generate_mp4"
-    ) as mock_generate_mp4:
-        m_open = mock_open()
-        with patch("builtins.open", m_open, create=True):
-            result = get_mails(
-                mock_imap_usps_informed_digest, "./", "5", "mail_today.gif", True
-            )
-            assert result == 3
-            assert mock_generate_mp4.called_with("./", "mail_today.gif")
+    m_open = mock_open()
+    with patch("builtins.open", m_open, create=True):
+        result = get_mails(
+            mock_imap_usps_informed_digest, "/totally/fake/path/", "5", "mail_today.gif"
+        )
+    assert result == 3
+    assert not m_open.called
+    assert mock_resizeimage.resize_contain.call_count == 3
+    args, kwargs = mock_io.mimwrite.call_args
+    assert args[0] == "/totally/fake/path/mail_today.gif"
+    assert len(args[1]) == 3
+    assert kwargs == {"duration": "5"}
 
 
-async def test_informed_delivery_emails_open_err(
+async def test_informed_delivery_emails_unchanged(
     mock_imap_usps_informed_digest,
-    mock_listdir,
-    mock_osremove,
-    mock_osmakedir,
-    mock_os_path_splitext,
     mock_image,
     mock_io,
     mock_resizeimage,
     mock_copyfile,
-    caplog,
+    tmp_path,
 ):
-    get_mails(
-        mock_imap_usps_informed_digest,
-        "/totally/fake/path/",
-        "5",
-        "mail_today.gif",
-        False,
-    )
-    assert (
-        "Error opening filepath: [Errno 2] No such file or directory: '/totally/fake/path/1040327780-101.jpg'"
-        in caplog.text
-    )
+    """Test the mail image is only rendered again when the mail changes."""
+    mock_io.mimwrite.side_effect = lambda path, frames, **kwargs: open(
+        path, "wb"
+    ).close()
+    path = f"{tmp_path}/"
+
+    assert get_mails(mock_imap_usps_informed_digest, path, "5", "mail.gif") == 3
+    assert mock_io.mimwrite.call_count == 1
+    assert (tmp_path / ".mail_fingerprint").is_file()
+
+    assert get_mails(mock_imap_usps_informed_digest, path, "5", "mail.gif") == 3
+    assert mock_io.mimwrite.call_count == 1
+    assert mock_resizeimage.resize_contain.call_count == 3
+
+    assert get_mails(mock_imap_usps_informed_digest, path, "2", "mail.gif") == 3
+    assert mock_io.mimwrite.call_count == 2
+
+    (tmp_path / "mail.gif").unlink()
+    assert get_mails(mock_imap_usps_informed_digest, path, "2", "mail.gif") == 3
+    assert mock_io.mimwrite.call_count == 3
 
 
 async def test_informed_delivery_emails_io_err(
@@ -593,24 +644,17 @@ async def test_informed_delivery_emails_io_err(
     mock_osremove,
     mock_osmakedir,
     mock_os_path_splitext,
-    mock_image,
-    mock_resizeimage,
     mock_copyfile,
+    caplog,
 ):
-    with pytest.raises(FileNotFoundError) as exc_info:
-        m_open = mock_open()
-        with patch("builtins.open", m_open, create=True):
-            get_mails(
-                mock_imap_usps_informed_digest,
-                "/totally/fake/path/",
-                "5",
-                "mail_today.gif",
-                False,
-            )
-    assert type(exc_info.value) is FileNotFoundError
+    get_mails(
+        mock_imap_usps_informed_digest, "/totally/fake/path/", "5", "mail_today.gif"
+    )
+    assert "Error attempting to generate image:" in caplog.text
 
 
 async def test_informed_delivery_missing_mailpiece(
+    tmp_path,
     mock_imap_usps_informed_digest_missing,
     mock_listdir,
     mock_osremove,
@@ -621,15 +665,84 @@ async def test_informed_delivery_missing_mailpiece(
     mock_resizeimage,
     mock_copyfile,
 ):
-    m_open = mock_open()
+    m_open = mock_open(read_data=b"")
     with patch("builtins.open", m_open, create=True):
         result = get_mails(
-            mock_imap_usps_informed_digest_missing, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest_missing,
+            f"{tmp_path}/",
+            "5",
+            "mail_today.gif",
         )
         assert result == 5
 
 
+def _bodystructure(msg: email.message.Message) -> bytes:
+    """Return a BODYSTRUCTURE response for a multipart/related email."""
+    parts = []
+    for part in msg.get_payload():
+        maintype, subtype = part.get_content_type().upper().split("/")
+        params = " ".join(f'"{k.upper()}" "{v}"' for k, v in part.get_params()[1:])
+        encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+        fields = f'"{maintype}" "{subtype}" ({params}) NIL NIL "{encoding}" 100'
+        if maintype == "TEXT":
+            fields += " 10"
+        disposition = "NIL"
+        if part.get_filename() is not None:
+            disposition = f'("INLINE" ("FILENAME" "{part.get_filename()}"))'
+        parts.append(f"({fields} NIL {disposition} NIL NIL)")
+    return (
+        f'1 (UID 1 BODYSTRUCTURE ({"".join(parts)} "RELATED" ("BOUNDARY" "x") '
+        "NIL NIL NIL))"
+    ).encode()
+
+
+async def test_informed_delivery_bodystructure(
+    tmp_path,
+    mock_imap_usps_informed_digest_missing,
+    mock_listdir,
+    mock_osremove,
+    mock_osmakedir,
+    mock_os_path_splitext,
+    mock_image,
+    mock_io,
+    mock_resizeimage,
+    mock_copyfile,
+):
+    """Test only the HTML and mail piece images are downloaded."""
+    with open("tests/test_emails/informed_delivery_missing_mailpiece.eml", "rb") as f:
+        msg = email.message_from_bytes(f.read())
+
+    def _fetch(num, parts):
+        if parts == "(BODYSTRUCTURE)":
+            return ("OK", [_bodystructure(msg)])
+        data = []
+        for section in re.findall(r"BODY.PEEK\[(\d+)\]", parts):
+            payload = msg.get_payload()[int(section) - 1].get_payload().encode()
+            prefix = b"1 (UID 1" if not data else b""
+            data.append(
+                (prefix + f" BODY[{section}] {{{len(payload)}}}".encode(), payload)
+            )
+        return ("OK", data + [b")"])
+
+    mock_imap_usps_informed_digest_missing.fetch.side_effect = _fetch
+    result = get_mails(
+        mock_imap_usps_informed_digest_missing, f"{tmp_path}/", "5", "mail_today.gif"
+    )
+    assert result == 5
+    assert mock_imap_usps_informed_digest_missing.fetch.call_args_list == [
+        call(b"1", "(BODYSTRUCTURE)"),
+        call(
+            b"1",
+            "(BODY.PEEK[1] BODY.PEEK[7] BODY.PEEK[8] BODY.PEEK[9] BODY.PEEK[10])",
+        ),
+    ]
+    decoded = [args[0].getvalue() for args, _ in mock_image.open.call_args_list]
+    assert len(decoded) == 5
+    assert all(content.startswith(b"\xff\xd8") for content in decoded)
+
+
 async def test_informed_delivery_no_mail(
+    tmp_path,
     mock_imap_usps_informed_digest_no_mail,
     mock_listdir,
     mock_osremove,
@@ -644,12 +757,16 @@ async def test_informed_delivery_no_mail(
     m_open = mock_open()
     with patch("builtins.open", m_open, create=True):
         result = get_mails(
-            mock_imap_usps_informed_digest_no_mail, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest_no_mail,
+            f"{tmp_path}/",
+            "5",
+            "mail_today.gif",
         )
         assert result == 0
 
 
 async def test_informed_delivery_no_mail_copy_error(
+    tmp_path,
     mock_imap_usps_informed_digest_no_mail,
     mock_listdir,
     mock_osremove,
@@ -666,7 +783,10 @@ async def test_informed_delivery_no_mail_copy_error(
     m_open = mock_open()
     with patch("builtins.open", m_open, create=True):
         get_mails(
-            mock_imap_usps_informed_digest_no_mail, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest_no_mail,
+            f"{tmp_path}/",
+            "5",
+            "mail_today.gif",
         )
         assert mock_copyfile_exception.called_with("./mail_today.gif")
         assert "File not found" in caplog.text
@@ -779,6 +899,23 @@ async def test_amazon_shipped_order_it_count(hass, mock_imap_amazon_shipped_it):
         assert result == 1
 
 
+@pytest.mark.parametrize(
+    "arrive_date,expected",
+    [
+        ("Friday, September 11", (9, 11)),
+        ("Friday, September 11,", (9, 11)),
+        ("tomorrow, September 11", (9, 11)),
+        ("martedì 01 dicembre", (12, 1)),
+        ("wtorek, 1 grudnia", (12, 1)),
+        ("Dienstag, 1. Dezember", (12, 1)),
+        ("today by 10pm", None),
+        ("Friday, Smarch 11", None),
+    ],
+)
+def test_parse_amazon_date(arrive_date, expected):
+    assert parse_amazon_date(arrive_date) == expected
+
+
 async def test_amazon_search(hass, mock_imap_no_email):
     result = amazon_search(mock_imap_no_email, "test/path", hass, "testfilename.jpg")
     assert result == 0
@@ -788,7 +925,7 @@ async def test_amazon_search_results(hass, mock_imap_amazon_shipped):
     result = amazon_search(
         mock_imap_amazon_shipped, "test/path", hass, "testfilename.jpg"
     )
-    assert result == 40
+    assert result == 0
 
 
 async def test_amazon_search_delivered(
@@ -797,8 +934,9 @@ async def test_amazon_search_delivered(
     result = amazon_search(
         mock_imap_amazon_delivered, "test/path", hass, "testfilename.jpg"
     )
-    assert result == 40
+    assert result == 1
     assert mock_download_img.called
+    assert mock_imap_amazon_delivered.search.call_count == 1
 
 
 async def test_amazon_search_delivered_it(
@@ -807,7 +945,7 @@ async def test_amazon_search_delivered_it(
     result = amazon_search(
         mock_imap_amazon_delivered_it, "test/path", hass, "testfilename.jpg"
     )
-    assert result == 40
+    assert result == 1
 
 
 async def test_amazon_hub(hass, mock_imap_amazon_the_hub):
@@ -862,26 +1000,93 @@ async def test_amazon_shipped_order_exception(hass, mock_imap_amazon_shipped, ca
         assert "Problem decoding email message:" in caplog.text
 
 
-async def test_generate_mp4(
-    mock_osremove, mock_os_path_join, mock_subprocess_call, mock_os_path_split
+async def test_generate_mp4(mock_ffmpeg, tmp_path):
+    (tmp_path / "mail_today.gif").write_bytes(b"gif")
+    assert mp4_outdated(str(tmp_path), "mail_today.gif")
+
+    assert await async_generate_mp4(str(tmp_path), "mail_today.gif")
+    assert mock_ffmpeg.call_args[0][:6] == (
+        "ffmpeg",
+        "-y",
+        "-f",
+        "gif",
+        "-i",
+        str(tmp_path / "mail_today.gif"),
+    )
+    assert (tmp_path / "mail_today.mp4").read_bytes() == b"mp4"
+    assert not (tmp_path / ".mail_today.mp4.part").exists()
+    assert not mp4_outdated(str(tmp_path), "mail_today.gif")
+    assert not mp4_outdated(str(tmp_path), "missing.gif")
+
+
+async def test_generate_mp4_error(mock_ffmpeg, tmp_path, caplog):
+    mock_ffmpeg.side_effect = None
+    mock_ffmpeg.return_value.returncode = 1
+    mock_ffmpeg.return_value.wait = mock.AsyncMock(return_value=1)
+    assert not await async_generate_mp4(str(tmp_path), "mail_today.gif")
+    assert not (tmp_path / "mail_today.mp4").exists()
+    assert "ffmpeg failed to generate mp4, exit code: 1" in caplog.text
+
+
+async def test_generate_mp4_timeout(mock_ffmpeg, tmp_path):
+    process = mock.Mock(returncode=None)
+
+    async def _wait():
+        if not process.kill.called:
+            (tmp_path / ".mail_today.mp4.part").write_bytes(b"mp")
+            await asyncio.Event().wait()
+        return -9
+
+    process.wait = mock.AsyncMock(side_effect=_wait)
+    mock_ffmpeg.side_effect = None
+    mock_ffmpeg.return_value = process
+    with pytest.raises(asyncio.TimeoutError):
+        await async_generate_mp4(str(tmp_path), "mail_today.gif", 0.01)
+    assert process.kill.called
+    assert process.wait.await_count == 2
+    assert not (tmp_path / ".mail_today.mp4.part").exists()
+    assert not (tmp_path / "mail_today.mp4").exists()
+
+
+async def test_encode_mp4(tmp_path):
+    av = pytest.importorskip("av")
+    frames = [Image.new("RGB", (725, 320), (shade, 0, 0)) for shade in (0, 100, 200)]
+    assert encode_mp4(frames, str(tmp_path), "mail_today.gif", 5)
+    assert not (tmp_path / ".mail_today.mp4.part").exists()
+    with av.open(str(tmp_path / "mail_today.mp4")) as container:
+        stream = container.streams.video[0]
+        assert (stream.width, stream.height) == (724, 320)
+        assert stream.frames == 3
+        assert container.duration == 15 * av.time_base
+
+    assert not encode_mp4([], str(tmp_path), "empty.gif", 5)
+    with patch.dict("sys.modules", {"av": None}):
+        assert not encode_mp4(frames, str(tmp_path), "mail.gif", 5)
+    assert not (tmp_path / "mail.mp4").exists()
+
+    # Without frames the gif is read
+    frames[0].save(tmp_path / "mail.gif", save_all=True, append_images=frames[1:])
+    assert encode_mp4(None, str(tmp_path), "mail.gif", 5)
+    assert (tmp_path / "mail.mp4").is_file()
+
+
+async def test_informed_delivery_emails_video_frames(
+    mock_imap_usps_informed_digest, mock_copyfile, tmp_path
 ):
-    with patch("custom_components.mail_and_packages.helpers.cleanup_images"):
-        _generate_mp4("./", "testfile.gif")
-
-        mock_os_path_join.called_with("./", "testfile.gif")
-        mock_osremove.called_with("./", "testfile.mp4")
-        mock_subprocess_call.called_with(
-            "ffmpeg",
-            "-f",
-            "gif",
-            "-i",
-            "testfile.gif",
-            "-pix_fmt",
-            "yuv420p",
-            "-filter:v",
-            "crop='floor(in_w/2)*2:floor(in_h/2)*2'",
-            "testfile.mp4",
-        )
+    path = f"{tmp_path}/"
+    frames = []
+    result = get_mails(
+        mock_imap_usps_informed_digest, path, 5, "mail.gif", video_frames=frames
+    )
+    assert result == 3
+    assert [frame.size for frame in frames] == [(724, 320)] * 3
+    assert (tmp_path / "mail.gif").is_file()
+    assert not (tmp_path / "mail.mp4").exists()
+
+    # An unchanged gif has no new frames to encode
+    frames = []
+    get_mails(mock_imap_usps_informed_digest, path, 5, "mail.gif", video_frames=frames)
+    assert not frames
 
 
 async def test_connection_error(caplog):
@@ -905,16 +1110,457 @@ async def test_selectfolder_select_error(mock_imap_select_error, caplog):
     assert "Error selecting folder:" in caplog.text
 
 
-async def test_resize_images_open_err(mock_open_excpetion, caplog):
-    resize_images(["testimage.jpg", "anothertest.jpg"], 724, 320)
-    assert "Error attempting to open image" in caplog.text
+async def test_imap_connection_reuse(mock_imap):
+    """Test the persistent session is reused while NOOP succeeds."""
+    mock_imap.noop.return_value = ("OK", [b"NOOP completed"])
+    connection = ImapConnection(
+        "imap.test.email", 993, "fakeuser", "suchfakemuchpassword", "INBOX"
+    )
+
+    assert connection.account() is mock_imap
+    assert connection.account() is mock_imap
+    assert mock_imap.login.call_count == 1
+    assert mock_imap.noop.call_count == 1
+
+    connection.close()
+    assert mock_imap.logout.call_count == 1
+    # Closing twice is a no-op
+    connection.close()
+    assert mock_imap.logout.call_count == 1
+
+
+async def test_imap_connection_reconnect(mock_imap, caplog):
+    """Test a dead session is replaced with a new login."""
+    mock_imap.noop.side_effect = Exception("socket error")
+    connection = ImapConnection(
+        "imap.test.email", 993, "fakeuser", "suchfakemuchpassword", "INBOX"
+    )
+
+    assert connection.account() is mock_imap
+    assert connection.account() is mock_imap
+    assert mock_imap.login.call_count == 2
+    assert mock_imap.logout.call_count == 1
+    assert "IMAP session check failed: socket error" in caplog.text
+
+
+async def test_imap_connection_select_error(mock_imap_select_error):
+    """Test the session is logged out when the folder can not be selected."""
+    connection = ImapConnection(
+        "imap.test.email", 993, "fakeuser", "suchfakemuchpassword", "INBOX"
+    )
+
+    assert not connection.account()
+    assert mock_imap_select_error.logout.call_count == 1
+
+
+async def test_mailbox_sync_cached_fetch(mock_imap_ups_out_for_delivery):
+    """Test messages are only downloaded once per UIDVALIDITY."""
+    sync = MailboxSync()
+    sync.validate(1234)
+
+    # Headers and body
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        first = get_count(account, "ups_delivering", True)
+    assert mock_imap_ups_out_for_delivery.fetch.call_count == 2
+
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        second = get_count(account, "ups_delivering", True)
+    assert mock_imap_ups_out_for_delivery.fetch.call_count == 2
+    assert first == second
+
+    # New UIDVALIDITY invalidates everything
+    sync.validate(5678)
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        get_count(account, "ups_delivering", True)
+    assert mock_imap_ups_out_for_delivery.fetch.call_count == 4
+
+
+async def test_mailbox_sync_prunes_unused(mock_imap_ups_out_for_delivery):
+    """Test messages no longer returned by a search are dropped."""
+    sync = MailboxSync()
+    sync.validate(1234)
+
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        email_fetch(account, b"1")
+        email_fetch(account, b"2")
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        email_fetch(account, b"2")
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        email_fetch(account, b"1")
+    assert mock_imap_ups_out_for_delivery.fetch.call_count == 3
+
+
+async def test_mailbox_sync_no_uidvalidity(mock_imap_ups_out_for_delivery):
+    """Test nothing is cached when the server gives no UIDVALIDITY."""
+    sync = MailboxSync()
+    sync.validate(None)
+
+    for _ in range(2):
+        with sync.session(mock_imap_ups_out_for_delivery) as account:
+            email_fetch(account, b"1")
+    assert mock_imap_ups_out_for_delivery.fetch.call_count == 2
+
+
+async def test_imap_connection_uidvalidity(mock_imap):
+    """Test UIDVALIDITY is read when the folder is selected."""
+    mock_imap.response.return_value = ("UIDVALIDITY", [b"1234"])
+    connection = ImapConnection(
+        "imap.test.email", 993, "fakeuser", "suchfakemuchpassword", "INBOX"
+    )
+
+    connection.account()
+    assert connection.sync.uidvalidity == 1234
+
+
+async def test_mailbox_sync_scan(mock_imap_ups_out_for_delivery):
+    """Test one scan answers the searches of every sensor."""
+    today = get_formatted_date()
+    mock_imap_ups_out_for_delivery.fetch.return_value = (
+        "OK",
+        [
+            (
+                f'1 (INTERNALDATE "{today} 08:00:00 +0000" '
+                "BODY[HEADER.FIELDS (FROM SUBJECT)] {100}".encode(),
+                b'From: "UPS My Choice" <mcinfo@ups.com>\r\n'
+                b"Subject: UPS Update: Follow Your Delivery on a Live Map\r\n\r\n",
+            )
+        ],
+    )
+    sync = MailboxSync()
+    sync.validate(1234)
+
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        account.scan(["mcinfo@ups.com", "auto-reply@usps.com"], today)
+        assert get_count(account, "ups_delivering")["count"] == 1
+        assert get_count(account, "ups_delivered")["count"] == 0
+        assert get_count(account, "usps_delivering")["count"] == 0
+    assert mock_imap_ups_out_for_delivery.search.call_count == 1
+
+    # Senders outside the scan still go to the server
+    with sync.session(mock_imap_ups_out_for_delivery) as account:
+        account.scan(["mcinfo@ups.com"], today)
+        email_search(account, "tracking@fedex.com", today)
+    assert mock_imap_ups_out_for_delivery.search.call_count == 3
+
+
+async def test_fetch_headers(mock_imap):
+    """Test headers of several emails are fetched with one command."""
+    mock_imap.fetch.return_value = (
+        "OK",
+        [
+            (
+                b"1 (UID 5 BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {20}",
+                b"Subject: A\r\n",
+            ),
+            b")",
+            (
+                b"2 (UID 9 BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {20}",
+                b"Subject: B\r\n",
+            ),
+            b")",
+        ],
+    )
+    headers = fetch_headers(mock_imap, [b"9", b"5"])
+    mock_imap.fetch.assert_called_once_with("5,9", HEADER_PARTS)
+    assert headers[5]["subject"] == "A"
+    assert headers[9]["subject"] == "B"
+    assert fetch_headers(mock_imap, []) == {}
+
+
+async def test_email_fetch_batch(mock_imap):
+    """Test several emails are fetched with one sequence set."""
+
+    def _fetch(num, parts):
+        return (
+            "OK",
+            [
+                (f"{i} (UID {uid} RFC822 {{10}}".encode(), f"Subject: {uid}".encode())
+                for i, uid in enumerate([1, 2, 3, 4, 9], 1)
+                if uid != 2
+            ],
+        )
+
+    mock_imap.fetch.side_effect = _fetch
+    result = list(email_fetch_batch(mock_imap, [b"9", b"1", b"2", b"3", b"4"]))
+    mock_imap.fetch.assert_called_once_with("1:4,9", "(RFC822)")
+    assert [num for num, _ in result] == [9, 1, 3, 4]
+    assert result[0][1][0][1] == b"Subject: 9"
+
+
+async def test_mailbox_sync_fetch_missing(mock_imap):
+    """Test only messages not held in memory are fetched."""
+    sync = MailboxSync()
+    sync.validate(1234)
+    mock_imap.fetch.return_value = ("OK", [(b"1 (UID 2 RFC822 {1}", b"2")])
+    with sync.session(mock_imap) as account:
+        email_fetch(account, b"2")
+
+    mock_imap.fetch.return_value = (
+        "OK",
+        [(f"1 (UID {uid} RFC822 {{1}}".encode(), b"") for uid in (1, 3, 4)],
+    )
+    with sync.session(mock_imap) as account:
+        list(email_fetch_batch(account, [1, 2, 3, 4]))
+    mock_imap.fetch.assert_called_with("1,3:4", "(RFC822)")
+
+
+async def test_message_cache():
+    """Test parsed emails are reused and evicted least recently used first."""
+    raw = b"Subject: Shipped\r\nContent-Type: text/plain\r\n\r\nTracking 1234\r\n"
+    cache = MessageCache(max_size=len(raw) * 2)
+    msg = cache.message(("INBOX", 1, 1), raw)
+    assert cache.message(("INBOX", 1, 1), b"") is msg
+    assert cache.text_parts(("INBOX", 1, 1), msg) == [
+        ("text/plain", "Tracking 1234\r\n")
+    ]
+
+    cache.message(("INBOX", 1, 2), raw)
+    cache.message(("INBOX", 1, 1), raw)
+    cache.message(("INBOX", 1, 3), raw)
+    assert len(cache) == 2
+    assert cache.message(("INBOX", 1, 2), b"Subject: new\r\n\r\n")["subject"] == "new"
+
+    cache.invalidate("INBOX", 2)
+    assert len(cache) == 0
+    assert cache.size == 0
+
+    response = [(b"1 (UID 1 RFC822 {%d}" % len(raw), raw), b")"]
+    cache.message(("INBOX", 2, 1), raw)
+    cache.store(("INBOX", 2, 1, "(RFC822)"), response)
+    assert cache.response(("INBOX", 2, 1, "(RFC822)")) is response
+    # The raw response and the parsed email share the size limit
+    assert len(cache) == 1
+    assert cache.size == len(raw) + len(response[0][0]) + 1
+
+
+async def test_mailbox_sync_cache_limit(mock_imap):
+    """Test downloaded messages are held within the message cache limit."""
+    sync = MailboxSync(folder="INBOX", cache=MessageCache(max_size=150))
+    sync.validate(1234)
+    mock_imap.fetch.side_effect = [
+        ("OK", [(f"1 (UID {uid} RFC822 {{80}}".encode(), b"x" * 80), b")"])
+        for uid in (1, 2, 1)
+    ]
+    with sync.session(mock_imap) as account:
+        for uid in (1, 2):
+            assert account.uid("FETCH", str(uid), "(RFC822)")[0] == "OK"
+        assert sync.cache.size <= 150
+        account.uid("FETCH", "1", "(RFC822)")
+    assert mock_imap.fetch.call_count == 3
+
+
+async def test_mailbox_sync_parse(mock_imap):
+    """Test emails are parsed once across refreshes until UIDVALIDITY changes."""
+    sync = MailboxSync(folder="INBOX")
+    sync.validate(1234)
+    mock_imap.fetch.return_value = (
+        "OK",
+        [(b"1 (UID 1 RFC822 {40}", b"Subject: Shipped\r\n\r\nOut for delivery")],
+    )
+    with patch(
+        "custom_components.mail_and_packages.helpers.email.message_from_bytes",
+        wraps=email.message_from_bytes,
+    ) as mock_parse:
+        for _ in range(2):
+            with sync.session(mock_imap) as account:
+                assert find_text([b"1"], account, "Out for delivery") == 1
+        assert mock_parse.call_count == 1
+
+        sync.validate(5678)
+        assert len(sync.cache) == 0
+
+
+def test_compiled():
+    """Test patterns are compiled once."""
+    assert compiled("\\d{12,20}") is PATTERNS["\\d{12,20}"]
+    assert compiled("Arriving[:]") is compiled("Arriving[:]")
+
+
+def test_amazon_markers():
+    """Test each arrival marker is found where str.find finds it."""
+    with open("tests/test_emails/amazon_shipped.eml", encoding="utf-8") as email_file:
+        body = email_file.read()
+    (starts, end) = amazon_markers(body)
+    assert starts == {"will arrive:": body.find("will arrive:")}
+    assert end == body.find("Track your")
+    assert amazon_markers("Previously expected: Track your") == ({}, -1)
+
+
+async def test_get_tracking_subject_headers(mock_imap):
+    """Test tracking numbers in subjects do not download the body."""
+
+    def _fetch(num, parts):
+        if parts == HEADER_PARTS:
+            return (
+                "OK",
+                [(b"1 (UID 1 {40}", b"Subject: Shipped 1Z2345678901234567\r\n")],
+            )
+        return ("OK", [(b"1 (UID 1 RFC822 {40}", b"Subject: Shipped\r\n\r\n")])
+
+    mock_imap.fetch.side_effect = _fetch
+    assert get_tracking(b"1", mock_imap, "1Z?[0-9A-Z]{16}") == ["1Z2345678901234567"]
+    assert mock_imap.fetch.call_count == 1
+
+
+async def test_scan_criteria():
+    """Test the scan covers the senders of the enabled sensors."""
+    config = {
+        "resources": ["ups_packages", "amazon_hub", "usps_mail"],
+        "amazon_fwds": ['""'],
+    }
+    addresses, date = scan_criteria(config)
+    assert "mcinfo@ups.com" in addresses
+    assert "thehub@amazon.com" in addresses
+    assert "USPSInformedDelivery@usps.gov" in addresses
+    assert "tracking@fedex.com" not in addresses
+    assert date == get_formatted_date()
+
+
+async def test_command_deadline(mock_imap):
+    """Test a command hanging past the deadline is aborted."""
+    aborted = threading.Event()
+
+    def _hang(*args):
+        aborted.wait(5)
+        raise OSError("socket closed")
+
+    mock_imap.uid.side_effect = _hang
+    mock_imap.socket.return_value.shutdown.side_effect = lambda *args: aborted.set()
+    sync = MailboxSync(0.05)
+    with sync.session(mock_imap) as account:
+        result = email_search(account, "fake@email.com", "01-Jan-2021")
+    assert result[0] == "BAD"
+    assert aborted.is_set()
+
+
+async def test_login_timeout(mock_imap):
+    """Test the socket timeout is applied when connecting."""
+    with patch(
+        "custom_components.mail_and_packages.helpers.imaplib.IMAP4_SSL"
+    ) as mock_ssl:
+        login("imap.test.email", 993, "fakeuser", "suchfakemuchpassword", 30)
+    mock_ssl.assert_called_once_with("imap.test.email", 993, timeout=30)
+
+
+async def test_idle_wait(mock_imap):
+    """Test IDLE returns when the server reports new mail."""
+    mock_imap.capabilities = ("IMAP4REV1", "IDLE")
+    mock_imap._new_tag.return_value = b"A001"
+    mock_imap.readline.side_effect = [
+        b"+ idling\r\n",
+        b"* 1 EXPUNGE\r\n",
+        b"* 3 EXISTS\r\n",
+        b"A001 OK IDLE terminated\r\n",
+    ]
+    mock_imap.file = mock.Mock()
+    mock_imap.file.peek.return_value = b""
+    with patch(
+        "custom_components.mail_and_packages.helpers.select.select",
+        return_value=([mock_imap.socket.return_value], [], []),
+    ):
+        assert idle_wait(mock_imap, 60)
+    mock_imap.send.assert_has_calls([call(b"A001 IDLE\r\n"), call(b"DONE\r\n")])
+
+
+async def test_idle_wait_timeout(mock_imap):
+    """Test IDLE ends quietly when nothing arrives."""
+    mock_imap.capabilities = ("IMAP4REV1", "IDLE")
+    mock_imap._new_tag.return_value = b"A001"
+    mock_imap.readline.side_effect = [b"+ idling\r\n", b"A001 OK IDLE terminated\r\n"]
+    mock_imap.file = mock.Mock()
+    mock_imap.file.peek.return_value = b""
+    with patch(
+        "custom_components.mail_and_packages.helpers.select.select",
+        return_value=([], [], []),
+    ):
+        assert idle_wait(mock_imap, 60) is False
+
+
+async def test_idle_unsupported(mock_imap):
+    """Test servers without IDLE fall back to polling."""
+    mock_imap.capabilities = ("IMAP4REV1",)
+    assert idle_wait(mock_imap, 60) is None
+
+    connection = ImapConnection(
+        "imap.test.email", 993, "fakeuser", "suchfakemuchpassword", "INBOX"
+    )
+    mock_imap.capabilities = ("IMAP4REV1", "IDLE")
+    mock_imap._new_tag.return_value = b"A001"
+    mock_imap.readline.side_effect = [b"+ idling\r\n", b""]
+    mock_imap.file = mock.Mock()
+    mock_imap.file.peek.return_value = b"*"
+    assert connection.idle(60) is None
+    assert mock_imap.logout.called
+
+
+async def test_resize_images(caplog):
+    with open("custom_components/mail_and_packages/mail_none.gif", "rb") as f:
+        content = f.read()
+    result = resize_images([("mail.gif", content), ("bad.jpg", b"")], 724, 320)
+    assert [image.size for image in result] == [(724, 320)]
+    assert "Error attempting to read image bad.jpg" in caplog.text
+
+
+async def test_resize_images_workers(caplog):
+    images = []
+    for shade in range(0, 250, 50):
+        content = BytesIO()
+        Image.new("RGB", (100, 50), (shade, shade, shade)).save(content, "PNG")
+        images.append((f"{shade}.png", content.getvalue()))
+    images.insert(2, ("bad.jpg", b""))
+
+    result = resize_images(images, 724, 320, 4)
+    assert [image.size for image in result] == [(724, 320)] * 5
+    assert [image.getpixel((362, 160))[0] for image in result] == [
+        0,
+        50,
+        100,
+        150,
+        200,
+    ]
+    assert "Error attempting to read image bad.jpg" in caplog.text
+
+
+async def test_resize_image(caplog):
+    frames = [Image.new("RGB", (724, 320), (shade, 0, 0)) for shade in (0, 200)]
+    content = BytesIO()
+    frames[0].save(
+        content, "GIF", save_all=True, append_images=frames[1:], duration=5000
+    )
+
+    with Image.open(BytesIO(resize_image(content.getvalue(), 362, None))) as img:
+        assert img.format == "GIF"
+        assert img.size == (362, 160)
+        assert img.n_frames == 2
+        assert img.info["duration"] == 5000
+
+    with open("custom_components/mail_and_packages/no_deliveries.jpg", "rb") as f:
+        still = f.read()
+    with Image.open(BytesIO(resize_image(still, 100, 100))) as img:
+        assert img.format == "JPEG"
+        assert max(img.size) == 100
+
+    assert resize_image(content.getvalue(), 1000, 1000) is None
+    assert resize_image(b"", 100, 100) is None
+    assert "Error attempting to resize image:" in caplog.text
+
+
+async def test_jpeg_frames():
+    frames = [Image.new("RGB", (724, 320), (shade, 0, 0)) for shade in (0, 200)]
+    content = BytesIO()
+    frames[0].save(content, "GIF", save_all=True, append_images=frames[1:])
+
+    result = jpeg_frames(content.getvalue())
+    assert len(result) == 2
+    with Image.open(BytesIO(result[1])) as img:
+        assert img.format == "JPEG"
+        assert img.getpixel((362, 160))[0] > 150
+    assert jpeg_frames(b"") == []
 
 
 async def test_resize_images_read_err(mock_image_excpetion, caplog):
-    m_open = mock_open()
-    with patch("builtins.open", m_open, create=True):
-        resize_images(["testimage.jpg", "anothertest.jpg"], 724, 320)
-        assert "Error attempting to read image" in caplog.text
+    resize_images([("testimage.jpg", b""), ("anothertest.jpg", b"")], 724, 320)
+    assert "Error attempting to read image" in caplog.text
 
 
 async def test_process_emails_random_image(hass, mock_imap_login_error, caplog):
@@ -993,6 +1639,7 @@ async def test_image_file_name_amazon(
     ):
         result = image_file_name(hass, config, True)
         assert result == "testfile.jpg"
+        assert not mock_copyfile.called
 
 
 async def test_image_file_name(
@@ -1016,6 +1663,57 @@ async def test_image_file_name(
         assert "Copying images/test.gif to" in caplog.text
 
 
+async def test_image_file_name_state(hass, tmp_path):
+    config = {**FAKE_CONFIG_DATA_CORRECTED, "image_path": "images/"}
+    images = tmp_path / "images"
+    helpers = "custom_components.mail_and_packages.helpers"
+
+    with patch.object(hass.config, "path", return_value=str(tmp_path)), patch(
+        f"{helpers}.copyfile", wraps=copyfile
+    ) as mock_copy, patch(f"{helpers}.hash_file", wraps=hash_file) as mock_hash:
+        name = image_file_name(hass, config)
+        assert name.endswith(".gif")
+        assert (images / name).is_file()
+        assert (images / ".image_state.json").is_file()
+        assert mock_copy.call_count == 1
+
+        # Same day only reads the record
+        mock_hash.reset_mock()
+        assert image_file_name(hass, config) == name
+        assert mock_copy.call_count == 1
+        assert not mock_hash.called
+
+        # Next day keeps a name still showing the placeholder
+        with patch(f"{helpers}.get_formatted_date", return_value="01-Jan-2099"):
+            assert image_file_name(hass, config) == name
+            assert mock_copy.call_count == 1
+
+        # Next day with mail starts a new image
+        (images / name).write_bytes(b"mail")
+        with patch(f"{helpers}.get_formatted_date", return_value="02-Jan-2099"):
+            new_name = image_file_name(hass, config)
+        assert new_name != name
+        assert mock_copy.call_count == 2
+        with open("custom_components/mail_and_packages/mail_none.gif", "rb") as f:
+            assert (images / new_name).read_bytes() == f.read()
+
+
+async def test_copy_images_private(hass, tmp_path):
+    config = {**FAKE_CONFIG_DATA_CORRECTED, "image_path": "images/"}
+    www = tmp_path / "www" / "mail_and_packages"
+    www.mkdir(parents=True)
+    (www / ".image_state.json").write_text("{}")
+    (www / ".mail_fingerprint").write_text("")
+
+    with patch.object(hass.config, "path", return_value=str(tmp_path)):
+        name = image_file_name(hass, config)
+        copy_images(hass, config)
+    assert (www / name).is_file()
+    assert not (www / ".image_state.json").exists()
+    assert not (www / ".mail_fingerprint").exists()
+    assert (tmp_path / "images" / ".image_state.json").is_file()
+
+
 async def test_amazon_exception(hass, mock_imap_amazon_exception, caplog):
     result = amazon_exception(mock_imap_amazon_exception, ['""'])
     assert result["order"] == ["123-1234567-1234567"] * 10
@@ -1035,6 +1733,69 @@ async def test_hash_file():
     assert result == "7f9d94e97bb4fc870d2d2b3aeae0c428ebed31dc"
 
 
+async def test_hash_file_cached(tmp_path):
+    """Test file hashes are reused until the file changes."""
+    test_file = tmp_path / "mail_none.gif"
+    test_file.write_bytes(b"mail")
+    with patch("builtins.open", wraps=open) as mock_file:
+        result = hash_file(str(test_file), fast=True)
+        assert result == f"{zlib.crc32(b'mail'):08x}"
+        assert hash_file(str(test_file), fast=True) == result
+        assert mock_file.call_count == 1
+
+        test_file.write_bytes(b"new mail")
+        assert hash_file(str(test_file), fast=True) != result
+        assert mock_file.call_count == 2
+
+
+async def test_mailbox_sync_failed():
+    """Test a failing command marks the refresh as failed."""
+    server = mock.Mock()
+    server.uid.return_value = ("OK", [b""])
+    sync = MailboxSync()
+    with sync.session(server) as account:
+        account.uid("SEARCH", "ALL")
+        assert not sync.failed
+        server.uid.return_value = ("BAD", [b"error"])
+        account.uid("SEARCH", "ALL")
+        assert sync.failed
+
+    server.uid.side_effect = OSError("error")
+    with sync.session(server) as account:
+        assert not sync.failed
+        with pytest.raises(OSError):
+            account.uid("SEARCH", "ALL")
+    assert sync.failed
+
+
+async def test_hash_file_threads(tmp_path):
+    """Test executor threads can share the hash cache."""
+    files = []
+    for index in range(8):
+        test_file = tmp_path / f"mail_{index}.gif"
+        test_file.write_bytes(f"mail {index}".encode())
+        files.append(str(test_file))
+    errors = []
+
+    def _hash():
+        try:
+            for _ in range(200):
+                for index, filename in enumerate(files):
+                    expected = f"{zlib.crc32(f'mail {index}'.encode()):08x}"
+                    assert hash_file(filename, fast=True) == expected
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+
+    with patch("custom_components.mail_and_packages.helpers.HASH_CACHE_SIZE", 4):
+        threads = [threading.Thread(target=_hash) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(_HASH_CACHE) <= 4
+
+
 async def test_fedex_out_for_delivery(hass, mock_imap_fedex_out_for_delivery):
     result = get_count(
         mock_imap_fedex_out_for_delivery, "fedex_delivering", True, "./", hass
@@ -1051,7 +1812,43 @@ async def test_fedex_out_for_delivery_2(hass, mock_imap_fedex_out_for_delivery_2
     assert result["tracking"] == ["286548999999"]
 
 
+async def test_email_search_subjects(mock_imap_fedex_out_for_delivery_2):
+    subjects = ["Your package is now out for delivery", "out for delivery today"]
+    result = email_search_subjects(
+        mock_imap_fedex_out_for_delivery_2,
+        ["TrackingUpdates@fedex.com"],
+        "01-Jan-2021",
+        subjects,
+    )
+    assert result == {"out for delivery today": [b"1"]}
+    mock_imap_fedex_out_for_delivery_2.search.assert_called_once_with(
+        None,
+        '(FROM "TrackingUpdates@fedex.com" OR SUBJECT "Your package is now out for delivery" '
+        'SUBJECT "out for delivery today" SINCE 01-Jan-2021)',
+    )
+
+
+async def test_build_search():
+    """Test search queries for several senders and subjects."""
+    assert build_search(["a@fake.email", "b@fake.email"], "01-Jan-2021") == (
+        False,
+        '(OR FROM "a@fake.email" FROM "b@fake.email" SINCE 01-Jan-2021)',
+    )
+    assert build_search(
+        ["a@fake.email", "b@fake.email"], "01-Jan-2021", ["one", "two"]
+    ) == (
+        False,
+        '(OR FROM "a@fake.email" FROM "b@fake.email" '
+        'OR SUBJECT "one" SUBJECT "two" SINCE 01-Jan-2021)',
+    )
+    assert build_search("a@fake.email", "01-Jan-2021", "one") == (
+        False,
+        '(FROM "a@fake.email" SUBJECT "one" SINCE 01-Jan-2021)',
+    )
+
+
 async def test_get_mails_email_search_none(
+    tmp_path,
     mock_imap_usps_informed_digest_no_mail,
     mock_copyoverlays,
     mock_copyfile_exception,
@@ -1062,7 +1859,10 @@ async def test_get_mails_email_search_none(
         return_value=("OK", [None]),
     ):
         result = get_mails(
-            mock_imap_usps_informed_digest_no_mail, "./", "5", "mail_today.gif", False
+            mock_imap_usps_informed_digest_no_mail,
+            f"{tmp_path}/",
+            "5",
+            "mail_today.gif",
         )
         assert result == 0
 
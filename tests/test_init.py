@@ -1,18 +1,26 @@
 """Tests for init."""
 
+import asyncio
+import threading
 from unittest.mock import patch
 
 import pytest
 from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.mail_and_packages.const import DOMAIN
+from custom_components.mail_and_packages.const import (
+    COORDINATOR,
+    DOMAIN,
+    IMAP_IDLE_TIMEOUT,
+)
 from tests.const import (
     FAKE_CONFIG_DATA,
     FAKE_CONFIG_DATA_AMAZON_FWD_STRING,
     FAKE_CONFIG_DATA_CUSTOM_IMG,
     FAKE_CONFIG_DATA_MISSING_TIMEOUT,
+    FAKE_CONFIG_DATA_MP4,
     FAKE_CONFIG_DATA_NO_PATH,
+    FAKE_UPDATE_DATA,
 )
 
 
@@ -32,8 +40,11 @@ async def test_unload_entry(hass, mock_update, mock_copy_overlays):
     entries = hass.config_entries.async_entries(DOMAIN)
     assert len(entries) == 1
 
-    assert await hass.config_entries.async_unload(entries[0].entry_id)
-    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    with patch.object(coordinator.connection, "close") as mock_close:
+        assert await hass.config_entries.async_unload(entries[0].entry_id)
+        await hass.async_block_till_done()
+        assert mock_close.called
     assert len(hass.states.async_entity_ids(SENSOR_DOMAIN)) == 43
     assert len(hass.states.async_entity_ids(DOMAIN)) == 0
 
@@ -42,6 +53,292 @@ async def test_unload_entry(hass, mock_update, mock_copy_overlays):
     assert len(hass.states.async_entity_ids(SENSOR_DOMAIN)) == 0
 
 
+async def test_imap_idle(hass, mock_update, mock_copy_overlays):
+    """Test new mail reported by IMAP IDLE refreshes the sensors."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data={**FAKE_CONFIG_DATA, "imap_idle": True},
+    )
+
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.helpers.ImapConnection.idle",
+        side_effect=[True, None],
+    ) as mock_idle, patch(
+        "custom_components.mail_and_packages.helpers.ImapConnection.close"
+    ):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        for _ in range(5):
+            await asyncio.sleep(0.1)
+            await hass.async_block_till_done()
+
+        assert mock_idle.call_count == 2
+        assert mock_update.call_count == 2
+
+        coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+        assert coordinator.idle_connection._timeout == IMAP_IDLE_TIMEOUT + 60
+        assert coordinator._idle_task in hass._background_tasks
+        assert await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
+        assert coordinator._idle_task is None
+
+
+async def test_update_in_flight(hass, mock_update, mock_copy_overlays):
+    """Test a refresh is skipped while the previous one still runs."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert mock_update.call_count == 1
+
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    coordinator._update = hass.loop.create_future()
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert mock_update.call_count == 1
+
+    coordinator._update.set_result({})
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert mock_update.call_count == 2
+
+
+async def test_update_overlap(hass, mock_update, mock_copy_overlays):
+    """Test overlapping refreshes do not share the session at the same time."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+
+    running = []
+    peak = 0
+
+    async def _prefetch(config, checked=False):
+        nonlocal peak
+        running.append(config)
+        peak = max(peak, len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+        return True
+
+    with patch.object(
+        coordinator.connection, "async_prefetch", side_effect=_prefetch
+    ) as mock_prefetch:
+        await asyncio.gather(
+            coordinator._async_update_data(), coordinator._async_update_data()
+        )
+    assert mock_prefetch.call_count == 2
+    assert peak == 1
+    assert mock_update.call_count == 3
+
+
+async def test_update_unchanged(hass, mock_update, mock_copy_overlays):
+    """Test a refresh keeps the sensor data while the folder is unchanged."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.helpers.ImapConnection.async_state",
+        side_effect=[("state", 1), ("state", 1), ("state", 2)],
+    ) as mock_state:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        assert mock_update.call_count == 1
+
+        coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+        updated = coordinator.data["mail_updated"]
+        await coordinator.async_refresh()
+        assert coordinator.last_update_success
+        assert mock_update.call_count == 1
+        assert coordinator.data["mail_updated"] != updated
+        assert coordinator.data["usps_mail"] == FAKE_UPDATE_DATA["usps_mail"]
+
+        await coordinator.async_refresh()
+        assert mock_update.call_count == 2
+        assert mock_state.call_count == 3
+
+
+async def test_update_failed_not_kept(hass, mock_update, mock_copy_overlays):
+    """Test a refresh with failed searches is repeated while unchanged."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA,
+    )
+
+    def _update(hass, config, connection):
+        connection.sync.failed = mock_update.call_count == 1
+        return dict(FAKE_UPDATE_DATA)
+
+    mock_update.side_effect = _update
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.helpers.ImapConnection.async_state",
+        return_value=("state", 1),
+    ), patch(
+        "custom_components.mail_and_packages.helpers.ImapConnection.async_prefetch",
+        return_value=False,
+    ) as mock_prefetch:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        assert mock_update.call_count == 1
+        mock_prefetch.assert_called_with(entry.data, checked=True)
+
+        coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+        await coordinator.async_refresh()
+        assert mock_update.call_count == 2
+
+        await coordinator.async_refresh()
+        assert mock_update.call_count == 2
+
+
+async def test_generate_mp4(hass, mock_update, mock_copy_overlays):
+    """Test the mp4 is encoded in the background and a newer gif wins."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data=FAKE_CONFIG_DATA_MP4,
+    )
+    started = asyncio.Event()
+    calls = []
+
+    async def _generate(path, image_name):
+        calls.append(image_name)
+        if len(calls) == 1:
+            started.set()
+            await asyncio.Event().wait()
+        return True
+
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.mp4_outdated", return_value=True
+    ), patch(
+        "custom_components.mail_and_packages.gif_mtime", return_value=1.0
+    ) as mock_mtime, patch(
+        "custom_components.mail_and_packages.async_generate_mp4",
+        side_effect=_generate,
+    ):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await started.wait()
+        coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+        assert coordinator.last_update_success
+        assert coordinator.mp4_status == "encoding"
+
+        # The same gif keeps the running encode
+        await coordinator.async_refresh()
+        while mock_mtime.call_count < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        assert calls == ["mail_today.gif"]
+        assert coordinator.mp4_status == "encoding"
+
+        # A newer gif replaces it
+        mock_mtime.return_value = 2.0
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert calls == ["mail_today.gif", "mail_today.gif"]
+        assert coordinator.mp4_status == "done"
+        state = hass.states.get("sensor.mail_usps_mail")
+        assert state.attributes["mp4_status"] == "done"
+
+
+async def test_generate_mp4_pyav(hass, mock_update, mock_copy_overlays):
+    """Test PyAV encodes the frames of the refresh outside of it."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data={**FAKE_CONFIG_DATA_MP4, "video_encoder": "pyav"},
+    )
+    frames = [object()]
+    mock_update.return_value = {**FAKE_UPDATE_DATA, "video_frames": frames}
+
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.mp4_outdated", return_value=True
+    ), patch("custom_components.mail_and_packages.gif_mtime", return_value=1.0), patch(
+        "custom_components.mail_and_packages.encode_mp4", return_value=True
+    ) as mock_encode, patch(
+        "custom_components.mail_and_packages.async_generate_mp4"
+    ) as mock_ffmpeg:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    assert "video_frames" not in coordinator.data
+    assert mock_encode.call_count == 1
+    assert mock_encode.call_args[0][0] is frames
+    assert mock_encode.call_args[0][2:] == ("mail_today.gif", 5)
+    assert not mock_ffmpeg.called
+    assert coordinator.mp4_status == "done"
+
+
+async def _mp4_status(coordinator, status: str) -> bool:
+    """Wait up to two seconds for the mp4 status."""
+    for _ in range(200):
+        if coordinator.mp4_status == status:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def test_generate_mp4_pyav_timeout(hass, mock_update, mock_copy_overlays):
+    """Test a stuck PyAV encode times out and holds back the next one."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="imap.test.email",
+        data={**FAKE_CONFIG_DATA_MP4, "video_encoder": "pyav"},
+    )
+    release = threading.Event()
+    calls = []
+
+    def _encode(*args):
+        calls.append(args)
+        release.wait(5)
+        return True
+
+    entry.add_to_hass(hass)
+    with patch(
+        "custom_components.mail_and_packages.mp4_outdated", return_value=True
+    ), patch(
+        "custom_components.mail_and_packages.gif_mtime", return_value=1.0
+    ) as mock_mtime, patch(
+        "custom_components.mail_and_packages.encode_mp4", _encode
+    ), patch(
+        "custom_components.mail_and_packages.MP4_TIMEOUT", 0.05
+    ):
+        try:
+            assert await hass.config_entries.async_setup(entry.entry_id)
+            coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+            assert await _mp4_status(coordinator, "timeout")
+
+            # A newer gif waits for the stuck encoder thread
+            mock_mtime.return_value = 2.0
+            coordinator.mp4_status = None
+            await coordinator.async_refresh()
+            assert await _mp4_status(coordinator, "timeout")
+            assert len(calls) == 1
+        finally:
+            release.set()
+        await hass.async_block_till_done()
+
+
 async def test_setup_entry(
     hass,
     mock_imap_no_email,